@@ -1,11 +1,56 @@
+import asyncio
+import contextvars
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import TypedDict, Annotated, List, Optional
 import operator
-from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from langchain_google_vertexai import ChatVertexAI
-from tools import bq_tools, dataplex_tools, data_product_tools
+from tools import bq_tools, cache, concurrency, dataplex_tools, data_product_tools, ranking, tracing
 import json
 
+# Seconds to wait for each location in a multi-location search before
+# answering with the locations that did respond.
+DEFAULT_LOCATION_TIMEOUT = 10.0
+
+# Listings kept per location; the Slack app renders only the first few
+DEFAULT_MAX_RESULTS = 25
+
+# Seconds the enrichment stage waits for quality and contract lookups before
+# answering with whatever has been resolved
+DEFAULT_ENRICHMENT_TIMEOUT = 5.0
+
+# Seconds a request may take end to end before nodes answer with what they
+# have; Slack users give up on a command after a few seconds
+DEFAULT_REQUEST_TIMEOUT = 8.0
+
+# Seconds a search response is reused for an identical query
+DEFAULT_RESULT_CACHE_TTL = 300.0
+
+# Upper bound on the approximate serialized size of all cached responses
+DEFAULT_RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Share of the enrichment budget given to contract lookups, so their partial
+# results are handed back before the overall deadline expires
+_CONTRACT_BUDGET_FRACTION = 0.9
+
+# Chat model used by the agent, created on first use of ``agent.llm``
+LLM_MODEL_NAME = "gemini-3.1-pro"
+
+# Compiled graph per agent class, shared by all of its instances
+_compiled_graphs: dict = {}
+_compiled_graphs_lock = threading.Lock()
+
+def __getattr__(name):
+    # The Vertex AI SDK takes seconds to import and no node calls the LLM yet,
+    # so ChatVertexAI is only imported when first looked up.
+    if name == "ChatVertexAI":
+        from langchain_google_vertexai import ChatVertexAI
+        globals()["ChatVertexAI"] = ChatVertexAI
+        return ChatVertexAI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Define the state of the agent
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
@@ -14,24 +59,149 @@ class AgentState(TypedDict):
     data_products: Optional[List[dict]]
     selected_listing_id: Optional[str]
     subscription_result: Optional[str]
+    # Set by any node that answered with incomplete data (a location or
+    # enrichment lookup that failed or timed out); such results are not cached
+    partial: Annotated[bool, operator.or_]
+    # Absolute time (``time.time()``) by which the request must be answered;
+    # every node and the tool calls it makes stop waiting at this point
+    deadline: Optional[float]
+
+def _query_from_state(state: dict) -> str:
+    """The query of a request: the explicit ``query``, else the last message."""
+    query = state.get("query", "")
+    if not query and state.get("messages"):
+        query = state["messages"][-1].content
+    return query
+
+def _response_weight(result: dict) -> int:
+    """Approximate size in bytes of a cached search response."""
+    return len(json.dumps(result.get("listings") or [], default=str))
+
+def _agent_node(method_name: str):
+    """
+    A graph node that runs ``method_name`` on the agent passed in the run
+    config, recorded as a ``node.<name>`` span with its result counts.
+
+    The node and every tool call it makes run under the request's
+    ``deadline`` (see ``concurrency.deadline_scope``).
+    """
+    span_name = f"node.{method_name.removesuffix('_node')}"
+
+    async def node(state: AgentState, config):
+        with tracing.span(span_name) as span, concurrency.deadline_scope(state.get("deadline")):
+            update = await getattr(config["configurable"]["agent"], method_name)(state)
+            span.set(**_result_counts(update))
+            return update
+    node.__name__ = method_name
+    return node
+
+def _result_counts(update: dict) -> dict:
+    """``<key>_count`` for every list a node returned, e.g. ``listings_count``."""
+    if not tracing.enabled():
+        return {}
+    return {
+        f"{key}_count": len(value)
+        for key, value in (update or {}).items()
+        if isinstance(value, list) and key != "messages"
+    }
+
+def _route_intent(state: AgentState, config):
+    return config["configurable"]["agent"].route_intent(state)
+
+def _governed_resource(listing: dict) -> str:
+    """The resource whose quality scans and contract describe a listing: its shared dataset."""
+    return listing.get("source_dataset") or listing.get("name")
 
 class BigQuerySharingAgent:
-    def __init__(self, project_id: str, location: str = "us-central1"):
+    def __init__(
+        self,
+        project_id: str,
+        location: str = "us-central1",
+        locations: Optional[List[str]] = None,
+        location_timeout: float = DEFAULT_LOCATION_TIMEOUT,
+        max_results: int = DEFAULT_MAX_RESULTS,
+        enrichment_timeout: float = DEFAULT_ENRICHMENT_TIMEOUT,
+        ranker: Optional[ranking.RankingEngine] = None,
+        rank_top_k: Optional[int] = None,
+        result_cache_ttl: Optional[float] = DEFAULT_RESULT_CACHE_TTL,
+        result_cache_max_bytes: int = DEFAULT_RESULT_CACHE_MAX_BYTES,
+        request_timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT,
+    ):
         self.project_id = project_id
         self.location = location
-        self.llm = ChatVertexAI(model_name="gemini-3.1-pro", temperature=0)
-        self.graph = self._build_graph()
+        # Searches fan out over every configured location concurrently
+        self.locations = list(locations) if locations else [location]
+        self.location_timeout = location_timeout
+        self.max_results = max_results
+        self.enrichment_timeout = enrichment_timeout
+        # Default time budget of a request without an explicit ``deadline``;
+        # None or 0 lets requests run until every stage has finished
+        self.request_timeout = request_timeout
+        self.ranker = ranker or ranking.default_engine()
+        # Listings kept after ranking; None keeps every listing
+        self.rank_top_k = rank_top_k
+        # Identical searches in flight at the same time share one pipeline run
+        self.search_flights = concurrency.SingleFlight()
+        # Final states of recent searches, keyed by normalized query, project,
+        # locations and catalog version; a TTL of None or 0 disables it
+        self.result_cache = None
+        if result_cache_ttl:
+            self.result_cache = cache.LRUCache(
+                maxsize=1024,
+                ttl_seconds=result_cache_ttl,
+                max_weight=result_cache_max_bytes,
+                weigher=_response_weight,
+            )
+        self._llm = None
+        self._llm_lock = threading.Lock()
+
+    @property
+    def llm(self):
+        """The chat model, created on first use."""
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    chat_model = globals().get("ChatVertexAI") or __getattr__("ChatVertexAI")
+                    self._llm = chat_model(model_name=LLM_MODEL_NAME, temperature=0)
+        return self._llm
+
+    @property
+    def graph(self):
+        """The compiled agent graph, shared by every instance of this class."""
+        return type(self).compile_graph()
+
+    @classmethod
+    def compile_graph(cls):
+        """
+        Compile the agent graph on first use and share it across instances.
+
+        Nodes look up the agent to run on in the run config, so one compiled
+        graph serves every agent.  Call this at startup to pay the LangGraph
+        import and compile cost before the first request.
+        """
+        graph = _compiled_graphs.get(cls)
+        if graph is None:
+            with _compiled_graphs_lock:
+                graph = _compiled_graphs.get(cls)
+                if graph is None:
+                    graph = _compiled_graphs[cls] = cls._build_graph()
+        return graph
+
+    @classmethod
+    def _build_graph(cls):
+        from langgraph.graph import StateGraph, END
 
-    def _build_graph(self):
         workflow = StateGraph(AgentState)
 
         # Define nodes
-        workflow.add_node("search_listings", self.search_listings_node)
-        workflow.add_node("enrich_with_data_products", self.enrich_with_data_products_node)
-        workflow.add_node("enrich_listings", self.enrich_listings_node)
-        workflow.add_node("rank_listings", self.rank_listings_node)
-        workflow.add_node("generate_response", self.generate_response_node)
-        workflow.add_node("subscribe_listing", self.subscribe_listing_node)
+        workflow.add_node("prepare_query", _agent_node("prepare_query_node"))
+        workflow.add_node("search_listings", _agent_node("search_listings_node"))
+        workflow.add_node("search_data_products", _agent_node("search_data_products_node"))
+        workflow.add_node("enrich_with_data_products", _agent_node("enrich_with_data_products_node"))
+        workflow.add_node("enrich_listings", _agent_node("enrich_listings_node"))
+        workflow.add_node("rank_listings", _agent_node("rank_listings_node"))
+        workflow.add_node("generate_response", _agent_node("generate_response_node"))
+        workflow.add_node("subscribe_listing", _agent_node("subscribe_listing_node"))
 
         # Define edges
         # We need a conditional edge to decide if we are searching or subscribing
@@ -39,14 +209,18 @@ class BigQuerySharingAgent:
 
         workflow.add_conditional_edges(
             "determine_intent",
-            self.route_intent,
+            _route_intent,
             {
-                "search": "search_listings",
+                "search": "prepare_query",
                 "subscribe": "subscribe_listing"
             }
         )
 
-        workflow.add_edge("search_listings", "enrich_with_data_products")
+        # Both searches depend only on the query, so they run as parallel
+        # branches and join before the merge step.
+        workflow.add_edge("prepare_query", "search_listings")
+        workflow.add_edge("prepare_query", "search_data_products")
+        workflow.add_edge(["search_listings", "search_data_products"], "enrich_with_data_products")
         workflow.add_edge("enrich_with_data_products", "enrich_listings")
         workflow.add_edge("enrich_listings", "rank_listings")
         workflow.add_edge("rank_listings", "generate_response")
@@ -64,94 +238,288 @@ class BigQuerySharingAgent:
             return "subscribe"
         return "search"
 
-    def search_listings_node(self, state: AgentState):
+    async def prepare_query_node(self, state: AgentState):
+        return {"query": _query_from_state(state)}
+
+    async def search_listings_node(self, state: AgentState):
         query = state.get("query", "")
-        # Extract query from messages if not explicitly in state
-        if not query and state["messages"]:
-            query = state["messages"][-1].content
-            
-        print(f"Searching for: {query}")
-        results = bq_tools.search_listings(query, self.project_id, self.location)
-        return {"listings": results, "query": query}
+        per_location = await self._fan_out_locations(
+            lambda location: bq_tools.search_listings(
+                query, self.project_id, location, limit=self.max_results
+            )
+        )
+        results = [listing for listings in per_location for listing in listings]
+        partial = len(per_location) < len(self.locations)
+        # Interleave locations by relevance; stable, so unscored results keep their order
+        results.sort(key=lambda listing: -(listing.get("relevance_score") or 0))
+        return {"listings": results, "partial": partial}
+
+    async def search_data_products_node(self, state: AgentState):
+        """
+        Search the Dataplex Data Product catalog in every location; runs
+        alongside search_listings.  Products only enrich listings, so each
+        location keeps as many as it keeps listings (``max_results``) and
+        stops paging there.
+        """
+        query = state.get("query", "")
+        per_location = await self._fan_out_locations(
+            lambda location: data_product_tools.search_data_products(
+                query, self.project_id, location, max_results=self.max_results
+            )
+        )
+        products = [product for location_products in per_location for product in location_products]
+        return {"data_products": products, "partial": len(per_location) < len(self.locations)}
 
-    def enrich_with_data_products_node(self, state: AgentState):
+    async def enrich_with_data_products_node(self, state: AgentState):
         """
         Cross-reference BQ Analytics Hub listings against the Dataplex Data
         Product catalog.  Listings that have a matching data product are merged
         so the agent can surface all unique metadata from both sources.
         """
         listings = state.get("listings", [])
-        query = state.get("query", "")
+        products = state.get("data_products") or []
 
-        products = data_product_tools.search_data_products(
-            query, self.project_id, self.location
-        )
+        # Index the fetched products once; every listing is then joined in O(1)
+        product_index = data_product_tools.ProductIndex(products)
+
+        matches = data_product_tools.match_listings_to_products(listings, product_index)
+
+        # Search results may omit aspects; fetch the full entries of every
+        # matched product in one concurrent, cached round.  Past the deadline
+        # the products are merged as the search returned them.
+        partial = False
+        try:
+            full_products = await concurrency.run_before_deadline(
+                data_product_tools.get_data_products,
+                [matched["name"] for _, matched in matches if matched],
+            )
+        except asyncio.TimeoutError:
+            full_products, partial = {}, True
 
         enriched = []
-        for listing in listings:
-            matched = data_product_tools.find_matching_product(listing, products)
+        for listing, matched in matches:
             if matched:
+                product = {**matched, **full_products.get(matched["name"], {})}
                 enriched.append(
-                    data_product_tools.merge_listing_with_data_product(listing, matched)
+                    data_product_tools.merge_listing_with_data_product(listing, product)
                 )
             else:
                 enriched.append(listing)
 
-        return {"listings": enriched, "data_products": products}
+        return {"listings": enriched, "partial": partial}
 
-    def enrich_listings_node(self, state: AgentState):
+    async def enrich_listings_node(self, state: AgentState):
+        """
+        Attach data quality scores and data contracts to every listing.
+
+        The quality and contract lookups for all listings run concurrently,
+        one batch per kind and location, under ``enrichment_timeout`` or
+        until the request deadline, whichever comes first.  Listings whose
+        lookups did not finish in time are kept with ``enriched: False`` and
+        whatever part of their metadata did arrive.
+        """
         listings = state.get("listings", [])
+        timeout = concurrency.bounded_timeout(self.enrichment_timeout)
+
+        by_location: dict = {}
+        for listing in listings:
+            location = (listing.get("location") or self.location).lower()
+            by_location.setdefault(location, []).append(_governed_resource(listing))
+
+        contract_timeout = timeout * _CONTRACT_BUDGET_FRACTION
+        lookups = {
+            "quality": dataplex_tools.get_data_quality_scores,
+            "contract": lambda resources, location: dataplex_tools.get_data_contracts(
+                resources, location, timeout=contract_timeout
+            ),
+        }
+        completed = await concurrency.amap_with_timeout(
+            lambda task: lookups[task[0]](by_location[task[1]], task[1]),
+            [(kind, location) for kind in lookups for location in by_location],
+            timeout,
+        )
+        results = {kind: {} for kind in lookups}
+        for (kind, _), values in completed:
+            results[kind].update(values)
+
         enriched_listings = []
-        
-        # For top 3 listings, fetch metadata
-        # (Optimizing to avoid too many API calls)
-        for listing in listings[:3]:
-            # Mocking entry ID mapping
-            # In reality, listing.name might need parsing to find the corresponding Dataplex Entry
-            entry_id = listing.get("name") 
-            quality = dataplex_tools.get_data_quality_score(entry_id)
-            contract = dataplex_tools.get_data_contract_info(entry_id)
-            
-            enrichment = {
+        for listing in listings:
+            resource = _governed_resource(listing)
+            enriched_listings.append({
                 **listing,
-                "data_quality_score": quality,
-                "data_contract": contract
-            }
-            enriched_listings.append(enrichment)
-            
-        return {"listings": enriched_listings}
+                "data_quality_score": results["quality"].get(resource),
+                "data_contract": results["contract"].get(resource),
+                "enriched": resource in results["quality"] and resource in results["contract"],
+            })
 
-    def rank_listings_node(self, state: AgentState):
-        # We could use the LLM to re-rank here based on the query and metadata context
-        # For now, we will just return the enriched listings as is, or sorted by quality
+        partial = not all(listing["enriched"] for listing in enriched_listings)
+        return {"listings": enriched_listings, "partial": partial}
+
+    async def rank_listings_node(self, state: AgentState):
+        """
+        Order listings by a weighted score of relevance, data quality, contract
+        status, SLA tier and freshness, keeping the best ``rank_top_k``.  Each
+        listing carries its ``score`` and per-signal ``score_breakdown``.
+        """
         listings = state.get("listings", [])
-        listings.sort(key=lambda x: x.get("data_quality_score", 0), reverse=True)
-        return {"listings": listings}
+        return {"listings": self.ranker.rank(listings, k=self.rank_top_k)}
 
-    def generate_response_node(self, state: AgentState):
+    async def generate_response_node(self, state: AgentState):
+        """
+        Answer with the ranked listings.  When an earlier stage ran out of
+        time or failed, the response is marked ``partial`` in its metadata
+        instead of the request failing.
+        """
         listings = state.get("listings", [])
+        partial = bool(state.get("partial"))
+        metadata = {"partial": partial}
         
         if not listings:
-            return {"messages": [AIMessage(content="I couldn't find any data listings matching your request.")]}
+            content = "I couldn't find any data listings matching your request."
+            if partial:
+                content += " Some sources did not respond in time, so results may be incomplete."
+            return {"messages": [AIMessage(content=content, response_metadata=metadata)]}
             
         # We don't construct the full Block Kit JSON here because the Agent Engine 
         # outputs text/JSON that the Slack App parses.
         # We will iterate and return a JSON string or structured list.
         
-        return {"messages": [AIMessage(content=json.dumps(listings))]}
+        return {"messages": [AIMessage(content=json.dumps(listings), response_metadata=metadata)]}
 
-    def subscribe_listing_node(self, state: AgentState):
+    async def subscribe_listing_node(self, state: AgentState):
         listing_id = state.get("selected_listing_id")
         # Ensure we have a destination dataset. 
         # For this PoC, we might auto-generate one or ask the user.
         # We'll assume a default or require it in the input.
         destination = f"subscription_{listing_id.split('/')[-1]}"
+        # Subscribe in the listing's own location, which may differ from the
+        # agent's default when searches span several locations.
+        location = bq_tools.listing_location(listing_id, default=self.location)
         
-        result = bq_tools.subscribe_listing(listing_id, destination, self.project_id, self.location)
+        try:
+            result = await concurrency.run_before_deadline(
+                bq_tools.subscribe_listing, listing_id, destination, self.project_id, location
+            )
+        except asyncio.TimeoutError:
+            # A started subscription keeps running; only the answer is cut short
+            return {
+                "subscription_result": (
+                    f"Subscription to {listing_id} is taking longer than expected; "
+                    f"check dataset {destination} in project {self.project_id} shortly."
+                ),
+                "partial": True,
+            }
         return {"subscription_result": result}
 
-    def invoke(self, input_state: dict):
-        return self.graph.invoke(input_state)
+    async def _fan_out_locations(self, search) -> List[list]:
+        """
+        Run ``search(location)`` for every configured location concurrently.
+
+        Locations that fail or do not answer within ``location_timeout`` (or
+        by the request deadline) are skipped, so one slow region cannot hold up the response.  Results are
+        returned in configured location order.
+        """
+        completed = await concurrency.amap_with_timeout(search, self.locations, self.location_timeout)
+        return [results for _, results in completed]
+
+    async def ainvoke(self, input_state: dict, request_id: Optional[str] = None):
+        """
+        Run the agent graph on the caller's event loop.
+
+        Nodes await their Google API calls instead of blocking, so one process
+        can serve many concurrent searches from a single loop; a worker thread
+        is only held while a call is in flight.
+
+        Complete search responses are cached (see ``result_cache``), so a
+        repeated query is answered without re-running the pipeline until its
+        TTL expires or the catalog of one of the locations is reloaded, and
+        identical searches arriving while one is running wait for and share
+        its result (``search_flights``).
+
+        The run is traced as an ``agent.invoke`` span with one child span per
+        node and outbound API call (see ``tools.tracing``), all tagged with
+        ``request_id``; without one, the active request's ID or a new ID is
+        used.
+
+        The request must be answered by ``input_state["deadline"]`` (a
+        ``time.time()`` value), by default ``request_timeout`` seconds from
+        now.  Stages that run out of time answer with what they have and the
+        result is marked ``partial``.  Identical searches that join a running
+        one share its deadline.
+        """
+        with tracing.request("agent.invoke", request_id) as span:
+            input_state = self._with_deadline(input_state)
+            key = self._search_key(input_state)
+            if key is None:
+                span.set(intent="subscribe")
+                return await self.graph.ainvoke(input_state, self._run_config())
+            span.set(intent="search", query=key[0])
+
+            if self.result_cache is not None:
+                cached = self.result_cache.get(key)
+                if cached is not None:
+                    span.set(result_cache="hit")
+                    return copy.deepcopy(cached)
+
+            result = await self.search_flights.ado(key, lambda: self._run_search(input_state, key))
+            span.set(listings_count=len(result.get("listings") or []), partial=bool(result.get("partial")))
+            # Every caller gets its own copy of the shared result
+            return copy.deepcopy(result)
+
+    async def _run_search(self, input_state: dict, key: tuple) -> dict:
+        result = await self.graph.ainvoke(input_state, self._run_config())
+        # A search that started before a location's catalog was loaded may
+        # have been answered from the unranked streaming fallback, so only
+        # searches against loaded catalogs are cached
+        if self.result_cache is not None and not result.get("partial") and None not in key[-1]:
+            self.result_cache.put(key, copy.deepcopy(result))
+        return result
+
+    def invoke(self, input_state: dict, request_id: Optional[str] = None):
+        """
+        Synchronous entry point; runs ``ainvoke`` on a fresh event loop.
+
+        Called from code that already runs an event loop (an async handler or
+        a notebook), the fresh loop runs on a worker thread and the caller
+        blocks until it is done, so prefer ``await ainvoke`` there.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.ainvoke(input_state, request_id))
+
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent_invoke") as pool:
+            return pool.submit(context.run, asyncio.run, self.ainvoke(input_state, request_id)).result()
+
+    def result_cache_stats(self) -> dict:
+        """Hit rate, size and weight of the search result cache (empty when disabled)."""
+        return self.result_cache.stats() if self.result_cache is not None else {}
+
+    def invalidate_result_cache(self) -> int:
+        """Drop every cached search response; returns how many were dropped."""
+        return self.result_cache.invalidate() if self.result_cache is not None else 0
+
+    def _with_deadline(self, input_state: dict) -> dict:
+        """``input_state`` with its ``deadline`` set from ``request_timeout`` if missing."""
+        if input_state.get("deadline") is not None or not self.request_timeout:
+            return input_state
+        return {**input_state, "deadline": time.time() + self.request_timeout}
+
+    def _run_config(self) -> dict:
+        return {"configurable": {"agent": self}}
+
+    def _search_key(self, input_state: dict) -> Optional[tuple]:
+        """Identity of a search request for caching and coalescing; None for subscriptions."""
+        if input_state.get("selected_listing_id"):
+            return None
+        query = " ".join(_query_from_state(input_state).lower().split())
+        return (
+            query,
+            self.project_id,
+            tuple(self.locations),
+            bq_tools.catalog_version(self.project_id, self.locations),
+        )
 
 # For Vertex AI Agent Engine, we might need to expose a specific function or class method
 # depending on the deployment pattern. 
@@ -1,8 +1,14 @@
 import os
 import logging
+import threading
+import time
+
+_started = time.perf_counter()
+
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from agent_engine import BigQuerySharingAgent
+from tools import clients, tracing
 import json
 
 # Set up logging
@@ -38,16 +44,46 @@ app = App(token=os.environ.get("SLACK_BOT_TOKEN"))
 # For this implementation, we run the agent logic locally within the same process.
 PROJECT_ID = os.environ.get("PROJECT_ID", "my-project-id")
 LOCATION = os.environ.get("LOCATION", "us-central1")
-agent = BigQuerySharingAgent(project_id=PROJECT_ID, location=LOCATION)
+# Comma-separated list of locations to search, e.g. "US,EU,asia-northeast1"
+LOCATIONS = [loc.strip() for loc in os.environ.get("LOCATIONS", LOCATION).split(",") if loc.strip()]
+LOCATION_TIMEOUT = float(os.environ.get("LOCATION_TIMEOUT_SECONDS", "10"))
+ENRICHMENT_TIMEOUT = float(os.environ.get("ENRICHMENT_TIMEOUT_SECONDS", "5"))
+RANK_TOP_K = int(os.environ["RANK_TOP_K"]) if os.environ.get("RANK_TOP_K") else None
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "300"))
+# End-to-end budget of a /find-data search; slower stages answer with what they have
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", "8"))
+agent = BigQuerySharingAgent(
+    project_id=PROJECT_ID,
+    location=LOCATION,
+    locations=LOCATIONS,
+    location_timeout=LOCATION_TIMEOUT,
+    enrichment_timeout=ENRICHMENT_TIMEOUT,
+    rank_top_k=RANK_TOP_K,
+    result_cache_ttl=RESULT_CACHE_TTL,
+    request_timeout=REQUEST_TIMEOUT,
+)
+
+# Seconds from process start to a ready agent before startup is flagged as slow
+STARTUP_BUDGET = float(os.environ.get("STARTUP_BUDGET_SECONDS", "2"))
+startup_seconds = time.perf_counter() - _started
+if startup_seconds > STARTUP_BUDGET:
+    logger.warning(f"Agent startup took {startup_seconds:.2f}s (budget {STARTUP_BUDGET:.2f}s)")
+else:
+    logger.info(f"Agent ready in {startup_seconds:.2f}s")
 
 @app.command("/find-data")
 def handle_find_data(ack, body, logger):
     ack()
+    # Trace the whole command (agent run, rendering and posting) as one request
+    with tracing.request("slack.find_data", body.get("trigger_id")):
+        _find_data(body, logger)
+
+def _find_data(body, logger):
     user_query = body.get("text")
     user_id = body.get("user_id")
     
     # 1. Invoke Agent
-    logger.info(f"User {user_id} requested: {user_query}")
+    logger.info(f"[{tracing.current_request_id()}] User {user_id} requested: {user_query}")
     
     # Run the agent graph
     state_input = {"query": user_query, "messages": []}
@@ -56,15 +92,33 @@ def handle_find_data(ack, body, logger):
     # 2. Process Response
     # The agent returns the final state. We expect `listings` in it.
     listings = response.get("listings", [])
+    partial = bool(response.get("partial"))
     
     if not listings:
+        text = f"Sorry, I couldn't find any data listings for '{user_query}'."
+        if partial:
+            text += f" {PARTIAL_RESULTS_NOTE}"
+        with tracing.api_call("slack.chat_postMessage"):
+            app.client.chat_postMessage(channel=body["channel_id"], text=text)
+        return
+
+    # 3. Build Block Kit UI
+    with tracing.span("slack.render_blocks") as span:
+        blocks = _result_blocks(user_query, listings, partial)
+        span.set(blocks_count=len(blocks))
+
+    # Send blocks
+    with tracing.api_call("slack.chat_postMessage"):
         app.client.chat_postMessage(
             channel=body["channel_id"],
-            text=f"Sorry, I couldn't find any data listings for '{user_query}'."
+            blocks=blocks,
+            text=f"Found {len(listings)} listings for '{user_query}'" # Fallback text
         )
-        return
 
-    # 3. Build Block Kit UI
+PARTIAL_RESULTS_NOTE = "Some sources did not respond in time, so these results may be incomplete."
+
+def _result_blocks(user_query, listings, partial=False) -> list:
+    """Block Kit blocks for the top search results, noting when they are partial."""
     blocks = [
         {
             "type": "header",
@@ -76,12 +130,19 @@ def handle_find_data(ack, body, logger):
         },
         {"type": "divider"}
     ]
+    if partial:
+        blocks.insert(1, {
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": f":hourglass: {PARTIAL_RESULTS_NOTE}"}]
+        })
     
     for listing in listings[:5]: # proper limit for slack block limits
         listing_id = listing.get("listing_id")
         display_name = listing.get("display_name")
         description = listing.get("description", "No description")
-        quality_score = listing.get("data_quality_score", "N/A")
+        quality_score = listing.get("data_quality_score")
+        if quality_score is None:
+            quality_score = "N/A"
         
         # Section with details. All free-text fields are escaped, and the title
         # is only rendered as a link when the URL is a valid http(s) link.
@@ -108,7 +169,8 @@ def handle_find_data(ack, body, logger):
                         "text": "View in Console",
                         "emoji": True
                     },
-                    "url": f"https://console.cloud.google.com/bigquery/analytics-hub/listings/{listing_id}?project={PROJECT_ID}",
+                    # Listings carry a location-aware console URL; fall back for older results
+                    "url": link_url or f"https://console.cloud.google.com/bigquery/analytics-hub/listings/{listing_id}?project={PROJECT_ID}",
                     "action_id": "view_console"
                 },
                 {
@@ -125,13 +187,7 @@ def handle_find_data(ack, body, logger):
             ]
         })
         blocks.append({"type": "divider"})
-
-    # Send blocks
-    app.client.chat_postMessage(
-        channel=body["channel_id"],
-        blocks=blocks,
-        text=f"Found {len(listings)} listings for '{user_query}'" # Fallback text
-    )
+    return blocks
 
 @app.action("subscribe_listing")
 def handle_subscription(ack, body, logger):
@@ -139,26 +195,35 @@ def handle_subscription(ack, body, logger):
     user_id = body["user"]["id"]
     listing_name = body["actions"][0]["value"]
     
-    logger.info(f"User {user_id} subscribing to: {listing_name}")
-    
-    # Invoke Agent Subscription Logic
-    # We pass the selected listing ID to route to the subscribe node
-    state_input = {
-        "selected_listing_id": listing_name,
-        "query": "subscribe", # Dummy query
-        "messages": []
-    }
-    
-    response = agent.invoke(state_input)
-    result_message = response.get("subscription_result", "Subscription failed.")
-    
-    # Notify user
-    app.client.chat_postMessage(
-        channel=body["channel"]["id"],
-        text=f"<@{user_id}> {result_message}"
-    )
+    with tracing.request("slack.subscribe_listing", body.get("trigger_id")):
+        logger.info(f"[{tracing.current_request_id()}] User {user_id} subscribing to: {listing_name}")
+        
+        # Invoke Agent Subscription Logic
+        # We pass the selected listing ID to route to the subscribe node
+        state_input = {
+            "selected_listing_id": listing_name,
+            "query": "subscribe", # Dummy query
+            "messages": []
+        }
+        
+        response = agent.invoke(state_input)
+        result_message = response.get("subscription_result", "Subscription failed.")
+        
+        # Notify user
+        with tracing.api_call("slack.chat_postMessage"):
+            app.client.chat_postMessage(
+                channel=body["channel"]["id"],
+                text=f"<@{user_id}> {result_message}"
+            )
 
 if __name__ == "__main__":
     # Start Socket Mode handler
     handler = SocketModeHandler(app, os.environ.get("SLACK_APP_TOKEN"))
-    handler.start()
+    # Compile the shared agent graph while the socket connects, so the first
+    # command does not pay for it
+    threading.Thread(target=BigQuerySharingAgent.compile_graph, name="graph-warmup", daemon=True).start()
+    try:
+        handler.start()
+    finally:
+        # Release the pooled API channels held by the tool client registry
+        clients.close_all()
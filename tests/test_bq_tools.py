@@ -0,0 +1,494 @@
+"""
+Tests for tools/bq_tools.py.
+
+Unit tests cover:
+  - crawl_catalog (exchange ordering, bounded concurrency, per-exchange
+    failure isolation, exchange listing failure, per-call timeouts)
+  - search_listings (ranked matching against the catalog snapshot, limits,
+    snapshot reuse, semantic and hybrid modes)
+  - iter_search_listings (streaming, early termination, failure isolation,
+    calls bounded by the request deadline)
+  - listing_location / get_listing_url
+"""
+
+import sys
+import os
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from google.api_core import exceptions as gcp_exceptions
+
+from tools import bq_tools, clients, concurrency
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _make_exchange(exchange_id, display_name=None):
+    exchange = MagicMock()
+    exchange.name = f"projects/p/locations/US/dataExchanges/{exchange_id}"
+    exchange.display_name = display_name or exchange_id
+    return exchange
+
+
+def _make_listing(exchange_id, listing_id, display_name, description=""):
+    listing = MagicMock()
+    listing.name = f"projects/p/locations/US/dataExchanges/{exchange_id}/listings/{listing_id}"
+    listing.display_name = display_name
+    listing.description = description
+    listing.bigquery_dataset.dataset = f"projects/p/datasets/{listing_id}"
+    return listing
+
+
+class FakeAnalyticsHubClient:
+    """In-memory stand-in for AnalyticsHubServiceClient."""
+
+    def __init__(self, catalog, delays=None, failing=()):
+        # catalog: {exchange_id: [listing, ...]}
+        self.catalog = catalog
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def list_data_exchanges(self, request, timeout=None):
+        return [_make_exchange(exchange_id) for exchange_id in self.catalog]
+
+    def list_listings(self, request, timeout=None):
+        exchange_id = request.parent.split("/")[-1]
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delays.get(exchange_id, 0.01))
+            if exchange_id in self.failing:
+                raise gcp_exceptions.GoogleAPICallError(f"{exchange_id} unavailable")
+            return list(self.catalog[exchange_id])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class HangingAnalyticsHubClient:
+    """Analytics Hub stand-in whose calls hang until released or their timeout expires."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.timeouts = []
+
+    def list_data_exchanges(self, request, timeout=None):
+        self.timeouts.append(timeout)
+        if not self.release.wait(timeout=5 if timeout is None else timeout):
+            raise gcp_exceptions.DeadlineExceeded("deadline exceeded")
+        return []
+
+    list_listings = list_data_exchanges
+
+
+class _FakeClientTestCase(unittest.TestCase):
+
+    def install(self, fake):
+        clients.override_client(
+            bq_tools.bigquery_data_exchange_v1beta1.AnalyticsHubServiceClient, fake
+        )
+        self.addCleanup(clients.clear_overrides)
+        bq_tools.listing_catalog.invalidate()
+        self.addCleanup(bq_tools.listing_catalog.invalidate)
+        bq_tools._vector_indexes.clear()
+        self.addCleanup(bq_tools._vector_indexes.clear)
+        return fake
+
+    def wait_for_vector_indexes(self):
+        for thread in threading.enumerate():
+            if thread.name.startswith("vector-index-"):
+                thread.join(timeout=5)
+
+
+# ---------------------------------------------------------------------------
+# crawl_catalog
+# ---------------------------------------------------------------------------
+
+class TestCrawlCatalog(_FakeClientTestCase):
+
+    def test_returns_exchanges_and_listings_with_exchange_metadata(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [_make_listing("ex1", "l1", "Global Sales Data")],
+            "ex2": [],
+        }))
+
+        exchanges, listings = bq_tools.crawl_catalog("p", "US")
+
+        self.assertEqual([e["exchange_id"] for e in exchanges], ["ex1", "ex2"])
+        self.assertEqual(len(listings), 1)
+        self.assertEqual(listings[0]["listing_id"], "l1")
+        self.assertEqual(listings[0]["exchange_id"], "ex1")
+        self.assertEqual(listings[0]["location"], "US")
+        self.assertEqual(listings[0]["project_id"], "p")
+        self.assertIn("/locations/US/exchanges/ex1/listings/l1", listings[0]["url"])
+
+    def test_results_keep_exchange_order_when_calls_finish_out_of_order(self):
+        self.install(FakeAnalyticsHubClient(
+            {
+                "ex1": [_make_listing("ex1", "a", "sales a")],
+                "ex2": [_make_listing("ex2", "b", "sales b")],
+                "ex3": [_make_listing("ex3", "c", "sales c")],
+            },
+            # The first exchange is the slowest to answer
+            delays={"ex1": 0.1, "ex2": 0.05, "ex3": 0.0},
+        ))
+
+        _, listings = bq_tools.crawl_catalog("p", "US", max_concurrency=3)
+
+        self.assertEqual([r["listing_id"] for r in listings], ["a", "b", "c"])
+
+    def test_concurrency_is_bounded(self):
+        catalog = {
+            f"ex{i}": [_make_listing(f"ex{i}", f"l{i}", f"sales {i}")] for i in range(10)
+        }
+        fake = self.install(FakeAnalyticsHubClient(catalog, delays={k: 0.02 for k in catalog}))
+
+        _, listings = bq_tools.crawl_catalog("p", "US", max_concurrency=3)
+
+        self.assertEqual(len(listings), 10)
+        self.assertLessEqual(fake.max_in_flight, 3)
+        self.assertGreater(fake.max_in_flight, 1)
+
+    def test_failing_exchange_only_drops_its_own_listings(self):
+        self.install(FakeAnalyticsHubClient(
+            {
+                "ex1": [_make_listing("ex1", "a", "sales a")],
+                "ex2": [_make_listing("ex2", "b", "sales b")],
+                "ex3": [_make_listing("ex3", "c", "sales c")],
+            },
+            failing={"ex2"},
+        ))
+
+        _, listings = bq_tools.crawl_catalog("p", "US")
+
+        self.assertEqual([r["listing_id"] for r in listings], ["a", "c"])
+
+    def test_raises_when_exchanges_cannot_be_listed(self):
+        fake = self.install(FakeAnalyticsHubClient({}))
+        fake.list_data_exchanges = MagicMock(
+            side_effect=gcp_exceptions.GoogleAPICallError("boom")
+        )
+
+        with self.assertRaises(gcp_exceptions.GoogleAPICallError):
+            bq_tools.crawl_catalog("p", "US")
+
+    def test_crawl_calls_use_their_own_timeout_not_the_request_deadline(self):
+        fake = self.install(HangingAnalyticsHubClient())
+        fake.release.set()
+
+        with concurrency.deadline_scope(time.time() + 0.2):
+            bq_tools.crawl_catalog("p", "US")
+
+        self.assertEqual(fake.timeouts, [bq_tools.CRAWL_CALL_TIMEOUT])
+
+
+# ---------------------------------------------------------------------------
+# search_listings
+# ---------------------------------------------------------------------------
+
+class TestSearchListings(_FakeClientTestCase):
+
+    def test_returns_matching_listings(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [
+                _make_listing("ex1", "l1", "Global Sales Data"),
+                _make_listing("ex1", "l2", "Clickstream", description="raw sales events"),
+                _make_listing("ex1", "l3", "Finance Reports"),
+            ],
+        }))
+
+        results = bq_tools.search_listings("SALES", "p", "US")
+
+        self.assertEqual([r["listing_id"] for r in results], ["l1", "l2"])
+        self.assertGreater(results[0]["relevance_score"], results[1]["relevance_score"])
+
+    def test_multi_word_query_matches_non_adjacent_words(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [
+                _make_listing("ex1", "l1", "Sales Figures", description="Full year 2024"),
+                _make_listing("ex1", "l2", "Finance Reports"),
+            ],
+        }))
+
+        results = bq_tools.search_listings("sales 2024", "p", "US")
+
+        self.assertEqual([r["listing_id"] for r in results], ["l1"])
+
+    def test_limit_caps_results(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [_make_listing("ex1", f"l{i}", f"Sales {i}") for i in range(10)],
+        }))
+
+        self.assertEqual(len(bq_tools.search_listings("sales", "p", "US", limit=3)), 3)
+
+    def test_query_without_search_terms_returns_whole_catalog(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [_make_listing("ex1", "l1", "Sales"), _make_listing("ex1", "l2", "Clicks")],
+        }))
+
+        results = bq_tools.search_listings("", "p", "US")
+
+        self.assertEqual([r["listing_id"] for r in results], ["l1", "l2"])
+
+    def test_repeat_searches_are_served_from_the_snapshot(self):
+        fake = self.install(FakeAnalyticsHubClient({
+            "ex1": [_make_listing("ex1", "l1", "Global Sales Data")],
+        }))
+        fake.list_data_exchanges = MagicMock(wraps=fake.list_data_exchanges)
+
+        bq_tools.search_listings("sales", "p", "US")
+        results = bq_tools.search_listings("global", "p", "US")
+
+        self.assertEqual([r["listing_id"] for r in results], ["l1"])
+        fake.list_data_exchanges.assert_called_once()
+        self.assertGreaterEqual(bq_tools.listing_catalog.stats()["hits"], 1)
+
+    def test_returns_empty_list_when_exchanges_cannot_be_listed(self):
+        fake = self.install(FakeAnalyticsHubClient({}))
+        fake.list_data_exchanges = MagicMock(
+            side_effect=gcp_exceptions.GoogleAPICallError("boom")
+        )
+
+        self.assertEqual(bq_tools.search_listings("sales", "p", "US"), [])
+
+    def test_semantic_mode_matches_word_variants(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [
+                _make_listing("ex1", "l1", "Global Sales Data"),
+                _make_listing("ex1", "l2", "Weather Observations"),
+            ],
+        }))
+
+        self.assertEqual(bq_tools.search_listings("sale", "p", "US"), [])
+        # The first semantic search does not wait for the index to be built
+        self.assertEqual(bq_tools.search_listings("sale", "p", "US", mode="semantic"), [])
+        self.wait_for_vector_indexes()
+        results = bq_tools.search_listings("sale", "p", "US", mode="semantic")
+
+        self.assertEqual([r["listing_id"] for r in results], ["l1"])
+        self.assertGreater(results[0]["relevance_score"], 0)
+
+    def test_hybrid_mode_blends_lexical_and_semantic_matches(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [
+                _make_listing("ex1", "l1", "Salesforce Opportunities"),
+                _make_listing("ex1", "l2", "Sales"),
+                _make_listing("ex1", "l3", "Weather Observations"),
+            ],
+        }))
+
+        # Lexical matches only until the vector index has been built
+        results = bq_tools.search_listings("sales", "p", "US", mode="hybrid")
+        self.assertEqual([r["listing_id"] for r in results], ["l2"])
+        self.wait_for_vector_indexes()
+        results = bq_tools.search_listings("sales", "p", "US", mode="hybrid")
+
+        # Exact match first, then the semantic-only match
+        self.assertEqual([r["listing_id"] for r in results], ["l2", "l1"])
+        self.assertEqual(
+            [r["listing_id"] for r in bq_tools.search_listings("sales", "p", "US", limit=1, mode="hybrid")],
+            ["l2"],
+        )
+
+    def test_vector_index_follows_catalog_refresh(self):
+        fake = self.install(FakeAnalyticsHubClient({
+            "ex1": [_make_listing("ex1", "l1", "Weather Observations")],
+        }))
+        self.assertEqual(bq_tools.search_listings("sale", "p", "US", mode="semantic"), [])
+        self.wait_for_vector_indexes()
+
+        fake.catalog["ex1"].append(_make_listing("ex1", "l2", "Global Sales Data"))
+        bq_tools.listing_catalog.refresh("p", "US")
+        # The refresh re-syncs the index in the background, not the next search
+        self.wait_for_vector_indexes()
+        generation = bq_tools.listing_catalog.generation("p", "US")
+        self.assertEqual(bq_tools._vector_indexes[("p", "US")][0], generation)
+
+        results = bq_tools.search_listings("sale", "p", "US", mode="semantic")
+        self.assertEqual([r["listing_id"] for r in results], ["l2"])
+
+    def test_default_semantic_mode_builds_index_on_catalog_load(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [_make_listing("ex1", "l1", "Global Sales Data")],
+        }))
+        original = bq_tools.DEFAULT_SEARCH_MODE
+        bq_tools.DEFAULT_SEARCH_MODE = "semantic"
+        self.addCleanup(setattr, bq_tools, "DEFAULT_SEARCH_MODE", original)
+
+        bq_tools.listing_catalog.get("p", "US")
+        self.wait_for_vector_indexes()
+
+        results = bq_tools.search_listings("sale", "p", "US")
+        self.assertEqual([r["listing_id"] for r in results], ["l1"])
+
+    def test_concurrent_identical_searches_share_one_execution(self):
+        self.install(FakeAnalyticsHubClient({"ex1": [_make_listing("ex1", "l1", "Sales")]}))
+        release = threading.Event()
+        calls = []
+        original = bq_tools._search_listings
+
+        def slow_search(*args):
+            calls.append(args)
+            release.wait(timeout=2)
+            return original(*args)
+
+        bq_tools._search_listings = slow_search
+        self.addCleanup(setattr, bq_tools, "_search_listings", original)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(bq_tools.search_listings("sales", "p", "US")))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([[r["listing_id"] for r in result] for result in results], [["l1"]] * 3)
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            bq_tools.search_listings("sales", "p", "US", mode="fuzzy")
+
+    def test_limited_search_on_cold_catalog_streams_and_warms_snapshot(self):
+        self.install(FakeAnalyticsHubClient({
+            "ex1": [_make_listing("ex1", "l1", "Sales"), _make_listing("ex1", "l2", "Sales EU")],
+            "ex2": [_make_listing("ex2", "l3", "Sales APAC")],
+        }))
+
+        results = bq_tools.search_listings("sales", "p", "US", limit=1)
+
+        self.assertEqual([r["listing_id"] for r in results], ["l1"])
+        for thread in threading.enumerate():
+            if thread.name.startswith("catalog-refresh-"):
+                thread.join(timeout=5)
+        self.assertEqual(len(bq_tools.listing_catalog.get("p", "US").listings), 3)
+
+
+# ---------------------------------------------------------------------------
+# iter_search_listings
+# ---------------------------------------------------------------------------
+
+class TestIterSearchListings(_FakeClientTestCase):
+
+    def test_calls_end_at_the_deadline_and_free_the_shared_pool(self):
+        import asyncio
+        fake = self.install(HangingAnalyticsHubClient())
+        self.addCleanup(fake.release.set)
+
+        def stream(query):
+            return list(bq_tools.iter_search_listings(query, "p", "US", limit=5))
+
+        async def run():
+            # More abandoned searches than the shared pool has workers
+            with concurrency.deadline_scope(time.time() + 0.2):
+                await asyncio.gather(*(
+                    concurrency.amap_with_timeout(stream, [f"q{i}"], timeout=10) for i in range(40)
+                ))
+            # A later, healthy request must not queue behind the abandoned calls
+            return await concurrency.amap_with_timeout(lambda i: i, range(32), timeout=1)
+
+        healthy = asyncio.run(run())
+
+        self.assertEqual(len(healthy), 32)
+        self.assertEqual(len(fake.timeouts), 40)
+        self.assertTrue(all(0 <= timeout <= 0.2 for timeout in fake.timeouts))
+
+    def test_calls_without_a_deadline_keep_the_client_default(self):
+        fake = self.install(FakeAnalyticsHubClient(self._catalog()))
+        fake.list_listings = MagicMock(wraps=fake.list_listings)
+
+        list(bq_tools.iter_search_listings("sales", "p", "US"))
+
+        self.assertNotIn("timeout", fake.list_listings.call_args.kwargs)
+
+    def _catalog(self):
+        return {
+            "ex1": [_make_listing("ex1", "a", "Sales A"), _make_listing("ex1", "x", "Weather")],
+            "ex2": [_make_listing("ex2", "b", "Sales B")],
+            "ex3": [_make_listing("ex3", "c", "Sales C")],
+        }
+
+    def test_yields_matches_in_catalog_order(self):
+        self.install(FakeAnalyticsHubClient(self._catalog()))
+
+        results = list(bq_tools.iter_search_listings("sales", "p", "US"))
+
+        self.assertEqual([r["listing_id"] for r in results], ["a", "b", "c"])
+        self.assertEqual(results[0]["exchange_id"], "ex1")
+
+    def test_stops_paging_once_limit_is_reached(self):
+        fake = self.install(FakeAnalyticsHubClient(self._catalog()))
+        fake.list_listings = MagicMock(wraps=fake.list_listings)
+
+        results = list(bq_tools.iter_search_listings("sales", "p", "US", limit=2))
+
+        self.assertEqual([r["listing_id"] for r in results], ["a", "b"])
+        # The third exchange is never listed
+        self.assertEqual(fake.list_listings.call_count, 2)
+
+    def test_first_result_is_available_before_later_exchanges_are_listed(self):
+        fake = self.install(FakeAnalyticsHubClient(self._catalog()))
+        fake.list_listings = MagicMock(wraps=fake.list_listings)
+
+        stream = bq_tools.iter_search_listings("sales", "p", "US")
+        first = next(stream)
+
+        self.assertEqual(first["listing_id"], "a")
+        self.assertEqual(fake.list_listings.call_count, 1)
+        stream.close()
+
+    def test_failing_exchange_is_skipped(self):
+        self.install(FakeAnalyticsHubClient(self._catalog(), failing={"ex2"}))
+
+        results = list(bq_tools.iter_search_listings("sales", "p", "US"))
+
+        self.assertEqual([r["listing_id"] for r in results], ["a", "c"])
+
+    def test_zero_limit_makes_no_calls(self):
+        fake = self.install(FakeAnalyticsHubClient(self._catalog()))
+        fake.list_data_exchanges = MagicMock(wraps=fake.list_data_exchanges)
+
+        self.assertEqual(list(bq_tools.iter_search_listings("sales", "p", "US", limit=0)), [])
+        fake.list_data_exchanges.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# listing_location / get_listing_url
+# ---------------------------------------------------------------------------
+
+class TestListingResourceHelpers(unittest.TestCase):
+
+    def test_listing_location_parses_resource_name(self):
+        name = "projects/p/locations/europe-west1/dataExchanges/ex/listings/l1"
+        self.assertEqual(bq_tools.listing_location(name), "europe-west1")
+
+    def test_listing_location_falls_back_to_default(self):
+        self.assertEqual(bq_tools.listing_location("listing1", default="EU"), "EU")
+
+    def test_get_listing_url_includes_location(self):
+        url = bq_tools.get_listing_url(
+            "projects/p/locations/EU/dataExchanges/ex/listings/l1", "consumer"
+        )
+        self.assertEqual(
+            url,
+            "https://console.cloud.google.com/bigquery/analytics-hub/locations/EU"
+            "/exchanges/ex/listings/l1?project=consumer",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for tools/cache.py.
+
+Unit tests cover:
+  - LRU eviction order and counters
+  - TTL expiry
+  - predicate invalidation
+  - weight-bounded eviction
+"""
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.cache import LRUCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_counts_hits_and_misses(self):
+        cache = LRUCache()
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("missing")
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(ttl_seconds=10, clock=clock)
+        cache.put("a", 1)
+
+        clock.now = 9
+        self.assertEqual(cache.get("a"), 1)
+        clock.now = 10
+        self.assertEqual(cache.get("a", "gone"), "gone")
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_with_predicate(self):
+        cache = LRUCache()
+        for key in [("x", 1), ("x", 2), ("y", 1)]:
+            cache.put(key, True)
+
+        self.assertEqual(cache.invalidate(lambda key: key[0] == "x"), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.invalidate(), 1)
+
+    def test_evicts_until_within_max_weight(self):
+        cache = LRUCache(max_weight=10, weigher=len)
+        cache.put("a", "xxxx")
+        cache.put("b", "xxxx")
+        cache.put("c", "xxxx")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), "xxxx")
+        self.assertEqual(cache.stats()["weight"], 8)
+
+        cache.put("b", "x")
+        cache.pop("c")
+        self.assertEqual(cache.stats()["weight"], 1)
+
+    def test_value_heavier_than_max_weight_is_not_stored(self):
+        cache = LRUCache(max_weight=3, weigher=len)
+        cache.put("a", "xx")
+        cache.put("big", "xxxxx")
+
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.get("a"), "xx")
+
+    def test_max_weight_requires_weigher(self):
+        with self.assertRaises(ValueError):
+            LRUCache(max_weight=10)
+
+    def test_rejects_non_positive_maxsize(self):
+        with self.assertRaises(ValueError):
+            LRUCache(maxsize=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""
+Tests for tools/catalog.py, the in-memory Analytics Hub catalog snapshots.
+
+Unit tests cover:
+  - first load, fresh hits and per-key isolation
+  - stale-while-revalidate background refresh
+  - refresh failure handling
+  - stats and invalidation
+  - load hooks
+"""
+
+import sys
+import os
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.catalog import CatalogCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingLoader:
+    """Loader returning one listing per call, tagged with the call number."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, project_id, location):
+        self.release.wait(timeout=5)
+        self.calls.append((project_id, location))
+        if self.fail:
+            raise RuntimeError("crawl failed")
+        n = len(self.calls)
+        return [{"exchange_id": "ex"}], [{"name": f"listing-{n}", "location": location}]
+
+
+class TestCatalogCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.loader = RecordingLoader()
+        self.cache = CatalogCache(self.loader, ttl_seconds=60, clock=self.clock)
+
+    def _wait_for_refresh(self):
+        for thread in threading.enumerate():
+            if thread.name.startswith("catalog-refresh-"):
+                thread.join(timeout=5)
+
+    def test_first_get_loads_and_later_gets_hit(self):
+        first = self.cache.get("p", "US")
+        second = self.cache.get("p", "US")
+
+        self.assertIs(first, second)
+        self.assertEqual(first.listings[0]["name"], "listing-1")
+        self.assertEqual(len(self.loader.calls), 1)
+        stats = self.cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_keys_are_isolated(self):
+        us = self.cache.get("p", "US")
+        eu = self.cache.get("p", "EU")
+
+        self.assertIsNot(us, eu)
+        self.assertEqual(eu.location, "EU")
+        self.assertEqual(self.loader.calls, [("p", "US"), ("p", "EU")])
+
+    def test_stale_snapshot_is_served_while_refreshing(self):
+        original = self.cache.get("p", "US")
+        self.clock.now += 61
+        self.loader.release.clear()
+
+        stale = self.cache.get("p", "US")
+
+        # The stale snapshot is returned immediately, before the reload finishes
+        self.assertIs(stale, original)
+        self.assertTrue(self.cache.stats()["snapshots"]["p/US"]["refreshing"])
+
+        self.loader.release.set()
+        self._wait_for_refresh()
+
+        fresh = self.cache.get("p", "US")
+        self.assertEqual(fresh.listings[0]["name"], "listing-2")
+        self.assertGreater(fresh.generation, original.generation)
+        self.assertEqual(self.cache.stats()["stale_hits"], 1)
+
+    def test_only_one_background_refresh_per_key(self):
+        self.cache.get("p", "US")
+        self.clock.now += 61
+        self.loader.release.clear()
+
+        for _ in range(5):
+            self.cache.get("p", "US")
+        self.loader.release.set()
+        self._wait_for_refresh()
+
+        self.assertEqual(len(self.loader.calls), 2)
+
+    def test_failed_refresh_keeps_previous_snapshot(self):
+        original = self.cache.get("p", "US")
+        self.clock.now += 61
+        self.loader.fail = True
+
+        served = self.cache.get("p", "US")
+        self._wait_for_refresh()
+
+        self.assertIs(served, original)
+        self.assertEqual(self.cache.stats()["refresh_failures"], 1)
+        self.assertEqual(self.cache.stats()["snapshots"]["p/US"]["generation"], original.generation)
+
+    def test_failed_initial_load_returns_none(self):
+        self.loader.fail = True
+
+        self.assertIsNone(self.cache.get("p", "US"))
+        self.assertEqual(self.cache.stats()["refresh_failures"], 1)
+
+    def test_stats_report_snapshot_age(self):
+        self.cache.get("p", "US")
+        self.clock.now += 12.5
+
+        snapshot_stats = self.cache.stats()["snapshots"]["p/US"]
+
+        self.assertEqual(snapshot_stats["age_seconds"], 12.5)
+        self.assertEqual(snapshot_stats["listings"], 1)
+        self.assertEqual(snapshot_stats["exchanges"], 1)
+
+    def test_invalidate_forces_reload(self):
+        self.cache.get("p", "US")
+        self.cache.get("p", "EU")
+
+        self.cache.invalidate(location="US")
+        self.cache.get("p", "US")
+        self.cache.get("p", "EU")
+
+        self.assertEqual(len(self.loader.calls), 3)
+
+    def test_refresh_reloads_synchronously(self):
+        first = self.cache.get("p", "US")
+        refreshed = self.cache.refresh("p", "US")
+
+        self.assertIsNot(first, refreshed)
+        self.assertIs(self.cache.get("p", "US"), refreshed)
+
+
+    def test_generation_changes_on_reload_without_loading(self):
+        self.assertIsNone(self.cache.generation("p", "US"))
+        self.assertEqual(self.loader.calls, [])
+
+        first = self.cache.get("p", "US").generation
+        self.assertEqual(self.cache.generation("p", "US"), first)
+        self.cache.refresh("p", "US")
+
+        self.assertGreater(self.cache.generation("p", "US"), first)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_load_hook_sees_every_new_snapshot(self):
+        loaded = []
+        cache = CatalogCache(self.loader, ttl_seconds=60, clock=self.clock, on_load=loaded.append)
+
+        first = cache.get("p", "US")
+        cache.get("p", "US")
+        second = cache.refresh("p", "US")
+
+        self.assertEqual(loaded, [first, second])
+
+    def test_failing_load_hook_does_not_affect_the_snapshot(self):
+        def broken(snapshot):
+            raise RuntimeError("boom")
+
+        cache = CatalogCache(self.loader, ttl_seconds=60, clock=self.clock, on_load=broken)
+
+        with self.assertLogs("tools.catalog", level="ERROR"):
+            snapshot = cache.get("p", "US")
+        self.assertIs(cache.get("p", "US"), snapshot)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+"""
+Tests for tools/catalog_store.py and the on-disk cold start path of
+tools/catalog.py.
+
+Unit tests cover:
+  - save/load round trip, including the search index
+  - frozen (imported) indexes: searching, thawing, incremental updates
+  - corrupt, incompatible and missing snapshot files
+  - CatalogCache serving a cold key from disk (blocking or not) and
+    reconciling in the background
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools import catalog_store
+from tools.catalog import CatalogCache
+from tools.catalog_store import CatalogStore
+from tools.search_index import InvertedIndex, sync_listing_index
+
+
+def _listing(listing_id, display_name, description=""):
+    return {
+        "name": f"projects/p/locations/US/dataExchanges/ex/listings/{listing_id}",
+        "display_name": display_name,
+        "description": description,
+        "listing_id": listing_id,
+    }
+
+
+LISTINGS = [
+    _listing("l1", "Global Sales Data", "Sales figures for 2024"),
+    _listing("l2", "Marketing Clickstream", "Raw web events"),
+    _listing("l3", "Finance Reports", "Quarterly sales summaries"),
+]
+EXCHANGES = [{"name": "projects/p/locations/US/dataExchanges/ex", "exchange_id": "ex"}]
+
+
+class _TempStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "catalog.sqlite")
+        self.store = CatalogStore(self.path)
+
+
+class TestCatalogStore(_TempStoreTestCase):
+
+    def test_round_trip_preserves_listings_and_index(self):
+        index = sync_listing_index(None, LISTINGS)
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 1234.5, index)
+
+        loaded = self.store.load("p", "US")
+
+        self.assertEqual(loaded.listings, LISTINGS)
+        self.assertEqual(loaded.exchanges, EXCHANGES)
+        self.assertEqual(loaded.fetched_at, 1234.5)
+        self.assertTrue(loaded.index.frozen)
+        self.assertEqual(loaded.index.search("sales"), index.search("sales"))
+
+    def test_save_replaces_previous_snapshot_for_key(self):
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 1.0)
+        self.store.save("p", "US", EXCHANGES, LISTINGS[:1], 2.0)
+        self.store.save("p", "EU", EXCHANGES, LISTINGS, 3.0)
+
+        self.assertEqual(len(self.store.load("p", "US").listings), 1)
+        self.assertEqual(len(self.store.load("p", "EU").listings), 3)
+
+    def test_missing_file_or_key_returns_none(self):
+        self.assertIsNone(self.store.load("p", "US"))
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 1.0)
+        self.assertIsNone(self.store.load("p", "EU"))
+
+    def test_corrupt_file_is_ignored_and_replaced(self):
+        with open(self.path, "wb") as f:
+            f.write(b"this is not a sqlite database" * 100)
+
+        self.assertIsNone(self.store.load("p", "US"))
+
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 1.0)
+        self.assertEqual(len(self.store.load("p", "US").listings), 3)
+
+    def test_corrupt_index_blob_is_ignored(self):
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 1.0, sync_listing_index(None, LISTINGS))
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute("UPDATE snapshots SET index_arrays = ?", (b"garbage",))
+        conn.close()
+
+        self.assertIsNone(self.store.load("p", "US"))
+
+    def test_incompatible_schema_version_is_ignored(self):
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 1.0)
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute(
+                "UPDATE meta SET value = ? WHERE key = 'schema_version'",
+                (str(catalog_store.SCHEMA_VERSION + 1),),
+            )
+        conn.close()
+
+        self.assertIsNone(self.store.load("p", "US"))
+
+        # Saving rewrites the file with the current schema
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 2.0)
+        self.assertEqual(self.store.load("p", "US").fetched_at, 2.0)
+
+
+class TestFrozenIndex(unittest.TestCase):
+
+    def _frozen(self):
+        return InvertedIndex.from_export(*sync_listing_index(None, LISTINGS).export())
+
+    def test_frozen_index_searches_without_thawing(self):
+        index = self._frozen()
+
+        self.assertEqual(index.search("clickstream")[0][0], LISTINGS[1]["name"])
+        self.assertTrue(index.frozen)
+
+    def test_mutation_thaws_index(self):
+        index = self._frozen()
+
+        index.remove(LISTINGS[0]["name"])
+        index.add("new", "Sales Forecasts")
+
+        self.assertFalse(index.frozen)
+        names = [doc_id for doc_id, _ in index.search("sales")]
+        self.assertNotIn(LISTINGS[0]["name"], names)
+        self.assertIn("new", names)
+
+    def test_sync_thaws_a_private_copy(self):
+        frozen = self._frozen()
+
+        updated = sync_listing_index(frozen, LISTINGS[1:])
+
+        self.assertIsNot(updated, frozen)
+        self.assertTrue(frozen.frozen)
+        self.assertIn(LISTINGS[0]["name"], frozen)
+        self.assertNotIn(LISTINGS[0]["name"], updated)
+
+    def test_inconsistent_export_is_rejected(self):
+        metadata, arrays = sync_listing_index(None, LISTINGS).export()
+        metadata["doc_ids"] = metadata["doc_ids"][:1]
+
+        with self.assertRaises(ValueError):
+            InvertedIndex.from_export(metadata, arrays)
+
+
+class TestCatalogCacheWithStore(_TempStoreTestCase):
+
+    def _wait_for_refresh(self):
+        for thread in threading.enumerate():
+            if thread.name.startswith("catalog-refresh-"):
+                thread.join(timeout=5)
+
+    def test_loaded_snapshots_are_persisted(self):
+        cache = CatalogCache(lambda p, l: (EXCHANGES, LISTINGS), indexer=sync_listing_index, store=self.store)
+
+        cache.get("p", "US")
+
+        self.assertEqual(len(self.store.load("p", "US").listings), 3)
+
+    def test_cold_start_serves_from_disk_then_reconciles(self):
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 1.0, sync_listing_index(None, LISTINGS))
+
+        release = threading.Event()
+        live_listings = LISTINGS[:2]
+
+        def loader(project_id, location):
+            release.wait(timeout=5)
+            return EXCHANGES, live_listings
+
+        cache = CatalogCache(loader, indexer=sync_listing_index, store=self.store)
+
+        snapshot = cache.get("p", "US")
+
+        # Served from disk while the live crawl is still blocked
+        self.assertEqual(len(snapshot.listings), 3)
+        self.assertEqual(snapshot.index.search("finance")[0][0], LISTINGS[2]["name"])
+        self.assertEqual(cache.stats()["store_loads"], 1)
+
+        release.set()
+        self._wait_for_refresh()
+
+        reconciled = cache.get("p", "US")
+        self.assertEqual(len(reconciled.listings), 2)
+        self.assertEqual(reconciled.index.search("finance"), [])
+        self.assertEqual(len(self.store.load("p", "US").listings), 2)
+
+    def test_non_blocking_cold_start_serves_from_disk(self):
+        self.store.save("p", "US", EXCHANGES, LISTINGS, 1.0, sync_listing_index(None, LISTINGS))
+        release = threading.Event()
+
+        def loader(project_id, location):
+            release.wait(timeout=5)
+            return EXCHANGES, LISTINGS[:2]
+
+        cache = CatalogCache(loader, indexer=sync_listing_index, store=self.store)
+
+        # The path limited searches take: never wait for a crawl
+        snapshot = cache.get("p", "US", block=False)
+
+        self.assertIsNotNone(snapshot)
+        self.assertEqual(len(snapshot.listings), 3)
+        self.assertEqual(cache.stats()["store_loads"], 1)
+        self.assertTrue(cache.stats()["snapshots"]["p/US"]["refreshing"])
+
+        release.set()
+        self._wait_for_refresh()
+        self.assertEqual(len(cache.get("p", "US").listings), 2)
+
+    def test_non_blocking_cold_start_without_store_loads_in_background(self):
+        cache = CatalogCache(lambda p, l: (EXCHANGES, LISTINGS), indexer=sync_listing_index, store=self.store)
+
+        self.assertIsNone(cache.get("p", "US", block=False))
+        self._wait_for_refresh()
+
+        self.assertEqual(len(cache.get("p", "US").listings), 3)
+        self.assertEqual(cache.stats()["store_loads"], 0)
+
+    def test_corrupt_store_falls_back_to_full_crawl(self):
+        with open(self.path, "wb") as f:
+            f.write(b"garbage" * 100)
+        cache = CatalogCache(lambda p, l: (EXCHANGES, LISTINGS), indexer=sync_listing_index, store=self.store)
+
+        snapshot = cache.get("p", "US")
+
+        self.assertEqual(len(snapshot.listings), 3)
+        self.assertEqual(cache.stats()["store_loads"], 0)
+        self.assertEqual(len(self.store.load("p", "US").listings), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Tests for tools/clients.py, the process-wide API client registry.
+"""
+
+import sys
+import os
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools import clients
+from tools.clients import ClientRegistry
+
+
+class TestClientRegistry(unittest.TestCase):
+
+    def test_same_key_returns_same_client(self):
+        factory = MagicMock()
+        registry = ClientRegistry()
+
+        first = registry.get(factory, "p1")
+        second = registry.get(factory, "p1")
+
+        self.assertIs(first, second)
+        factory.assert_called_once_with()
+
+    def test_project_and_endpoint_are_part_of_the_key(self):
+        factory = MagicMock(side_effect=lambda **kwargs: MagicMock())
+        registry = ClientRegistry()
+
+        a = registry.get(factory, "p1")
+        b = registry.get(factory, "p2")
+        c = registry.get(factory, "p1", endpoint="eu-dataplex.googleapis.com")
+
+        self.assertIsNot(a, b)
+        self.assertIsNot(a, c)
+        factory.assert_called_with(client_options={"api_endpoint": "eu-dataplex.googleapis.com"})
+
+    def test_pool_hands_out_clients_round_robin(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        registry = ClientRegistry(pool_size=2)
+
+        handed_out = [registry.get(factory, "p") for _ in range(4)]
+
+        self.assertEqual(factory.call_count, 2)
+        self.assertIs(handed_out[0], handed_out[2])
+        self.assertIs(handed_out[1], handed_out[3])
+        self.assertIsNot(handed_out[0], handed_out[1])
+
+    def test_concurrent_gets_build_a_single_client(self):
+        built = []
+
+        def slow_factory():
+            client = MagicMock()
+            built.append(client)
+            return client
+
+        registry = ClientRegistry()
+        barrier = threading.Barrier(8)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(registry.get(slow_factory, "p"))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(built), 1)
+        self.assertTrue(all(r is built[0] for r in results))
+
+    def test_override_returns_fake(self):
+        factory = MagicMock()
+        fake = object()
+        registry = ClientRegistry()
+
+        registry.override(factory, fake)
+        self.assertIs(registry.get(factory, "p"), fake)
+        factory.assert_not_called()
+
+        registry.clear_overrides()
+        self.assertIsNot(registry.get(factory, "p"), fake)
+
+    def test_close_closes_transports_and_empties_registry(self):
+        factory = MagicMock()
+        registry = ClientRegistry()
+        client = registry.get(factory, "p")
+
+        registry.close()
+
+        client.transport.close.assert_called_once()
+        registry.get(factory, "p")
+        self.assertEqual(factory.call_count, 2)
+
+    def test_close_tolerates_transport_errors(self):
+        factory = MagicMock()
+        factory.return_value.transport.close.side_effect = RuntimeError("already closed")
+        registry = ClientRegistry()
+        registry.get(factory, "p")
+
+        registry.close()  # must not raise
+
+    def test_invalid_pool_size_rejected(self):
+        with self.assertRaises(ValueError):
+            ClientRegistry(pool_size=0)
+
+
+class TestToolsUseRegistry(unittest.TestCase):
+
+    @patch("tools.data_product_tools.dataplex_v1.CatalogServiceClient")
+    def test_data_product_tools_reuse_catalog_client(self, mock_client_class):
+        from tools import data_product_tools
+        mock_client_class.return_value.search_entries.return_value = []
+
+        data_product_tools.search_data_products("a", "reuse-project")
+        data_product_tools.search_data_products("b", "reuse-project")
+
+        mock_client_class.assert_called_once_with()
+
+    def test_override_client_is_used_by_tools(self):
+        from tools import data_product_tools
+        fake = MagicMock()
+        fake.search_entries.return_value = []
+        clients.override_client(data_product_tools.dataplex_v1.CatalogServiceClient, fake)
+        try:
+            data_product_tools.search_data_products("sales", "p")
+        finally:
+            clients.clear_overrides()
+
+        fake.search_entries.assert_called_once()
+
+    def test_project_from_resource(self):
+        self.assertEqual(
+            clients.project_from_resource("projects/p1/locations/l/entryGroups/eg/entries/e"), "p1"
+        )
+        self.assertIsNone(clients.project_from_resource("not-a-resource"))
+        self.assertIsNone(clients.project_from_resource(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
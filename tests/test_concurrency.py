@@ -0,0 +1,389 @@
+"""
+Tests for tools/concurrency.py.
+
+Unit tests cover:
+  - map_bounded (input order, worker bound)
+  - map_with_timeout (input order, timeouts and errors are skipped)
+  - amap_with_timeout (same contract, awaited on an event loop)
+  - SingleFlight (shared results and errors, threads and coroutines)
+  - deadline_scope (timeouts bounded by the deadline, expired deadlines,
+    RPC timeouts, no_deadline)
+"""
+
+import asyncio
+import sys
+import os
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.concurrency import (
+    SingleFlight,
+    amap_with_timeout,
+    bounded_timeout,
+    deadline_scope,
+    map_bounded,
+    map_with_timeout,
+    no_deadline,
+    rpc_timeout,
+    run_before_deadline,
+    time_remaining,
+)
+
+
+class TestMapBounded(unittest.TestCase):
+
+    def test_preserves_input_order(self):
+        def slow_for_small(n):
+            time.sleep(0.01 * (5 - n))
+            return n * 10
+
+        self.assertEqual(map_bounded(slow_for_small, range(5), max_workers=5), [0, 10, 20, 30, 40])
+
+    def test_respects_worker_bound(self):
+        lock = threading.Lock()
+        state = {"in_flight": 0, "peak": 0}
+
+        def work(_):
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            time.sleep(0.02)
+            with lock:
+                state["in_flight"] -= 1
+
+        map_bounded(work, range(12), max_workers=4)
+
+        self.assertLessEqual(state["peak"], 4)
+
+    def test_empty_input(self):
+        self.assertEqual(map_bounded(str, [], max_workers=4), [])
+
+
+class TestMapWithTimeout(unittest.TestCase):
+
+    def test_returns_completed_results_in_input_order(self):
+        def work(n):
+            time.sleep(0.01 * (3 - n))
+            return n
+
+        self.assertEqual(map_with_timeout(work, [1, 2, 3], timeout=1), [(1, 1), (2, 2), (3, 3)])
+
+    def test_slow_items_are_skipped(self):
+        release = threading.Event()
+
+        def work(name):
+            if name == "slow":
+                release.wait(timeout=5)
+            return name.upper()
+
+        started = time.monotonic()
+        results = map_with_timeout(work, ["fast", "slow"], timeout=0.1)
+        elapsed = time.monotonic() - started
+        release.set()
+
+        self.assertEqual(results, [("fast", "FAST")])
+        self.assertLess(elapsed, 1)
+
+    def test_failing_items_are_skipped(self):
+        def work(n):
+            if n == 2:
+                raise RuntimeError("boom")
+            return n
+
+        self.assertEqual(map_with_timeout(work, [1, 2, 3], timeout=1), [(1, 1), (3, 3)])
+
+
+class TestAmapWithTimeout(unittest.TestCase):
+
+    def test_returns_completed_results_in_input_order(self):
+        def work(n):
+            time.sleep(0.01 * (3 - n))
+            return n
+
+        results = asyncio.run(amap_with_timeout(work, [1, 2, 3], timeout=1))
+        self.assertEqual(results, [(1, 1), (2, 2), (3, 3)])
+
+    def test_calls_run_concurrently(self):
+        both_running = threading.Barrier(2, timeout=2)
+
+        def work(n):
+            both_running.wait()
+            return n
+
+        self.assertEqual(asyncio.run(amap_with_timeout(work, [1, 2], timeout=3)), [(1, 1), (2, 2)])
+
+    def test_nested_fan_outs_are_not_starved_under_load(self):
+        # More concurrent outer calls than shared workers, each fanning out
+        # again like a contract batch does
+        def batch(n):
+            return map_with_timeout(lambda i: time.sleep(0.01) or i, range(3), timeout=2)
+
+        results = asyncio.run(amap_with_timeout(batch, range(64), timeout=10))
+
+        self.assertEqual(len(results), 64)
+        self.assertTrue(all(len(inner) == 3 for _, inner in results))
+
+    def test_slow_and_failing_items_are_skipped(self):
+        release = threading.Event()
+
+        def work(name):
+            if name == "slow":
+                release.wait(timeout=5)
+            if name == "bad":
+                raise RuntimeError("boom")
+            return name.upper()
+
+        started = time.monotonic()
+        results = asyncio.run(amap_with_timeout(work, ["fast", "slow", "bad"], timeout=0.1))
+        elapsed = time.monotonic() - started
+        release.set()
+
+        self.assertEqual(results, [("fast", "FAST")])
+        self.assertLess(elapsed, 1)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def _run_concurrently(self, flight, fn, callers=4):
+        """Start ``callers`` threads calling ``flight.do("key", fn)`` while fn is blocked."""
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(flight.do("key", fn))
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def _wait_for_followers(self, flight, followers):
+        deadline = time.monotonic() + 2
+        while flight.stats()["shared"] < followers and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            release.wait(timeout=2)
+            return ["result"]
+
+        threads, results, _ = self._run_concurrently(flight, work)
+        self._wait_for_followers(flight, 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [["result"]] * 4)
+        self.assertEqual(flight.stats(), {"executions": 1, "shared": 3, "in_flight": 0})
+
+    def test_errors_reach_every_caller(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def work():
+            release.wait(timeout=2)
+            raise RuntimeError("boom")
+
+        threads, _, errors = self._run_concurrently(flight, work, callers=3)
+        self._wait_for_followers(flight, 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+
+    def test_finished_calls_are_not_remembered(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+        self.assertEqual(flight.do("key", lambda: 2), 2)
+
+    def test_coroutines_share_a_call_owned_by_another_thread(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        owner = threading.Thread(target=flight.do, args=("key", lambda: release.wait(timeout=2) and 42))
+        owner.start()
+        self._wait_for_in_flight(flight)
+
+        async def follow():
+            return await asyncio.gather(
+                flight.ado("key", self._fail), flight.ado("key", self._fail)
+            )
+
+        release_soon = threading.Timer(0.05, release.set)
+        release_soon.start()
+        self.assertEqual(asyncio.run(follow()), [42, 42])
+        owner.join()
+
+    def test_cancelled_waiter_does_not_cancel_the_shared_call(self):
+        flight = SingleFlight()
+
+        async def run():
+            release = asyncio.Event()
+
+            async def work():
+                await release.wait()
+                return 42
+
+            owner = asyncio.ensure_future(flight.ado("key", work))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(flight.ado("key", self._fail)) for _ in range(2)]
+            await asyncio.sleep(0)
+            # The first waiter gives up, e.g. because its own timeout expired
+            waiters[0].cancel()
+            await asyncio.sleep(0)
+            release.set()
+            return await asyncio.gather(owner, *waiters, return_exceptions=True)
+
+        owner_result, cancelled, waiter_result = asyncio.run(run())
+        self.assertEqual(owner_result, 42)
+        self.assertIsInstance(cancelled, asyncio.CancelledError)
+        self.assertEqual(waiter_result, 42)
+        self.assertEqual(flight.stats(), {"executions": 1, "shared": 2, "in_flight": 0})
+
+    def test_cancelled_owner_does_not_cancel_the_shared_call(self):
+        flight = SingleFlight()
+
+        async def run():
+            release = asyncio.Event()
+            calls = []
+
+            async def work():
+                calls.append(1)
+                await release.wait()
+                return 42
+
+            owner = asyncio.ensure_future(flight.ado("key", work))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(flight.ado("key", self._fail))
+            await asyncio.sleep(0)
+            # The caller that started the call gives up, e.g. its client disconnected
+            owner.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(owner, waiter, return_exceptions=True)
+            return results, calls
+
+        (cancelled, waiter_result), calls = asyncio.run(run())
+        self.assertIsInstance(cancelled, asyncio.CancelledError)
+        self.assertEqual(waiter_result, 42)
+        self.assertEqual(calls, [1])
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_cancelled_waiter_does_not_hide_the_owners_error(self):
+        flight = SingleFlight()
+
+        async def run():
+            release = asyncio.Event()
+
+            async def work():
+                await release.wait()
+                raise RuntimeError("boom")
+
+            owner = asyncio.ensure_future(flight.ado("key", work))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(flight.ado("key", self._fail)) for _ in range(2)]
+            await asyncio.sleep(0)
+            waiters[0].cancel()
+            await asyncio.sleep(0)
+            release.set()
+            return await asyncio.gather(owner, waiters[1], return_exceptions=True)
+
+        owner_error, waiter_error = asyncio.run(run())
+        self.assertIsInstance(owner_error, RuntimeError)
+        self.assertIsInstance(waiter_error, RuntimeError)
+
+    def _wait_for_in_flight(self, flight):
+        deadline = time.monotonic() + 2
+        while not flight.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    @staticmethod
+    async def _fail():
+        raise AssertionError("follower must not run the call")
+
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_timeouts_are_bounded_by_the_deadline(self):
+        self.assertIsNone(time_remaining())
+        self.assertEqual(bounded_timeout(5), 5)
+        with deadline_scope(time.time() + 1):
+            self.assertLessEqual(bounded_timeout(5), 1)
+            self.assertLessEqual(bounded_timeout(None), 1)
+            self.assertEqual(bounded_timeout(0.5), 0.5)
+            # An inner scope cannot extend the outer deadline
+            with deadline_scope(time.time() + 60):
+                self.assertLessEqual(time_remaining(), 1)
+        self.assertIsNone(time_remaining())
+
+    def test_rpc_timeout_and_no_deadline(self):
+        self.assertEqual(rpc_timeout(), {})
+        self.assertEqual(rpc_timeout(30), {"timeout": 30})
+        with deadline_scope(time.time() + 1):
+            self.assertLessEqual(rpc_timeout()["timeout"], 1)
+            self.assertLessEqual(rpc_timeout(30)["timeout"], 1)
+            with no_deadline():
+                self.assertEqual(rpc_timeout(30), {"timeout": 30})
+            self.assertIsNotNone(time_remaining())
+
+    def test_fan_outs_stop_waiting_at_the_deadline(self):
+        release = threading.Event()
+
+        def work(item):
+            if item == "slow":
+                release.wait(timeout=5)
+            return item
+
+        try:
+            start = time.monotonic()
+            with deadline_scope(time.time() + 0.1):
+                results = map_with_timeout(work, ["fast", "slow"], timeout=10)
+            with deadline_scope(time.time() + 0.1):
+                async_results = asyncio.run(amap_with_timeout(work, ["fast", "slow"], timeout=10))
+            elapsed = time.monotonic() - start
+        finally:
+            release.set()
+
+        self.assertEqual(results, [("fast", "fast")])
+        self.assertEqual(async_results, [("fast", "fast")])
+        self.assertLess(elapsed, 1)
+
+    def test_nothing_is_started_after_the_deadline(self):
+        calls = []
+        with deadline_scope(time.time() - 1):
+            self.assertEqual(map_with_timeout(calls.append, [1, 2], timeout=10), [])
+            self.assertEqual(asyncio.run(amap_with_timeout(calls.append, [1, 2], timeout=10)), [])
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(run_before_deadline(calls.append, 3))
+        self.assertEqual(calls, [])
+
+    def test_run_before_deadline(self):
+        release = threading.Event()
+        self.assertEqual(asyncio.run(run_before_deadline(lambda x: x * 2, 21)), 42)
+        try:
+            with deadline_scope(time.time() + 0.1):
+                with self.assertRaises(asyncio.TimeoutError):
+                    asyncio.run(run_before_deadline(release.wait, 5))
+        finally:
+            release.set()
+
+    def test_worker_threads_see_the_deadline(self):
+        with deadline_scope(time.time() + 5):
+            results = map_with_timeout(lambda _: time_remaining(), [1], timeout=None)
+        self.assertGreater(results[0][1], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,18 @@
 Tests for tools/data_product_tools.py and the agent's data-product enrichment node.
 
 Unit tests cover:
-  - search_data_products (happy path, filtering, API error)
+  - search_data_products (happy path, filtering, API error, server-side type
+    filter, max_results cap)
+  - iter_data_products (stops paging once enough products are found)
   - get_data_product (happy path, API error)
+  - get_data_products (batching, TTL cache, in-flight deduplication)
+  - aspect extraction from real Entry protos (targeted keys, plain types,
+    overview fallback) and decode_aspects
   - find_matching_product (exact, partial, case-insensitive, no match)
+  - match_listings_to_products (same semantics as find_matching_product, linear join)
+  - linked-resource joins (ProductIndex, find_matching_product)
   - merge_listing_with_data_product (unique fields, conflicts, clean merge)
+  - merge memoization (hits, version changes, invalidation)
 
 Integration tests (all GCP/LLM calls mocked) cover:
   - Full agent flow with data-product enrichment when a match is found
@@ -14,6 +22,7 @@ Integration tests (all GCP/LLM calls mocked) cover:
 
 import sys
 import os
+import threading
 import unittest
 from unittest.mock import MagicMock, patch, PropertyMock
 
@@ -21,7 +30,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from tools import data_product_tools
 from tools.data_product_tools import (
+    ProductIndex,
     find_matching_product,
+    match_listings_to_products,
     merge_listing_with_data_product,
 )
 
@@ -127,6 +138,44 @@ class TestSearchDataProducts(unittest.TestCase):
 
         self.assertEqual(results, [])
 
+    @patch("tools.data_product_tools.dataplex_v1.CatalogServiceClient")
+    def test_type_filter_and_page_size_are_sent_to_the_api(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        mock_client.search_entries.return_value = []
+
+        data_product_tools.search_data_products("sales", "my-project", page_size=20)
+
+        request = mock_client.search_entries.call_args.kwargs["request"]
+        self.assertEqual(request.query, f"(sales) {data_product_tools.DATA_PRODUCT_TYPE_FILTER}")
+        self.assertEqual(request.page_size, 20)
+
+    @patch("tools.data_product_tools.dataplex_v1.CatalogServiceClient")
+    def test_max_results_caps_results_and_page_size(self, mock_client_class):
+        entries = [_make_entry(name=f"projects/p/locations/l/entryGroups/eg/entries/p{i}") for i in range(5)]
+        mock_client = mock_client_class.return_value
+        mock_client.search_entries.return_value = [_make_search_result(e) for e in entries]
+
+        results = data_product_tools.search_data_products("sales", "my-project", max_results=2)
+
+        self.assertEqual([r["name"] for r in results], [e.name for e in entries[:2]])
+        self.assertEqual(mock_client.search_entries.call_args.kwargs["request"].page_size, 2)
+
+    @patch("tools.data_product_tools.dataplex_v1.CatalogServiceClient")
+    def test_streaming_search_stops_consuming_results_early(self, mock_client_class):
+        pulled = []
+
+        def pager():
+            for i in range(100):
+                pulled.append(i)
+                yield _make_search_result(_make_entry(name=f"projects/p/locations/l/entryGroups/eg/entries/p{i}"))
+
+        mock_client_class.return_value.search_entries.return_value = pager()
+
+        results = list(data_product_tools.iter_data_products("sales", "my-project", max_results=3))
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(pulled), 3)
+
 
 # ---------------------------------------------------------------------------
 # get_data_product
@@ -156,6 +205,129 @@ class TestGetDataProduct(unittest.TestCase):
         self.assertEqual(result, {})
 
 
+# ---------------------------------------------------------------------------
+# get_data_products
+# ---------------------------------------------------------------------------
+
+class TestGetDataProducts(unittest.TestCase):
+
+    def setUp(self):
+        data_product_tools._entry_cache.clear()
+        self.addCleanup(data_product_tools._entry_cache.clear)
+        patcher = patch("tools.data_product_tools.dataplex_v1.CatalogServiceClient")
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.client.get_entry.side_effect = lambda request: _make_entry(name=request.name)
+
+    def test_fetches_each_distinct_name_once(self):
+        names = [f"projects/p/locations/l/entryGroups/eg/entries/p{i}" for i in range(4)]
+
+        results = data_product_tools.get_data_products(names + names[:2] + [""])
+
+        self.assertEqual(list(results), names)
+        self.assertEqual(self.client.get_entry.call_count, 4)
+
+    def test_results_are_cached_by_name(self):
+        name = "projects/p/locations/l/entryGroups/eg/entries/p1"
+
+        data_product_tools.get_data_products([name])
+        results = data_product_tools.get_data_products([name])
+
+        self.assertEqual(results[name]["name"], name)
+        self.assertEqual(self.client.get_entry.call_count, 1)
+
+    def test_failed_lookups_are_omitted_and_not_cached(self):
+        from google.api_core import exceptions as gcp_exceptions
+        self.client.get_entry.side_effect = gcp_exceptions.GoogleAPICallError("not found")
+
+        self.assertEqual(data_product_tools.get_data_products(["missing"]), {})
+        self.assertEqual(data_product_tools.get_data_products(["missing"]), {})
+        self.assertEqual(self.client.get_entry.call_count, 2)
+
+    def test_concurrent_requests_for_one_name_share_a_lookup(self):
+        name = "projects/p/locations/l/entryGroups/eg/entries/p1"
+        started, release = threading.Event(), threading.Event()
+
+        def slow_get_entry(request):
+            started.set()
+            release.wait(timeout=5)
+            return _make_entry(name=request.name)
+
+        self.client.get_entry.side_effect = slow_get_entry
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(data_product_tools.get_data_products([name])))
+            for _ in range(3)
+        ]
+        threads[0].start()
+        started.wait(timeout=5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result[name]["name"] == name for result in results))
+        self.assertEqual(self.client.get_entry.call_count, 1)
+
+
+# ---------------------------------------------------------------------------
+# Aspect extraction
+# ---------------------------------------------------------------------------
+
+class TestAspectExtraction(unittest.TestCase):
+
+    def _entry(self, description="", **aspects):
+        # Real Aspect protos, so data is a proto-plus Struct wrapper
+        from google.cloud import dataplex_v1
+        proto = dataplex_v1.Entry(aspects={
+            f"p.global.{aspect_type}": dataplex_v1.Aspect(data=data)
+            for aspect_type, data in aspects.items()
+        })
+        return _make_entry(description=description, aspects=proto.aspects)
+
+    def _product(self, entry):
+        return data_product_tools._normalize_entry(entry)
+
+    def test_reads_known_keys_as_plain_python_values(self):
+        entry = self._entry(**{
+            "data-product-metadata": {"ownerTeam": "alpha", "domain": "sales", "unused": {"big": [1, 2]}},
+            "data-product-exchange": {"linkedResources": ["projects/p/locations/us/dataExchanges/ex/listings/l1"]},
+        })
+
+        product = self._product(entry)
+
+        self.assertEqual(product["owner_team"], "alpha")
+        self.assertEqual(product["domain"], "sales")
+        self.assertIs(type(product["linked_resources"]), list)
+        self.assertEqual(product["linked_resources"], ["projects/p/locations/us/dataExchanges/ex/listings/l1"])
+        self.assertNotIn("unused", product)
+
+    def test_exchange_aspect_without_links_yields_empty_list(self):
+        product = self._product(self._entry(**{"data-product-exchange": {"documentationUrl": "https://docs"}}))
+
+        self.assertEqual(product["linked_resources"], [])
+        self.assertEqual(product["documentation_url"], "https://docs")
+
+    def test_overview_is_only_a_description_fallback(self):
+        overview = {"overview": {"details": "From overview"}}
+
+        self.assertEqual(self._product(self._entry(**overview))["description"], "From overview")
+        self.assertEqual(self._product(self._entry("From entry", **overview))["description"], "From entry")
+
+    def test_decode_aspects_returns_full_plain_data(self):
+        entry = self._entry(**{
+            "data-product-metadata": {"ownerTeam": "alpha", "extra": {"tags": ["a", "b"]}},
+            "overview": {"details": "x"},
+        })
+
+        decoded = data_product_tools.decode_aspects(entry, ["data-product-metadata"])
+
+        self.assertEqual(decoded, {"p.global.data-product-metadata": {"ownerTeam": "alpha", "extra": {"tags": ["a", "b"]}}})
+        self.assertIs(type(decoded["p.global.data-product-metadata"]["extra"]["tags"]), list)
+
+
 # ---------------------------------------------------------------------------
 # find_matching_product
 # ---------------------------------------------------------------------------
@@ -217,6 +389,116 @@ class TestFindMatchingProduct(unittest.TestCase):
         self.assertIsNone(result)
 
 
+# ---------------------------------------------------------------------------
+# match_listings_to_products
+# ---------------------------------------------------------------------------
+
+class TestMatchListingsToProducts(unittest.TestCase):
+
+    def setUp(self):
+        self.products = [
+            {"name": "dp1", "display_name": "Global Sales Data"},
+            {"name": "dp2", "display_name": "Marketing Clickstream"},
+            {"name": "dp1-dup", "display_name": "global  sales data"},
+            {"name": "dp-empty", "display_name": ""},
+        ]
+
+    def test_matches_agree_with_find_matching_product(self):
+        listings = [
+            _make_bq_listing(display_name="Global Sales Data", listing_id="a"),
+            _make_bq_listing(display_name="  marketing   CLICKSTREAM ", listing_id="b"),
+            _make_bq_listing(display_name="Sales Data", listing_id="c"),
+            _make_bq_listing(display_name="", listing_id="d"),
+        ]
+
+        pairs = match_listings_to_products(listings, self.products)
+
+        self.assertEqual([listing for listing, _ in pairs], listings)
+        for listing, matched in pairs:
+            self.assertIs(matched, find_matching_product(listing, self.products))
+
+    def test_first_matching_product_wins(self):
+        listing = _make_bq_listing(display_name="Global Sales Data")
+
+        [(_, matched)] = match_listings_to_products([listing], self.products)
+
+        self.assertEqual(matched["name"], "dp1")
+
+    def test_each_name_is_normalized_once(self):
+        listings = [_make_bq_listing(listing_id=str(i)) for i in range(10)]
+
+        with patch(
+            "tools.data_product_tools._normalize_name",
+            wraps=data_product_tools._normalize_name,
+        ) as normalize:
+            match_listings_to_products(listings, self.products)
+
+        self.assertEqual(normalize.call_count, len(listings) + len(self.products))
+
+    def test_empty_inputs(self):
+        self.assertEqual(match_listings_to_products([], self.products), [])
+        listing = _make_bq_listing()
+        self.assertEqual(match_listings_to_products([listing], []), [(listing, None)])
+
+
+# ---------------------------------------------------------------------------
+# Linked-resource joins
+# ---------------------------------------------------------------------------
+
+class TestLinkedResourceJoin(unittest.TestCase):
+
+    LISTING_NAME = "projects/p/locations/US/dataExchanges/ex/listings/listing1"
+
+    def setUp(self):
+        self.name_match = {"name": "dp-name", "display_name": "Global Sales Data"}
+        self.linked = {
+            "name": "dp-linked",
+            "display_name": "Sales (Curated, v2)",
+            "linked_resources": [
+                "//bigquery.googleapis.com/projects/p/datasets/sales",
+                f"//analyticshub.googleapis.com/{self.LISTING_NAME.replace('/US/', '/us/')}",
+            ],
+        }
+        self.products = [self.name_match, self.linked]
+
+    def test_linked_resource_match_wins_over_name_match(self):
+        listing = _make_bq_listing(display_name="Global Sales Data")
+
+        self.assertIs(ProductIndex(self.products).match(listing), self.linked)
+        self.assertIs(find_matching_product(listing, self.products), self.linked)
+
+    def test_title_drift_is_matched_through_linked_resource(self):
+        listing = _make_bq_listing(display_name="Global Sales Data (2024 refresh)")
+
+        [(_, matched)] = match_listings_to_products([listing], self.products)
+
+        self.assertIs(matched, self.linked)
+
+    def test_falls_back_to_display_name(self):
+        listing = _make_bq_listing(display_name="Global Sales Data", listing_id="other")
+
+        self.assertIs(ProductIndex(self.products).match(listing), self.name_match)
+        self.assertIs(find_matching_product(listing, self.products), self.name_match)
+
+    def test_relative_resource_names_match(self):
+        product = {"name": "dp3", "display_name": "X", "linked_resources": [self.LISTING_NAME]}
+
+        self.assertIs(ProductIndex([product]).match(_make_bq_listing()), product)
+
+    def test_prebuilt_index_is_reused(self):
+        index = ProductIndex(self.products)
+        listings = [_make_bq_listing(), _make_bq_listing(display_name="Global Sales Data", listing_id="x")]
+
+        pairs = match_listings_to_products(listings, index)
+
+        self.assertEqual([m["name"] for _, m in pairs], ["dp-linked", "dp-name"])
+
+    def test_non_string_linked_resources_are_ignored(self):
+        product = {"name": "dp4", "display_name": "Y", "linked_resources": [None, 42, ""]}
+
+        self.assertEqual(ProductIndex([product]).by_resource, {})
+
+
 # ---------------------------------------------------------------------------
 # merge_listing_with_data_product
 # ---------------------------------------------------------------------------
@@ -314,6 +596,85 @@ class TestMergeListingWithDataProduct(unittest.TestCase):
         self.assertNotIn("conflicting_fields", merged)
 
 
+class TestMergeMemoization(unittest.TestCase):
+
+    def setUp(self):
+        data_product_tools._merge_cache.clear()
+        data_product_tools._product_versions.clear()
+        self.addCleanup(data_product_tools.invalidate_merged_records)
+
+    def _product(self, update_time="2024-01-01T00:00:00Z", **kwargs):
+        product = {
+            "name": "projects/p/locations/l/entryGroups/eg/entries/dp1",
+            "display_name": "Global Sales Data",
+            "description": "Curated sales dataset",
+            "owner_team": "data-team-alpha",
+            "update_time": update_time,
+        }
+        product.update(kwargs)
+        return product
+
+    def test_repeat_merge_is_served_from_cache(self):
+        listing = _make_bq_listing()
+
+        first = merge_listing_with_data_product(listing, self._product())
+        second = merge_listing_with_data_product(listing, self._product())
+
+        self.assertEqual(first, second)
+        self.assertEqual(data_product_tools.merge_cache_stats()["hits"], 1)
+
+    def test_cached_merge_keeps_current_listing_fields(self):
+        merge_listing_with_data_product(_make_bq_listing(), self._product())
+
+        listing = {**_make_bq_listing(), "relevance_score": 3.5}
+        merged = merge_listing_with_data_product(listing, self._product())
+
+        self.assertEqual(merged["relevance_score"], 3.5)
+        self.assertEqual(merged["data_product_unique_fields"]["owner_team"], "data-team-alpha")
+
+    def test_new_product_version_is_remerged(self):
+        listing = _make_bq_listing()
+        merge_listing_with_data_product(listing, self._product())
+
+        merged = merge_listing_with_data_product(
+            listing, self._product(update_time="2024-02-01T00:00:00Z", owner_team="new-team")
+        )
+
+        self.assertEqual(merged["data_product_unique_fields"]["owner_team"], "new-team")
+
+    def test_changed_listing_description_is_remerged(self):
+        merge_listing_with_data_product(_make_bq_listing(description="Curated sales dataset"), self._product())
+
+        merged = merge_listing_with_data_product(_make_bq_listing(description="Other"), self._product())
+
+        self.assertEqual(merged["conflicting_fields"]["description"]["bq_value"], "Other")
+
+    def test_products_without_update_time_are_not_cached(self):
+        merge_listing_with_data_product(_make_bq_listing(), self._product(update_time=None))
+
+        self.assertEqual(data_product_tools.merge_cache_stats()["size"], 0)
+
+    def test_invalidate_by_product_name(self):
+        merge_listing_with_data_product(_make_bq_listing(listing_id="a"), self._product())
+        merge_listing_with_data_product(
+            _make_bq_listing(listing_id="b"), self._product(name="projects/p/locations/l/entryGroups/eg/entries/dp2")
+        )
+
+        removed = data_product_tools.invalidate_merged_records(self._product()["name"])
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(data_product_tools.merge_cache_stats()["size"], 1)
+
+    def test_observing_a_newer_version_invalidates_merges(self):
+        product = self._product()
+        data_product_tools._observe_product_versions([product])
+        merge_listing_with_data_product(_make_bq_listing(), product)
+
+        data_product_tools._observe_product_versions([self._product(update_time="2024-03-01T00:00:00Z")])
+
+        self.assertEqual(data_product_tools.merge_cache_stats()["size"], 0)
+
+
 # ---------------------------------------------------------------------------
 # Integration: agent flow with data-product enrichment
 # ---------------------------------------------------------------------------
@@ -342,8 +703,12 @@ class TestAgentDataProductEnrichmentFlow(unittest.TestCase):
                 "listing_id": "listing1",
             }
         ]
-        mock_dataplex.get_data_quality_score.return_value = 0.95
-        mock_dataplex.get_data_contract_info.return_value = {"status": "active"}
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.95 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {"status": "active"} for r in resources}
+        )
 
         matched_product = {
             "name": "projects/p/locations/l/entryGroups/eg/entries/dp1",
@@ -354,7 +719,13 @@ class TestAgentDataProductEnrichmentFlow(unittest.TestCase):
             "status": "production",
         }
         mock_dp_tools.search_data_products.return_value = [matched_product]
-        mock_dp_tools.find_matching_product.return_value = matched_product
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, matched_product) for l in listings]
+        )
+        # The full entry adds aspect fields the search result did not carry
+        mock_dp_tools.get_data_products.return_value = {
+            matched_product["name"]: {**matched_product, "sla_tier": "gold"}
+        }
         mock_dp_tools.merge_listing_with_data_product.side_effect = (
             merge_listing_with_data_product
         )
@@ -372,6 +743,8 @@ class TestAgentDataProductEnrichmentFlow(unittest.TestCase):
         self.assertEqual(unique.get("owner_team"), "data-team-alpha")
         self.assertEqual(unique.get("domain"), "sales")
         self.assertEqual(unique.get("status"), "production")
+        self.assertEqual(unique.get("sla_tier"), "gold")
+        mock_dp_tools.get_data_products.assert_called_once_with([matched_product["name"]])
 
     @patch("agent_engine.ChatVertexAI")
     @patch("agent_engine.data_product_tools")
@@ -389,11 +762,17 @@ class TestAgentDataProductEnrichmentFlow(unittest.TestCase):
                 "listing_id": "listing2",
             }
         ]
-        mock_dataplex.get_data_quality_score.return_value = 0.7
-        mock_dataplex.get_data_contract_info.return_value = {"status": "pending"}
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.7 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {"status": "pending"} for r in resources}
+        )
 
         mock_dp_tools.search_data_products.return_value = []
-        mock_dp_tools.find_matching_product.return_value = None
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
 
         agent = self._build_agent(mock_llm)
         result = agent.invoke({"query": "obscure dataset", "messages": []})
@@ -414,14 +793,20 @@ class TestAgentDataProductEnrichmentFlow(unittest.TestCase):
         mock_bq.search_listings.return_value = [
             {"name": "n", "display_name": "Global Sales Data", "description": "", "listing_id": "l1"}
         ]
-        mock_dataplex.get_data_quality_score.return_value = 0.9
-        mock_dataplex.get_data_contract_info.return_value = {}
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
 
         products = [
             {"name": "dp1", "display_name": "Global Sales Data", "owner_team": "team-x"}
         ]
         mock_dp_tools.search_data_products.return_value = products
-        mock_dp_tools.find_matching_product.return_value = None  # no merge needed here
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]  # no merge needed here
+        )
 
         agent = self._build_agent(mock_llm)
         result = agent.invoke({"query": "sales", "messages": []})
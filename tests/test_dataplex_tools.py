@@ -0,0 +1,298 @@
+"""
+Tests for tools/dataplex_tools.py.
+
+Unit tests cover:
+  - get_data_quality_scores (scan matching, score normalisation, averaging,
+    unknown resources, API errors)
+  - result caching until a newer scan job finishes
+  - batched, concurrent scan lookups
+  - get_data_contracts (aspect decoding, BigQuery entry mapping, shared cache,
+    partial results on errors and timeouts)
+"""
+
+import sys
+import os
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from google.api_core import exceptions as gcp_exceptions
+from google.cloud import dataplex_v1
+
+from tools import clients, dataplex_tools
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _end_time(day):
+    return datetime(2024, 1, day, tzinfo=timezone.utc)
+
+
+class FakeDataScanServiceClient:
+    """In-memory stand-in for DataScanServiceClient."""
+
+    def __init__(self, delay=0.0):
+        self.scans = {}
+        self.delay = delay
+        self.failing = set()
+        self.list_calls = 0
+        self.get_calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def add_scan(self, scan_id, resource, score=None, day=1, project="p", location="us",
+                 scan_type=dataplex_v1.DataScanType.DATA_QUALITY):
+        name = f"projects/{project}/locations/{location}/dataScans/{scan_id}"
+        result = dataplex_v1.DataQualityResult(passed=True)
+        if score is not None:
+            result.score = score
+        self.scans[name] = dataplex_v1.DataScan(
+            name=name,
+            type_=scan_type,
+            data=dataplex_v1.DataSource(resource=resource),
+            execution_status=dataplex_v1.DataScan.ExecutionStatus(latest_job_end_time=_end_time(day)),
+            data_quality_result=result,
+        )
+        return name
+
+    def finish_job(self, name, score, day):
+        self.scans[name].data_quality_result.score = score
+        self.scans[name].execution_status.latest_job_end_time = _end_time(day)
+
+    def list_data_scans(self, request, timeout=None):
+        self.list_calls += 1
+        if request.parent in self.failing:
+            raise gcp_exceptions.GoogleAPICallError("unavailable")
+        basic = []
+        for name, scan in self.scans.items():
+            if name.startswith(request.parent + "/"):
+                scan = dataplex_v1.DataScan(scan)
+                scan.data_quality_result = None  # BASIC view
+                basic.append(scan)
+        return basic
+
+    def get_data_scan(self, request, timeout=None):
+        with self._lock:
+            self.get_calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            return self.scans[request.name]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeCatalogServiceClient:
+    """In-memory stand-in for CatalogServiceClient.lookup_entry."""
+
+    def __init__(self):
+        self.contracts = {}  # entry name -> contract aspect data
+        self.delays = {}
+        self.failing = set()
+        self.requests = []
+
+    def lookup_entry(self, request, timeout=None):
+        self.requests.append(request)
+        time.sleep(self.delays.get(request.entry, 0))
+        if request.entry in self.failing:
+            raise gcp_exceptions.ServiceUnavailable("unavailable")
+        if request.entry not in self.contracts:
+            raise gcp_exceptions.NotFound("no such entry")
+        aspects = {}
+        if self.contracts[request.entry] is not None:
+            aspects["p.global.data-contract"] = dataplex_v1.Aspect(data=self.contracts[request.entry])
+        return dataplex_v1.Entry(name=request.entry, aspects=aspects)
+
+
+def _bq_entry(dataset, project="p", location="us"):
+    return (f"projects/{project}/locations/{location}/entryGroups/@bigquery/"
+            f"entries/bigquery.googleapis.com/projects/{project}/datasets/{dataset}")
+
+
+class _QualityTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeDataScanServiceClient()
+        clients.override_client(dataplex_v1.DataScanServiceClient, self.fake)
+        self.addCleanup(clients.clear_overrides)
+        for cached in (dataplex_tools._scan_lists, dataplex_tools._scan_scores):
+            cached.clear()
+            self.addCleanup(cached.clear)
+
+
+# ---------------------------------------------------------------------------
+# get_data_quality_scores
+# ---------------------------------------------------------------------------
+
+class TestGetDataQualityScores(_QualityTestCase):
+
+    def test_scores_are_normalised_to_unit_range(self):
+        self.fake.add_scan("s1", "//bigquery.googleapis.com/projects/p/datasets/d/tables/t", score=87.5)
+
+        scores = dataplex_tools.get_data_quality_scores(["projects/p/datasets/d/tables/t"])
+
+        self.assertEqual(scores, {"projects/p/datasets/d/tables/t": 0.875})
+
+    def test_dataset_score_averages_its_table_scans(self):
+        self.fake.add_scan("s1", "//bigquery.googleapis.com/projects/p/datasets/d/tables/a", score=90)
+        self.fake.add_scan("s2", "//bigquery.googleapis.com/projects/p/datasets/d/tables/b", score=70)
+        self.fake.add_scan("s3", "//bigquery.googleapis.com/projects/p/datasets/d2/tables/a", score=10)
+
+        scores = dataplex_tools.get_data_quality_scores(["projects/p/datasets/d"])
+
+        self.assertEqual(scores["projects/p/datasets/d"], 0.8)
+
+    def test_unscanned_and_unscored_resources_are_none(self):
+        self.fake.add_scan("s1", "//bigquery.googleapis.com/projects/p/datasets/d/tables/t")
+        self.fake.add_scan(
+            "s2", "//bigquery.googleapis.com/projects/p/datasets/e/tables/t", score=50,
+            scan_type=dataplex_v1.DataScanType.DATA_PROFILE,
+        )
+
+        scores = dataplex_tools.get_data_quality_scores(
+            ["projects/p/datasets/d", "projects/p/datasets/e", "projects/p/datasets/none", "not-a-resource"]
+        )
+
+        self.assertEqual(set(scores), {"projects/p/datasets/d", "projects/p/datasets/e",
+                                       "projects/p/datasets/none", "not-a-resource"})
+        self.assertTrue(all(score is None for score in scores.values()))
+
+    def test_list_errors_yield_none(self):
+        self.fake.add_scan("s1", "//bigquery.googleapis.com/projects/p/datasets/d/tables/t", score=80)
+        self.fake.failing.add("projects/p/locations/us")
+
+        scores = dataplex_tools.get_data_quality_scores(["projects/p/datasets/d"])
+
+        self.assertIsNone(scores["projects/p/datasets/d"])
+
+    def test_single_lookup_wrapper(self):
+        self.fake.add_scan("s1", "//bigquery.googleapis.com/projects/p/datasets/d/tables/t", score=60)
+
+        self.assertEqual(dataplex_tools.get_data_quality_score("projects/p/datasets/d", "US"), 0.6)
+
+
+# ---------------------------------------------------------------------------
+# Caching and batching
+# ---------------------------------------------------------------------------
+
+class TestQualityCaching(_QualityTestCase):
+
+    def test_results_are_reused_until_a_new_job_finishes(self):
+        name = self.fake.add_scan("s1", "//bigquery.googleapis.com/projects/p/datasets/d/tables/t", score=80)
+        resource = ["projects/p/datasets/d"]
+
+        dataplex_tools.get_data_quality_scores(resource)
+        dataplex_tools._scan_lists.clear()  # scan list TTL expired
+        self.assertEqual(dataplex_tools.get_data_quality_scores(resource)["projects/p/datasets/d"], 0.8)
+        self.assertEqual(self.fake.get_calls, 1)
+
+        self.fake.finish_job(name, score=40, day=2)
+        dataplex_tools._scan_lists.clear()
+
+        self.assertEqual(dataplex_tools.get_data_quality_scores(resource)["projects/p/datasets/d"], 0.4)
+        self.assertEqual(self.fake.get_calls, 2)
+
+    def test_scan_list_is_reused_within_its_ttl(self):
+        self.fake.add_scan("s1", "//bigquery.googleapis.com/projects/p/datasets/d/tables/t", score=80)
+
+        dataplex_tools.get_data_quality_scores(["projects/p/datasets/d"])
+        dataplex_tools.get_data_quality_scores(["projects/p/datasets/d/tables/t"])
+
+        self.assertEqual(self.fake.list_calls, 1)
+
+    def test_scans_are_fetched_concurrently(self):
+        self.fake.delay = 0.05
+        resources = []
+        for i in range(8):
+            self.fake.add_scan(f"s{i}", f"//bigquery.googleapis.com/projects/p/datasets/d{i}/tables/t", score=50)
+            resources.append(f"projects/p/datasets/d{i}")
+
+        started = time.perf_counter()
+        scores = dataplex_tools.get_data_quality_scores(resources, max_concurrency=8)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(set(scores.values()), {0.5})
+        self.assertGreater(self.fake.max_in_flight, 1)
+        self.assertLess(elapsed, 8 * 0.05)
+
+
+# ---------------------------------------------------------------------------
+# get_data_contracts
+# ---------------------------------------------------------------------------
+
+class TestGetDataContracts(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeCatalogServiceClient()
+        clients.override_client(dataplex_v1.CatalogServiceClient, self.fake)
+        self.addCleanup(clients.clear_overrides)
+        dataplex_tools._contracts.clear()
+        self.addCleanup(dataplex_tools._contracts.clear)
+
+    def test_reads_contract_aspect_of_bigquery_dataset_entries(self):
+        self.fake.contracts[_bq_entry("d")] = {"status": "active", "owner": "team-a", "sla": "99.9%", "other": "x"}
+
+        contracts = dataplex_tools.get_data_contracts(["projects/p/datasets/d"], "US")
+
+        self.assertEqual(contracts, {"projects/p/datasets/d": {"status": "active", "owner": "team-a", "sla": "99.9%"}})
+        self.assertEqual(self.fake.requests[0].name, "projects/p/locations/us")
+
+    def test_entries_without_contract_map_to_empty_dict(self):
+        self.fake.contracts[_bq_entry("plain")] = None
+
+        contracts = dataplex_tools.get_data_contracts(["projects/p/datasets/plain", "projects/p/datasets/unknown"])
+
+        self.assertEqual(contracts, {"projects/p/datasets/plain": {}, "projects/p/datasets/unknown": {}})
+
+    def test_contracts_are_cached_across_requests(self):
+        self.fake.contracts[_bq_entry("d")] = {"status": "active"}
+
+        dataplex_tools.get_data_contracts(["projects/p/datasets/d"])
+        dataplex_tools.get_data_contracts(["projects/p/datasets/d", "projects/p/datasets/d"])
+
+        self.assertEqual(len(self.fake.requests), 1)
+
+    def test_failed_lookups_are_left_out_and_retried(self):
+        self.fake.contracts[_bq_entry("ok")] = {"status": "active"}
+        self.fake.contracts[_bq_entry("bad")] = {"status": "active"}
+        self.fake.failing.add(_bq_entry("bad"))
+
+        contracts = dataplex_tools.get_data_contracts(["projects/p/datasets/ok", "projects/p/datasets/bad"])
+        self.assertEqual(list(contracts), ["projects/p/datasets/ok"])
+
+        self.fake.failing.clear()
+        contracts = dataplex_tools.get_data_contracts(["projects/p/datasets/bad"])
+        self.assertEqual(contracts["projects/p/datasets/bad"], {"status": "active"})
+
+    def test_slow_lookups_are_left_out_but_fill_the_cache(self):
+        self.fake.contracts[_bq_entry("fast")] = {"status": "active"}
+        self.fake.contracts[_bq_entry("slow")] = {"status": "draft"}
+        self.fake.delays[_bq_entry("slow")] = 0.3
+
+        contracts = dataplex_tools.get_data_contracts(
+            ["projects/p/datasets/fast", "projects/p/datasets/slow"], timeout=0.1
+        )
+        self.assertEqual(list(contracts), ["projects/p/datasets/fast"])
+
+        time.sleep(0.4)
+        contracts = dataplex_tools.get_data_contracts(["projects/p/datasets/slow"], timeout=0.1)
+        self.assertEqual(contracts["projects/p/datasets/slow"], {"status": "draft"})
+        self.assertEqual(len(self.fake.requests), 2)
+
+    def test_catalog_entry_names_are_used_as_is(self):
+        name = "projects/p/locations/us/entryGroups/eg/entries/e1"
+        self.fake.contracts[name] = {"status": "active"}
+
+        self.assertEqual(dataplex_tools.get_data_contract_info(name), {"status": "active"})
+
+
+if __name__ == "__main__":
+    unittest.main()
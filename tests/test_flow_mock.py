@@ -1,7 +1,7 @@
 import unittest
 from unittest.mock import MagicMock, patch
 import json
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
 
 # Import the code to test
 # Assuming agent_engine.py is in the parent directory or pythonpath
@@ -29,7 +29,9 @@ class TestBigQuerySharingAgent(unittest.TestCase):
 
         # Mock Data Product Tool (no co-listed products in this scenario)
         mock_dp_tools.search_data_products.return_value = []
-        mock_dp_tools.find_matching_product.return_value = None
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
 
         # Mock BigQuery Tool
         mock_bq.search_listings.return_value = [
@@ -48,8 +50,12 @@ class TestBigQuerySharingAgent(unittest.TestCase):
         ]
         
         # Mock Dataplex Tool
-        mock_dataplex.get_data_quality_score.return_value = 0.98
-        mock_dataplex.get_data_contract_info.return_value = {"status": "verified"}
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.98 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {"status": "verified"} for r in resources}
+        )
 
         # 2. Initialize Agent
         agent = BigQuerySharingAgent(project_id="test-project", location="us-central1")
@@ -98,5 +104,593 @@ class TestBigQuerySharingAgent(unittest.TestCase):
         self.assertEqual(sub_result, "Success: Subscribed to listing1")
         print("✅ Subscription Flow Verified")
 
+class TestMultiLocationSearch(unittest.TestCase):
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_results_from_all_locations_are_merged(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        def search_listings(query, project_id, location, limit=None):
+            return [{
+                "name": f"projects/p/locations/{location}/dataExchanges/e/listings/{location}-sales",
+                "display_name": f"{location} Sales",
+                "listing_id": f"{location}-sales",
+                "location": location,
+                "relevance_score": {"US": 1.0, "EU": 2.0}[location],
+            }]
+
+        mock_bq.search_listings.side_effect = search_listings
+        mock_dp_tools.search_data_products.return_value = []
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
+
+        agent = BigQuerySharingAgent(project_id="test-project", locations=["US", "EU"])
+        result = agent.invoke({"query": "sales", "messages": []})
+
+        listings = result.get("listings")
+        # Ordered by relevance across locations, each carrying its origin
+        self.assertEqual([l["location"] for l in listings], ["EU", "US"])
+        searched = sorted(call.args[2] for call in mock_bq.search_listings.call_args_list)
+        self.assertEqual(searched, ["EU", "US"])
+        self.assertEqual(mock_dp_tools.search_data_products.call_count, 2)
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_slow_location_does_not_hold_up_results(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        import threading
+        release = threading.Event()
+
+        def search_listings(query, project_id, location, limit=None):
+            if location == "asia-northeast1":
+                release.wait(timeout=5)
+            return [{"name": f"{location}-listing", "display_name": "Sales", "location": location}]
+
+        mock_bq.search_listings.side_effect = search_listings
+        mock_dp_tools.search_data_products.return_value = []
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
+
+        agent = BigQuerySharingAgent(
+            project_id="test-project", locations=["US", "asia-northeast1"], location_timeout=0.2
+        )
+        try:
+            result = agent.invoke({"query": "sales", "messages": []})
+        finally:
+            release.set()
+
+        self.assertEqual([l["location"] for l in result.get("listings")], ["US"])
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    def test_subscription_uses_listing_location(self, mock_bq, mock_llm_class):
+        from tools.bq_tools import listing_location
+        mock_bq.listing_location.side_effect = listing_location
+        mock_bq.subscribe_listing.return_value = "ok"
+
+        agent = BigQuerySharingAgent(project_id="test-project", locations=["US", "EU"])
+        agent.invoke({
+            "selected_listing_id": "projects/p/locations/EU/dataExchanges/e/listings/listing1",
+            "query": "subscribe",
+            "messages": [],
+        })
+
+        self.assertEqual(mock_bq.subscribe_listing.call_args.args[3], "EU")
+
+class TestParallelSearchBranches(unittest.TestCase):
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_listing_and_product_searches_run_concurrently(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        import threading
+        # Each search waits for the other; run one after the other they would time out
+        both_running = threading.Barrier(2, timeout=2)
+        listing = {"name": "listing1", "display_name": "Sales", "location": "US"}
+        product = {"name": "dp1", "display_name": "Sales"}
+
+        def search_listings(query, project_id, location, limit=None):
+            both_running.wait()
+            return [listing]
+
+        def search_data_products(query, project_id, location, max_results=None):
+            both_running.wait()
+            return [product]
+
+        mock_bq.search_listings.side_effect = search_listings
+        mock_dp_tools.search_data_products.side_effect = search_data_products
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
+
+        agent = BigQuerySharingAgent(project_id="test-project", locations=["US"])
+        result = agent.invoke({"query": "", "messages": [HumanMessage(content="sales")]})
+
+        self.assertFalse(both_running.broken)
+        self.assertEqual([l["name"] for l in result.get("listings")], ["listing1"])
+        self.assertEqual(result.get("data_products"), [product])
+        # Both branches saw the query extracted from the messages
+        self.assertEqual(mock_bq.search_listings.call_args.args[0], "sales")
+        self.assertEqual(mock_dp_tools.search_data_products.call_args.args[0], "sales")
+        # Product searches are capped like listing searches
+        self.assertEqual(mock_dp_tools.search_data_products.call_args.kwargs["max_results"], agent.max_results)
+        mock_dp_tools.match_listings_to_products.assert_called_once()
+
+class TestAsyncInvoke(unittest.TestCase):
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_concurrent_requests_share_one_event_loop(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        import asyncio
+        import threading
+        # Each request's listing search waits for the other request's
+        both_requests = threading.Barrier(2, timeout=2)
+
+        def search_listings(query, project_id, location, limit=None):
+            both_requests.wait()
+            return [{"name": f"{query}-listing", "display_name": query, "location": location}]
+
+        mock_bq.search_listings.side_effect = search_listings
+        mock_dp_tools.search_data_products.return_value = []
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
+
+        agent = BigQuerySharingAgent(project_id="test-project", locations=["US"])
+
+        async def run_both():
+            return await asyncio.gather(
+                agent.ainvoke({"query": "sales", "messages": []}),
+                agent.ainvoke({"query": "marketing", "messages": []}),
+            )
+
+        sales, marketing = asyncio.run(run_both())
+
+        self.assertFalse(both_requests.broken)
+        self.assertEqual([l["name"] for l in sales.get("listings")], ["sales-listing"])
+        self.assertEqual([l["name"] for l in marketing.get("listings")], ["marketing-listing"])
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_invoke_works_inside_a_running_event_loop(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        import asyncio
+        mock_bq.search_listings.return_value = [{"name": "listing1", "display_name": "Sales", "location": "US"}]
+        mock_dp_tools.search_data_products.return_value = []
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
+        agent = BigQuerySharingAgent(project_id="test-project", locations=["US"], result_cache_ttl=0)
+
+        async def async_handler():
+            # e.g. an async Slack handler or a notebook cell calling the sync API
+            return agent.invoke({"query": "sales", "messages": []})
+
+        result = asyncio.run(async_handler())
+
+        self.assertEqual([l["name"] for l in result["listings"]], ["listing1"])
+
+        # Errors surface in the caller as they would without a running loop
+        mock_bq.listing_location.side_effect = ValueError("bad listing")
+
+        async def subscribe():
+            return agent.invoke({"selected_listing_id": "bad", "query": "subscribe", "messages": []})
+
+        with self.assertRaises(ValueError):
+            asyncio.run(subscribe())
+
+class TestResultCache(unittest.TestCase):
+
+    def _agent(self, mock_dp_tools, mock_dataplex, mock_bq, **agent_kwargs):
+        mock_bq.catalog_version.return_value = (1,)
+        mock_bq.search_listings.return_value = [
+            {"name": "listing1", "display_name": "Sales", "location": "US"}
+        ]
+        mock_dp_tools.search_data_products.return_value = []
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
+        return BigQuerySharingAgent(project_id="test-project", locations=["US"], **agent_kwargs)
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_repeated_query_is_served_from_cache(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq)
+
+        first = agent.invoke({"query": "Sales data", "messages": []})
+        first["listings"].clear()  # callers cannot corrupt the cached copy
+        second = agent.invoke({"query": "  sales   DATA ", "messages": []})
+
+        self.assertEqual(mock_bq.search_listings.call_count, 1)
+        self.assertEqual([l["name"] for l in second["listings"]], ["listing1"])
+        stats = agent.result_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_catalog_reload_invalidates_cached_results(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq)
+
+        agent.invoke({"query": "sales", "messages": []})
+        mock_bq.catalog_version.return_value = (2,)
+        agent.invoke({"query": "sales", "messages": []})
+
+        self.assertEqual(mock_bq.search_listings.call_count, 2)
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_searches_on_a_cold_catalog_are_not_cached(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq)
+        # No snapshot yet: the search streams unranked results while the
+        # catalog loads in the background
+        mock_bq.catalog_version.return_value = (None,)
+        mock_bq.search_listings.return_value = [
+            {"name": "misc", "display_name": "Sales misc", "location": "US"},
+            {"name": "revenue", "display_name": "Sales revenue", "location": "US"},
+        ]
+        agent.invoke({"query": "sales", "messages": []})
+
+        mock_bq.catalog_version.return_value = (1,)
+        mock_bq.search_listings.return_value = [
+            {"name": "revenue", "display_name": "Sales revenue", "location": "US", "relevance_score": 0.8},
+            {"name": "misc", "display_name": "Sales misc", "location": "US", "relevance_score": 0.6},
+        ]
+        loaded = agent.invoke({"query": "sales", "messages": []})
+        cached = agent.invoke({"query": "sales", "messages": []})
+
+        self.assertEqual(mock_bq.search_listings.call_count, 2)
+        self.assertEqual([l["name"] for l in loaded["listings"]], ["revenue", "misc"])
+        self.assertEqual([l["name"] for l in cached["listings"]], ["revenue", "misc"])
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_partial_results_are_not_cached(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq)
+        # No contracts resolved: listings come back unenriched
+        mock_dataplex.get_data_contracts.side_effect = lambda resources, location, **kwargs: {}
+
+        result = agent.invoke({"query": "sales", "messages": []})
+        agent.invoke({"query": "sales", "messages": []})
+
+        self.assertTrue(result["partial"])
+        self.assertEqual(mock_bq.search_listings.call_count, 2)
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_concurrent_identical_searches_share_one_run(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        import asyncio
+        import threading
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq, result_cache_ttl=0)
+        release = threading.Event()
+
+        def search_listings(query, project_id, location, limit=None):
+            release.wait(timeout=2)
+            return [{"name": "listing1", "display_name": "Sales", "location": location}]
+
+        mock_bq.search_listings.side_effect = search_listings
+
+        async def run_three():
+            requests = [agent.ainvoke({"query": "sales", "messages": []}) for _ in range(3)]
+            asyncio.get_running_loop().call_later(0.1, release.set)
+            return await asyncio.gather(*requests)
+
+        results = asyncio.run(run_three())
+
+        self.assertEqual(mock_bq.search_listings.call_count, 1)
+        self.assertEqual([[l["name"] for l in r["listings"]] for r in results], [["listing1"]] * 3)
+        self.assertIsNot(results[0]["listings"], results[1]["listings"])
+        self.assertEqual(agent.search_flights.stats()["shared"], 2)
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_subscriptions_and_disabled_cache_bypass_it(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq)
+        mock_bq.subscribe_listing.return_value = "ok"
+        subscribe = {"selected_listing_id": "projects/p/locations/US/dataExchanges/e/listings/l1",
+                     "query": "subscribe", "messages": []}
+
+        agent.invoke(subscribe)
+        agent.invoke(subscribe)
+        self.assertEqual(mock_bq.subscribe_listing.call_count, 2)
+
+        uncached = self._agent(mock_dp_tools, mock_dataplex, mock_bq, result_cache_ttl=0)
+        uncached.invoke({"query": "sales", "messages": []})
+        uncached.invoke({"query": "sales", "messages": []})
+        self.assertEqual(mock_bq.search_listings.call_count, 2)
+        self.assertEqual(uncached.result_cache_stats(), {})
+
+class TestStartup(unittest.TestCase):
+
+    def test_import_and_construction_defer_heavy_dependencies(self):
+        import subprocess
+        code = (
+            "import sys, time\n"
+            "started = time.perf_counter()\n"
+            "from agent_engine import BigQuerySharingAgent\n"
+            "BigQuerySharingAgent(project_id='p')\n"
+            "print(time.perf_counter() - started)\n"
+            "print('langchain_google_vertexai' in sys.modules, 'langgraph' in sys.modules)\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), "..")),
+        ).stdout.split("\n")
+
+        self.assertEqual(output[1], "False False")
+        # Same budget the Slack app checks its startup against
+        budget = float(os.environ.get("STARTUP_BUDGET_SECONDS", "2"))
+        self.assertLess(float(output[0]), budget)
+
+    @patch('agent_engine.ChatVertexAI')
+    def test_llm_is_created_once_on_first_use(self, mock_llm_class):
+        agent = BigQuerySharingAgent(project_id="test-project")
+        mock_llm_class.assert_not_called()
+
+        self.assertIs(agent.llm, agent.llm)
+        mock_llm_class.assert_called_once()
+
+    def test_compiled_graph_is_shared_between_agents(self):
+        first = BigQuerySharingAgent(project_id="p1")
+        second = BigQuerySharingAgent(project_id="p2")
+        self.assertIs(first.graph, second.graph)
+
+class TestTracing(unittest.TestCase):
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_every_node_is_traced_under_the_request(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        from tools import tracing
+        exporter = tracing.InMemoryExporter()
+        tracing.configure([exporter])
+        self.addCleanup(tracing.configure, [])
+
+        mock_bq.search_listings.return_value = [{"name": "listing1", "display_name": "Sales", "location": "US"}]
+        mock_dp_tools.search_data_products.return_value = []
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
+
+        agent = BigQuerySharingAgent(project_id="test-project", locations=["US"], result_cache_ttl=0)
+        agent.invoke({"query": "sales", "messages": []}, request_id="req-42")
+
+        spans = {span.name: span for span in exporter.for_request("req-42")}
+        root = spans["agent.invoke"]
+        self.assertEqual(root.attributes["listings_count"], 1)
+        for node in ["prepare_query", "search_listings", "search_data_products",
+                     "enrich_with_data_products", "enrich_listings", "rank_listings",
+                     "generate_response"]:
+            self.assertEqual(spans[f"node.{node}"].parent_id, root.span_id)
+        self.assertEqual(spans["node.search_listings"].attributes, {"listings_count": 1})
+        self.assertEqual(spans["node.search_data_products"].attributes, {"data_products_count": 0})
+
+class TestEnrichmentBudget(unittest.TestCase):
+
+    def _listings(self, count):
+        return [
+            {"name": f"listing{i}", "display_name": f"Sales {i}", "location": "US",
+             "source_dataset": f"projects/p/datasets/d{i}"}
+            for i in range(count)
+        ]
+
+    def _run(self, mock_dp_tools, mock_bq, listings, **agent_kwargs):
+        mock_bq.search_listings.return_value = listings
+        mock_dp_tools.search_data_products.return_value = []
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        agent = BigQuerySharingAgent(project_id="test-project", locations=["US"], **agent_kwargs)
+        return agent.invoke({"query": "sales", "messages": []}).get("listings")
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_every_listing_is_enriched_and_ranked(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: int(r[-1]) / 10 for r in resources}
+        )
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {"status": "active"} for r in resources}
+        )
+
+        listings = self._run(mock_dp_tools, mock_bq, self._listings(6))
+
+        self.assertEqual([l["name"] for l in listings], [f"listing{i}" for i in range(5, -1, -1)])
+        self.assertTrue(all(l["enriched"] for l in listings))
+        self.assertEqual(mock_dataplex.get_data_quality_scores.call_count, 1)
+        self.assertEqual(mock_dataplex.get_data_contracts.call_args.args[1], "us")
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_slow_lookups_leave_listings_unenriched(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        import threading
+        release = threading.Event()
+
+        def slow_quality(resources, location):
+            release.wait(timeout=5)
+            return {r: 0.9 for r in resources}
+
+        mock_dataplex.get_data_quality_scores.side_effect = slow_quality
+        # Contracts arrive for only part of the listings
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {resources[0]: {"status": "active"}}
+        )
+
+        try:
+            listings = self._run(mock_dp_tools, mock_bq, self._listings(3), enrichment_timeout=0.2)
+        finally:
+            release.set()
+
+        self.assertEqual(len(listings), 3)
+        self.assertTrue(all(l["enriched"] is False for l in listings))
+        self.assertTrue(all(l["data_quality_score"] is None for l in listings))
+        self.assertEqual(listings[0]["data_contract"], {"status": "active"})
+        self.assertEqual(mock_dataplex.get_data_contracts.call_args.kwargs["timeout"], 0.2 * 0.9)
+
+class TestDeadline(unittest.TestCase):
+
+    def _agent(self, mock_dp_tools, mock_dataplex, mock_bq, **agent_kwargs):
+        mock_bq.search_listings.return_value = [
+            {"name": "listing1", "display_name": "Sales", "location": "US",
+             "source_dataset": "projects/p/datasets/d1"}
+        ]
+        mock_dp_tools.search_data_products.return_value = []
+        mock_dp_tools.match_listings_to_products.side_effect = (
+            lambda listings, products: [(l, None) for l in listings]
+        )
+        mock_dp_tools.get_data_products.return_value = {}
+        mock_dataplex.get_data_contracts.side_effect = (
+            lambda resources, location, **kwargs: {r: {} for r in resources}
+        )
+        return BigQuerySharingAgent(
+            project_id="test-project", locations=["US"], result_cache_ttl=0, **agent_kwargs
+        )
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_slow_stage_returns_partial_response_by_the_deadline(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        import threading
+        import time
+        release = threading.Event()
+
+        def slow_quality(resources, location):
+            release.wait(timeout=5)
+            return {r: 0.9 for r in resources}
+
+        mock_dataplex.get_data_quality_scores.side_effect = slow_quality
+        # The enrichment timeout alone would wait far longer than the request may take
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq, enrichment_timeout=30, request_timeout=0.3)
+
+        start = time.monotonic()
+        try:
+            result = agent.invoke({"query": "sales", "messages": []})
+        finally:
+            release.set()
+
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertTrue(result["partial"])
+        self.assertEqual([l["name"] for l in result["listings"]], ["listing1"])
+        self.assertFalse(result["listings"][0]["enriched"])
+        self.assertLessEqual(mock_dataplex.get_data_contracts.call_args.kwargs["timeout"], 0.3)
+        self.assertEqual(result["messages"][-1].response_metadata, {"partial": True})
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_expired_deadline_skips_remaining_calls(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        import time
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq)
+
+        result = agent.invoke({"query": "sales", "messages": [], "deadline": time.time() - 1})
+
+        self.assertTrue(result["partial"])
+        self.assertEqual(result["listings"], [])
+        mock_bq.search_listings.assert_not_called()
+        mock_dataplex.get_data_quality_scores.assert_not_called()
+        self.assertIn("did not respond in time", result["messages"][-1].content)
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    @patch('agent_engine.dataplex_tools')
+    @patch('agent_engine.data_product_tools')
+    def test_complete_response_is_not_partial(self, mock_dp_tools, mock_dataplex, mock_bq, mock_llm_class):
+        mock_dataplex.get_data_quality_scores.side_effect = (
+            lambda resources, location: {r: 0.9 for r in resources}
+        )
+        agent = self._agent(mock_dp_tools, mock_dataplex, mock_bq)
+
+        result = agent.invoke({"query": "sales", "messages": []})
+
+        self.assertFalse(result["partial"])
+        self.assertIsNotNone(result["deadline"])
+        self.assertEqual(result["messages"][-1].response_metadata, {"partial": False})
+
+    @patch('agent_engine.ChatVertexAI')
+    @patch('agent_engine.bq_tools')
+    def test_slow_subscription_answers_by_the_deadline(self, mock_bq, mock_llm_class):
+        import threading
+        release = threading.Event()
+        mock_bq.listing_location.return_value = "US"
+        mock_bq.subscribe_listing.side_effect = lambda *args: release.wait(timeout=5) and "Subscribed"
+
+        agent = BigQuerySharingAgent(project_id="test-project", request_timeout=0.2)
+        try:
+            result = agent.invoke({"selected_listing_id": "projects/p/locations/us/dataExchanges/e/listings/l1",
+                                   "query": "subscribe", "messages": []})
+        finally:
+            release.set()
+
+        self.assertTrue(result["partial"])
+        self.assertIn("taking longer than expected", result["subscription_result"])
+
 if __name__ == '__main__':
     unittest.main()
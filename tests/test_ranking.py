@@ -0,0 +1,128 @@
+"""
+Tests for tools/ranking.py, the weighted listing ranking engine.
+
+Unit tests cover:
+  - individual signals (contract status, SLA tier, freshness)
+  - RankingEngine.rank (weighted order, top-k, ties, score breakdown)
+  - pluggable signals and weight validation
+  - parse_weights
+"""
+
+import sys
+import os
+import unittest
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.ranking import (
+    RankingEngine,
+    contract_signal,
+    freshness_signal,
+    parse_weights,
+    sla_signal,
+)
+
+NOW = datetime(2026, 1, 31, tzinfo=timezone.utc).timestamp()
+
+
+class TestSignals(unittest.TestCase):
+
+    def test_contract_status(self):
+        self.assertEqual(contract_signal({"data_contract": {"status": "Active"}}, NOW), 1.0)
+        self.assertEqual(contract_signal({"data_contract": {"status": "draft"}}, NOW), 0.5)
+        self.assertEqual(contract_signal({"data_contract": {}}, NOW), 0.0)
+        self.assertEqual(contract_signal({"data_contract": None}, NOW), 0.0)
+
+    def test_sla_tier_is_read_from_merged_product_fields(self):
+        listing = {"data_product_unique_fields": {"sla_tier": "gold"}}
+        self.assertEqual(sla_signal(listing, NOW), 1.0)
+        self.assertEqual(sla_signal({"sla_tier": "unknown"}, NOW), 0.0)
+
+    def test_freshness_halves_every_half_life(self):
+        updated = (datetime.fromtimestamp(NOW, timezone.utc) - timedelta(days=30)).isoformat()
+        listing = {"data_product_unique_fields": {"update_time": updated}}
+        self.assertAlmostEqual(freshness_signal(listing, NOW), 0.5)
+        self.assertEqual(freshness_signal({}, NOW), 0.0)
+        self.assertEqual(freshness_signal({"update_time": "not a date"}, NOW), 0.0)
+
+
+class TestRankingEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = RankingEngine(
+            weights={"relevance": 0.5, "quality": 0.5}, clock=lambda: NOW
+        )
+
+    def test_combines_weighted_signals(self):
+        listings = [
+            {"name": "relevant", "relevance_score": 4.0, "data_quality_score": 0.2},
+            {"name": "quality", "relevance_score": 1.0, "data_quality_score": 1.0},
+            {"name": "both", "relevance_score": 3.0, "data_quality_score": 0.9},
+        ]
+
+        ranked = self.engine.rank(listings)
+
+        self.assertEqual([l["name"] for l in ranked], ["both", "quality", "relevant"])
+        # Relevance is scaled to the best candidate: 3.0 / 4.0
+        self.assertEqual(ranked[0]["score_breakdown"], {"relevance": 0.375, "quality": 0.45})
+        self.assertEqual(ranked[0]["score"], 0.825)
+
+    def test_top_k_keeps_best_in_order(self):
+        listings = [{"name": f"l{i}", "data_quality_score": i / 10} for i in range(10)]
+
+        ranked = self.engine.rank(listings, k=3)
+
+        self.assertEqual([l["name"] for l in ranked], ["l9", "l8", "l7"])
+        self.assertEqual(self.engine.rank(listings, k=0), [])
+
+    def test_ties_keep_input_order_and_missing_signals_score_zero(self):
+        listings = [{"name": "a"}, {"name": "b", "data_quality_score": 0.5}, {"name": "c"}]
+
+        self.assertEqual([l["name"] for l in self.engine.rank(listings)], ["b", "a", "c"])
+
+    def test_top_k_ties_keep_input_order(self):
+        # Listings without a quality score tie on it, so ties are common
+        listings = [{"name": f"l{i}", "data_quality_score": 0.5 if i % 3 else None} for i in range(30)]
+
+        everything = [l["name"] for l in self.engine.rank(listings)]
+        for k in (1, 4, 15, 25):
+            self.assertEqual([l["name"] for l in self.engine.rank(listings, k=k)], everything[:k])
+        self.assertEqual(everything[:3], ["l1", "l2", "l4"])
+
+    def test_does_not_modify_input(self):
+        listings = [{"name": "a", "data_quality_score": 0.5}]
+        self.engine.rank(listings)
+        self.assertEqual(listings, [{"name": "a", "data_quality_score": 0.5}])
+
+    def test_empty_input(self):
+        self.assertEqual(self.engine.rank([]), [])
+
+    def test_custom_signal(self):
+        engine = RankingEngine(
+            weights={"short_name": 1.0},
+            signals={"short_name": lambda listing, now: 1 / len(listing["name"])},
+        )
+        ranked = engine.rank([{"name": "longer"}, {"name": "ab"}])
+        self.assertEqual([l["name"] for l in ranked], ["ab", "longer"])
+
+    def test_weight_for_unknown_signal_is_rejected(self):
+        with self.assertRaises(ValueError):
+            RankingEngine(weights={"popularity": 1.0})
+
+
+class TestParseWeights(unittest.TestCase):
+
+    def test_overrides_defaults(self):
+        weights = parse_weights("relevance=0.8, quality=0")
+        self.assertEqual(weights["relevance"], 0.8)
+        self.assertEqual(weights["quality"], 0.0)
+        self.assertEqual(weights["sla"], 0.1)
+
+    def test_invalid_spec(self):
+        with self.assertRaises(ValueError):
+            parse_weights("relevance")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Tests for tools/search_index.py, the BM25 inverted index over listings.
+
+Unit tests cover:
+  - tokenize (case folding, punctuation, stopwords)
+  - InvertedIndex.search (multi-word queries, relevance order, top-k)
+  - incremental add / update / remove
+  - sync_listing_index (build and in-place refresh)
+"""
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.search_index import InvertedIndex, sync_listing_index, tokenize
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_lowercases_and_splits_on_punctuation(self):
+        self.assertEqual(tokenize("Global Sales-2024 (EU)"), ["global", "sales", "2024", "eu"])
+
+    def test_drops_stopwords(self):
+        self.assertEqual(tokenize("Find sales data for 2024"), ["sales", "data", "2024"])
+
+    def test_handles_empty_and_none(self):
+        self.assertEqual(tokenize(""), [])
+        self.assertEqual(tokenize(None), [])
+
+
+class TestInvertedIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.add("sales", "Global Sales Data", "Sales figures for 2024")
+        self.index.add("clicks", "Marketing Clickstream", "Raw web events")
+        self.index.add("finance", "Finance Reports", "Quarterly sales summaries")
+        self.index.add("weather", "Weather Observations", "Hourly readings")
+
+    def _ids(self, results):
+        return [doc_id for doc_id, _ in results]
+
+    def test_multi_word_query_matches_non_adjacent_words(self):
+        results = self.index.search("sales 2024")
+        self.assertEqual(self._ids(results)[0], "sales")
+
+    def test_title_matches_outrank_description_matches(self):
+        results = self.index.search("sales")
+        self.assertEqual(self._ids(results), ["sales", "finance"])
+        self.assertGreater(results[0][1], results[1][1])
+
+    def test_any_query_term_matches(self):
+        results = self.index.search("clickstream weather")
+        self.assertEqual(set(self._ids(results)), {"clicks", "weather"})
+
+    def test_no_match_returns_empty(self):
+        self.assertEqual(self.index.search("genomics"), [])
+
+    def test_stopword_only_query_returns_empty(self):
+        self.assertEqual(self.index.search("find the"), [])
+
+    def test_top_k_limits_results(self):
+        for i in range(50):
+            self.index.add(f"extra{i}", f"Sales extract {i}")
+
+        results = self.index.search("sales", k=5)
+
+        self.assertEqual(len(results), 5)
+        scores = [score for _, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_top_k_breaks_ties_like_the_full_ordering(self):
+        # Identical titles score the same; ties must not be picked arbitrarily
+        for i in range(40):
+            self.index.add(f"tie{i:02d}", "Sales extract")
+
+        everything = self.index.search("sales extract", k=None)
+        for k in (1, 5, 17):
+            self.assertEqual(self.index.search("sales extract", k=k), everything[:k])
+
+    def test_remove_drops_document(self):
+        self.index.remove("sales")
+
+        self.assertNotIn("sales", self.index)
+        self.assertEqual(self._ids(self.index.search("sales")), ["finance"])
+        self.assertEqual(len(self.index), 3)
+
+    def test_remove_unknown_is_ignored(self):
+        self.index.remove("missing")
+        self.assertEqual(len(self.index), 4)
+
+    def test_add_replaces_changed_document(self):
+        self.index.add("weather", "Weather Sales Correlation", "")
+
+        self.assertIn("weather", self._ids(self.index.search("correlation")))
+        self.assertEqual(self.index.search("hourly"), [])
+        self.assertEqual(len(self.index), 4)
+
+    def test_freed_slots_are_reused(self):
+        self.index.remove("clicks")
+        self.index.add("genomics", "Genomics Panel", "")
+
+        self.assertEqual(self._ids(self.index.search("genomics")), ["genomics"])
+        self.assertEqual(self.index.search("clickstream"), [])
+
+
+class TestSyncListingIndex(unittest.TestCase):
+
+    def _listing(self, name, display_name, description=""):
+        return {"name": name, "display_name": display_name, "description": description}
+
+    def test_builds_new_index(self):
+        index = sync_listing_index(None, [self._listing("l1", "Global Sales Data")])
+
+        self.assertEqual(index.doc_ids(), ["l1"])
+
+    def test_updates_existing_index_in_place(self):
+        index = sync_listing_index(None, [
+            self._listing("l1", "Global Sales Data"),
+            self._listing("l2", "Clickstream"),
+        ])
+
+        updated = sync_listing_index(index, [
+            self._listing("l1", "Global Sales Data"),
+            self._listing("l3", "Finance Reports"),
+        ])
+
+        self.assertIs(updated, index)
+        self.assertEqual(sorted(index.doc_ids()), ["l1", "l3"])
+        self.assertEqual(index.search("clickstream"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
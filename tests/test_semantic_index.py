@@ -0,0 +1,128 @@
+"""
+Tests for tools/semantic_index.py, the embedding-based listing index.
+
+Unit tests cover:
+  - HashingEmbedder (normalized, deterministic, sub-word overlap)
+  - VectorIndex.search (similarity order, top-k, threshold)
+  - incremental add / update / remove without re-embedding unchanged text
+  - sync_vector_index
+"""
+
+import sys
+import os
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools.semantic_index import HashingEmbedder, VectorIndex, sync_vector_index
+
+
+class CountingEmbedder(HashingEmbedder):
+    """HashingEmbedder that records every text it embeds."""
+
+    def __init__(self):
+        super().__init__(dim=128)
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return super().embed(texts)
+
+
+class TestHashingEmbedder(unittest.TestCase):
+
+    def test_rows_are_unit_length_and_deterministic(self):
+        embedder = HashingEmbedder(dim=64)
+        vectors = embedder.embed(["Global Sales Data", "Clickstream"])
+
+        self.assertEqual(vectors.shape, (2, 64))
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), [1.0, 1.0], rtol=1e-5)
+        np.testing.assert_array_equal(vectors, embedder.embed(["Global Sales Data", "Clickstream"]))
+
+    def test_shared_subwords_are_similar(self):
+        sale, sales, weather = HashingEmbedder().embed(["sale", "sales", "weather"])
+        self.assertGreater(sale @ sales, sale @ weather)
+
+    def test_text_without_terms_is_zero(self):
+        self.assertFalse(HashingEmbedder().embed(["the for"])[0].any())
+
+
+class TestVectorIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = VectorIndex()
+        self.index.add_many([
+            ("sales", "Global Sales Data", "Sales figures for 2024"),
+            ("clicks", "Marketing Clickstream", "Raw web events"),
+            ("weather", "Weather Observations", "Hourly readings"),
+        ])
+
+    def test_finds_partial_word_matches(self):
+        results = self.index.search("sale", min_score=0.2)
+        self.assertEqual([doc_id for doc_id, _ in results], ["sales"])
+
+    def test_results_are_ordered_by_similarity(self):
+        scores = [score for _, score in self.index.search("click stream events", k=None)]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(self.index.search("click stream events")[0][0], "clicks")
+
+    def test_k_limits_results(self):
+        self.assertEqual(len(self.index.search("data", k=1)), 1)
+        self.assertEqual(self.index.search("data", k=0), [])
+
+    def test_k_breaks_ties_like_the_full_ordering(self):
+        index = VectorIndex()
+        for i in range(40):
+            index.add(f"tie{i:02d}", "Sales extract", "")
+
+        everything = index.search("sales", k=None)
+        for k in (1, 5, 17):
+            self.assertEqual(index.search("sales", k=k), everything[:k])
+
+    def test_empty_query_and_index(self):
+        self.assertEqual(self.index.search(""), [])
+        self.assertEqual(VectorIndex().search("sales"), [])
+
+    def test_update_and_remove(self):
+        self.index.add("weather", "Sales Forecasts", "")
+        self.index.remove("sales")
+        self.index.remove("unknown")
+
+        results = self.index.search("sales", min_score=0.2)
+
+        self.assertEqual([doc_id for doc_id, _ in results], ["weather"])
+        self.assertEqual(len(self.index), 2)
+
+    def test_freed_slots_are_reused(self):
+        self.index.remove("clicks")
+        self.index.add("finance", "Finance Reports", "")
+        self.assertEqual(len(self.index._doc_ids), 3)
+        self.assertEqual(self.index.search("finance")[0][0], "finance")
+
+
+class TestSyncVectorIndex(unittest.TestCase):
+
+    def test_only_new_and_changed_listings_are_embedded(self):
+        embedder = CountingEmbedder()
+        listings = [
+            {"name": "l1", "display_name": "Sales", "description": "2024"},
+            {"name": "l2", "display_name": "Clicks", "description": ""},
+        ]
+        index = sync_vector_index(VectorIndex(embedder), listings)
+        embedder.embedded.clear()
+
+        refreshed = [
+            {"name": "l1", "display_name": "Sales", "description": "2024"},
+            {"name": "l3", "display_name": "Weather", "description": ""},
+        ]
+        same = sync_vector_index(index, refreshed)
+
+        self.assertIs(same, index)
+        self.assertEqual(embedder.embedded, ["Weather", ""])
+        self.assertEqual(sorted(index.doc_ids()), ["l1", "l3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
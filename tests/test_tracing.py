@@ -0,0 +1,159 @@
+"""
+Tests for tools/tracing.py.
+
+Unit tests cover:
+  - disabled tracing (no-op spans, request IDs still bound)
+  - span nesting, API call leaf spans and error recording
+  - request ID correlation across worker threads
+  - JSON and OTLP export formats
+"""
+
+import sys
+import os
+import json
+import logging
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tools import concurrency, tracing
+
+
+class _TracingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = tracing.InMemoryExporter()
+        tracing.configure([self.exporter])
+        self.addCleanup(tracing.configure, [])
+
+    def spans(self):
+        return {span.name: span for span in self.exporter.spans}
+
+
+class TestDisabledTracing(unittest.TestCase):
+
+    def test_spans_are_no_ops(self):
+        self.assertFalse(tracing.enabled())
+        with tracing.span("node") as span:
+            span.set(result_count=1)
+        self.assertIs(tracing.span("other"), span)
+        self.assertIs(tracing.api_call("call"), span)
+
+    def test_request_id_is_still_bound(self):
+        with tracing.request("agent.invoke", "req-1"):
+            self.assertEqual(tracing.current_request_id(), "req-1")
+        self.assertIsNone(tracing.current_request_id())
+
+
+class TestSpans(_TracingTestCase):
+
+    def test_spans_nest_under_the_request(self):
+        with tracing.request("agent.invoke", "req-1"):
+            with tracing.span("node.search_listings") as node:
+                with tracing.api_call("analyticshub.list_listings") as call:
+                    call.set(result_count=3)
+                # A leaf span does not become the parent of later spans
+                with tracing.api_call("analyticshub.list_data_exchanges"):
+                    pass
+            node.set(listings_count=3)
+
+        spans = self.spans()
+        root = spans["agent.invoke"]
+        self.assertEqual({span.request_id for span in spans.values()}, {"req-1"})
+        self.assertIsNone(root.parent_id)
+        self.assertEqual(spans["node.search_listings"].parent_id, root.span_id)
+        self.assertEqual(spans["analyticshub.list_listings"].parent_id, node.span_id)
+        self.assertEqual(spans["analyticshub.list_data_exchanges"].parent_id, node.span_id)
+        self.assertEqual(spans["analyticshub.list_listings"].attributes, {"result_count": 3})
+        self.assertGreaterEqual(root.duration_ms, 0)
+
+    def test_nested_request_keeps_outer_request_id(self):
+        with tracing.request("slack.find_data", "trigger-1"):
+            with tracing.request("agent.invoke"):
+                pass
+
+        self.assertEqual(self.spans()["agent.invoke"].request_id, "trigger-1")
+
+    def test_requests_get_generated_ids(self):
+        with tracing.request("agent.invoke"):
+            request_id = tracing.current_request_id()
+        self.assertEqual(len(request_id), 32)
+
+    def test_raised_and_recorded_errors(self):
+        with self.assertRaises(RuntimeError):
+            with tracing.span("node.enrich_listings"):
+                raise RuntimeError("boom")
+        with tracing.api_call("dataplex.lookup_entry") as call:
+            call.record_error(ValueError("not found"))
+
+        spans = self.spans()
+        self.assertEqual(spans["node.enrich_listings"].error, "RuntimeError: boom")
+        self.assertEqual(spans["dataplex.lookup_entry"].error, "ValueError: not found")
+
+    def test_worker_thread_spans_keep_request_and_parent(self):
+        def call(n):
+            with tracing.api_call("dataplex.get_data_scan", n=n):
+                return n
+
+        with tracing.request("agent.invoke", "req-2"):
+            with tracing.span("node.enrich_listings") as node:
+                concurrency.map_bounded(call, range(3), max_workers=3)
+                concurrency.map_with_timeout(call, range(3), timeout=1)
+
+        calls = [span for span in self.exporter.spans if span.name == "dataplex.get_data_scan"]
+        self.assertEqual(len(calls), 6)
+        self.assertTrue(all(span.request_id == "req-2" for span in calls))
+        self.assertTrue(all(span.parent_id == node.span_id for span in calls))
+
+
+class TestExport(_TracingTestCase):
+
+    def test_otlp_format(self):
+        request_id = "0123456789abcdef0123456789abcdef"
+        with tracing.request("agent.invoke", request_id):
+            with tracing.api_call("dataplex.get_entry", result_count=2, cached=False) as call:
+                call.record_error(RuntimeError("boom"))
+
+        otlp = self.spans()["dataplex.get_entry"].to_otlp()
+        self.assertEqual(otlp["traceId"], request_id)
+        self.assertEqual(otlp["parentSpanId"], self.spans()["agent.invoke"].span_id)
+        self.assertEqual(len(otlp["spanId"]), 16)
+        self.assertEqual(otlp["status"], {"code": 2, "message": "RuntimeError: boom"})
+        attributes = {a["key"]: a["value"] for a in otlp["attributes"]}
+        self.assertEqual(attributes["request.id"], {"stringValue": request_id})
+        self.assertEqual(attributes["result_count"], {"intValue": "2"})
+        self.assertEqual(attributes["cached"], {"boolValue": False})
+        self.assertGreaterEqual(int(otlp["endTimeUnixNano"]), int(otlp["startTimeUnixNano"]))
+
+    def test_non_hex_request_ids_map_to_valid_trace_ids(self):
+        with tracing.request("agent.invoke", "slack-trigger.123"):
+            pass
+        trace_id = self.spans()["agent.invoke"].to_otlp()["traceId"]
+        self.assertEqual(len(trace_id), 32)
+        int(trace_id, 16)
+
+    def test_json_log_exporter(self):
+        log = logging.getLogger("test_tracing.spans")
+        with self.assertLogs(log, level="INFO") as logs:
+            tracing.configure([tracing.JsonLogExporter(log)])
+            with tracing.request("agent.invoke", "req-3"):
+                pass
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["name"], "agent.invoke")
+        self.assertEqual(record["request_id"], "req-3")
+        self.assertIsNone(record["error"])
+
+    def test_failing_exporter_does_not_break_the_request(self):
+        def broken(span):
+            raise RuntimeError("exporter down")
+
+        tracing.configure([broken, self.exporter])
+        with tracing.span("node.rank_listings"):
+            pass
+
+        self.assertIn("node.rank_listings", self.spans())
+
+
+if __name__ == "__main__":
+    unittest.main()
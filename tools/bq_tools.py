@@ -1,71 +1,410 @@
 from google.cloud import bigquery_data_exchange_v1beta1
 from google.api_core import exceptions
+import heapq
 import logging
+import os
+import threading
+
+from tools import catalog, catalog_store, clients, concurrency, search_index, semantic_index, tracing
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def search_listings(query: str, project_id: str, location: str = "US") -> list[dict]:
+# Upper bound on concurrent per-exchange API calls during a search
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("SEARCH_MAX_CONCURRENCY", "8"))
+
+# Page size for streaming searches; small pages let a limited search stop early
+DEFAULT_STREAM_PAGE_SIZE = 50
+
+# Seconds each API call of a catalog crawl may take; the crawl fills a shared
+# snapshot, so it is bounded by this rather than by any request's deadline
+CRAWL_CALL_TIMEOUT = float(os.environ.get("CATALOG_CRAWL_CALL_TIMEOUT_SECONDS", "60"))
+
+# How snapshot searches match listings: "lexical" (BM25), "semantic"
+# (embedding similarity) or "hybrid" (a weighted blend of both)
+SEARCH_MODES = ("lexical", "semantic", "hybrid")
+DEFAULT_SEARCH_MODE = os.environ.get("SEARCH_MODE", "lexical")
+
+# Share of a hybrid relevance score that comes from semantic similarity
+HYBRID_SEMANTIC_WEIGHT = float(os.environ.get("HYBRID_SEMANTIC_WEIGHT", "0.5"))
+
+# Cosine similarity a listing needs to count as a semantic match
+SEMANTIC_MIN_SIMILARITY = 0.2
+
+# Searches currently in flight, so concurrent identical searches share one
+_search_flights = concurrency.SingleFlight()
+
+# (project, location) -> (snapshot generation, VectorIndex).  Indexes are
+# built and re-synced incrementally in the background whenever a snapshot is
+# loaded (see ``_on_catalog_load``), never on the request path.
+_vector_indexes: dict[tuple[str, str], tuple[int, semantic_index.VectorIndex]] = {}
+_vector_index_locks: dict[tuple[str, str], threading.Lock] = {}
+_vector_index_syncing: set[tuple[str, str]] = set()
+_vector_indexes_lock = threading.Lock()
+
+def search_listings(
+    query: str,
+    project_id: str,
+    location: str = "US",
+    limit: int | None = None,
+    mode: str | None = None,
+) -> list[dict]:
     """
     Searches for listings in BigQuery Analytics Hub.
 
+    Searches run against the in-memory catalog snapshot for the project and
+    location (see ``listing_catalog``), so only the first search, and the
+    background refresh once the snapshot's TTL expires, touch the API.
+    Matching uses the snapshot's BM25 inverted index over listing titles and
+    descriptions, so multi-word queries match listings containing any of the
+    words, best matches first.
+
+    With ``mode="semantic"`` listings are instead matched by the cosine
+    similarity of their embedded titles and descriptions to the query
+    (``semantic_index``), and ``mode="hybrid"`` blends the max-normalized
+    BM25 score with the similarity using ``HYBRID_SEMANTIC_WEIGHT``.  Until
+    the location's vector index has been built in the background, both fall
+    back to lexical matching.
+
+    When ``limit`` is set and there is no snapshot yet, the catalog is loaded
+    in the background and this search is answered by streaming matches
+    straight from the API (``iter_search_listings``), stopping as soon as
+    ``limit`` listings are found instead of waiting for a full crawl.
+
+    Concurrent identical searches share one execution.
+
     Args:
         query: The search query string.
         project_id: The Google Cloud Project ID.
         location: The location of the data exchange (default: "US").
+        limit: Maximum number of listings to return (default: all matches).
+        mode: One of ``SEARCH_MODES`` (default: ``SEARCH_MODE`` or "lexical").
+            Streamed results are always matched lexically.
 
     Returns:
-        A list of dictionaries representing the found listings.
+        A list of dictionaries representing the found listings, most relevant
+        first, each with a ``relevance_score`` (streamed results are in
+        catalog order and unscored). A query with no searchable terms returns
+        every listing in catalog order.
+
+    Raises:
+        ValueError: If ``mode`` is not one of ``SEARCH_MODES``.
+    """
+    mode = mode or DEFAULT_SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+
+    key = (query, project_id, location, limit, mode)
+    return list(_search_flights.do(key, _search_listings, query, project_id, location, limit, mode))
+
+def _search_listings(
+    query: str, project_id: str, location: str, limit: int | None, mode: str
+) -> list[dict]:
+    """Uncoalesced implementation of ``search_listings``."""
+    snapshot = listing_catalog.get(project_id, location, block=limit is None)
+    if snapshot is None:
+        if limit is None:
+            return []
+        return list(iter_search_listings(query, project_id, location, limit=limit))
+
+    if not search_index.tokenize(query):
+        return list(snapshot.listings[:limit])
+
+    if mode == "lexical":
+        scored = snapshot.index.search(query, k=limit)
+    else:
+        vectors = _vector_index(snapshot)
+        if vectors is None:
+            scored = snapshot.index.search(query, k=limit)
+        elif mode == "semantic":
+            scored = vectors.search(query, k=limit, min_score=SEMANTIC_MIN_SIMILARITY)
+        else:
+            scored = _hybrid_search(snapshot, vectors, query, limit)
+
+    results = []
+    for name, score in scored:
+        # The indexes are updated in place on refresh, so they may briefly
+        # know listings that this (older) snapshot does not.
+        listing = snapshot.listings_by_name.get(name)
+        if listing is not None:
+            results.append({**listing, "relevance_score": round(score, 4)})
+    return results
+
+def catalog_version(project_id: str, locations: list[str]) -> tuple:
+    """
+    Return the snapshot generation of every location, in order (None where
+    no snapshot is loaded yet).  It changes whenever a location's catalog is
+    reloaded, so results derived from searches can be keyed on it.
     """
-    client = bigquery_data_exchange_v1beta1.AnalyticsHubServiceClient()
+    return tuple(listing_catalog.generation(project_id, location) for location in locations)
+
+def _vector_index(snapshot: catalog.CatalogSnapshot) -> semantic_index.VectorIndex | None:
+    """
+    Return the location's vector index without waiting for it to be built.
+
+    A missing or outdated index is (re-)synced in the background; an
+    outdated one is served meanwhile (results are filtered against the
+    snapshot), and None is returned while there is none yet.
+    """
+    generation, index = _vector_indexes.get((snapshot.project_id, snapshot.location), (None, None))
+    if generation is None or generation < snapshot.generation:
+        _sync_vector_index_in_background(snapshot)
+    return index
+
+def _on_catalog_load(snapshot: catalog.CatalogSnapshot) -> None:
+    """
+    Keep the vector index in step with the catalog: re-sync it for every new
+    snapshot of a location that has one, or of every location when semantic
+    matching is the default mode.
+    """
+    key = (snapshot.project_id, snapshot.location)
+    if DEFAULT_SEARCH_MODE != "lexical" or key in _vector_indexes:
+        _sync_vector_index_in_background(snapshot)
+
+def _sync_vector_index_in_background(snapshot: catalog.CatalogSnapshot) -> None:
+    # At most one background sync per location; a snapshot loaded meanwhile
+    # is picked up by the next search that finds the index outdated
+    key = (snapshot.project_id, snapshot.location)
+    with _vector_indexes_lock:
+        if key in _vector_index_syncing:
+            return
+        _vector_index_syncing.add(key)
+
+    def run():
+        try:
+            _sync_vector_index(snapshot)
+        except Exception as e:
+            logger.error(f"Error building vector index for {key[0]}/{key[1]}: {e}")
+        finally:
+            with _vector_indexes_lock:
+                _vector_index_syncing.discard(key)
+
+    threading.Thread(target=run, name=f"vector-index-{key[0]}-{key[1]}", daemon=True).start()
+
+def _sync_vector_index(snapshot: catalog.CatalogSnapshot) -> None:
+    """Bring the location's vector index up to ``snapshot``, embedding only changed listings."""
+    key = (snapshot.project_id, snapshot.location)
+    with _vector_indexes_lock:
+        lock = _vector_index_locks.setdefault(key, threading.Lock())
+    # One sync per location at a time; syncs queued behind it for the same
+    # or an older snapshot find the work already done
+    with lock:
+        generation, index = _vector_indexes.get(key, (None, None))
+        if generation is not None and generation >= snapshot.generation:
+            return
+        index = semantic_index.sync_vector_index(index, snapshot.listings)
+        _vector_indexes[key] = (snapshot.generation, index)
+
+def _hybrid_search(
+    snapshot: catalog.CatalogSnapshot,
+    vectors: semantic_index.VectorIndex,
+    query: str,
+    limit: int | None,
+) -> list[tuple[str, float]]:
+    """Blend max-normalized BM25 scores with semantic similarity over the union of both matches."""
+    lexical = snapshot.index.search(query, k=None)
+    semantic = vectors.search(query, k=None, min_score=SEMANTIC_MIN_SIMILARITY)
+    peak = lexical[0][1] if lexical else 1.0
+
+    scores: dict[str, float] = {}
+    for name, score in lexical:
+        scores[name] = (1 - HYBRID_SEMANTIC_WEIGHT) * score / peak
+    for name, score in semantic:
+        scores[name] = scores.get(name, 0.0) + HYBRID_SEMANTIC_WEIGHT * score
+
+    if limit is None:
+        return sorted(scores.items(), key=lambda item: -item[1])
+    return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+def iter_search_listings(
+    query: str,
+    project_id: str,
+    location: str = "US",
+    limit: int | None = None,
+    page_size: int = DEFAULT_STREAM_PAGE_SIZE,
+):
+    """
+    Streams matching listings from the Analytics Hub API as pages arrive.
+
+    Exchanges and their listings are paged through lazily, one exchange at a
+    time, and each match is yielded as soon as its page has been fetched.
+    Paging stops once ``limit`` matches have been yielded (or when the caller
+    stops iterating), so a limited search only pays for the pages it needs.
+
+    A listing matches when its title or description contains any query term
+    (see ``search_index.tokenize``); a query without terms matches everything.
+
+    Args:
+        query: The search query string.
+        project_id: The Google Cloud Project ID.
+        location: The location of the data exchanges (default: "US").
+        limit: Stop after this many matches (default: no limit).
+        page_size: Page size for the exchange and listing list calls.
+
+    Yields:
+        Listing dictionaries, in catalog order. Exchanges whose listings
+        cannot be fetched are skipped.
+    """
+    if limit is not None and limit <= 0:
+        return
+
+    client = clients.get_client(
+        bigquery_data_exchange_v1beta1.AnalyticsHubServiceClient, project_id
+    )
+    terms = set(search_index.tokenize(query))
+    parent = f"projects/{project_id}/locations/{location}"
+    found = 0
+
+    # One span for the whole stream: the pagers fetch pages lazily
+    with tracing.api_call("analyticshub.stream_listings", parent=parent) as span:
+        try:
+            request = bigquery_data_exchange_v1beta1.ListDataExchangesRequest(
+                parent=parent, page_size=page_size
+            )
+            for exchange in client.list_data_exchanges(request=request, **concurrency.rpc_timeout()):
+                try:
+                    listings_request = bigquery_data_exchange_v1beta1.ListListingsRequest(
+                        parent=exchange.name, page_size=page_size
+                    )
+                    for listing in client.list_listings(
+                        request=listings_request, **concurrency.rpc_timeout()
+                    ):
+                        text = f"{listing.display_name} {listing.description or ''}"
+                        if terms and terms.isdisjoint(search_index.tokenize(text)):
+                            continue
+
+                        yield _listing_record(listing, exchange, project_id, location)
+                        found += 1
+                        if limit is not None and found >= limit:
+                            return
+
+                except exceptions.GoogleAPICallError as e:
+                    span.record_error(e)
+                    logger.error(f"Error listing listings in exchange {exchange.name}: {e}")
+
+        except exceptions.GoogleAPICallError as e:
+            span.record_error(e)
+            logger.error(f"Error searching listings: {e}")
+        finally:
+            span.set(result_count=found)
+
+def crawl_catalog(
+    project_id: str,
+    location: str = "US",
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Fetches every data exchange and listing in a location from Analytics Hub.
+
+    Listings are fetched from every data exchange concurrently, with at most
+    ``max_concurrency`` ``list_listings`` calls in flight.
+
+    Args:
+        project_id: The Google Cloud Project ID.
+        location: The location of the data exchanges (default: "US").
+        max_concurrency: Maximum number of exchanges listed at the same time.
+
+    Returns:
+        A tuple of (exchanges, listings) dictionaries, in exchange order.
+        Exchanges whose listings cannot be fetched contribute no listings.
+
+    Raises:
+        GoogleAPICallError: If the data exchanges themselves cannot be listed.
+    """
+    with concurrency.no_deadline():
+        return _crawl_catalog(project_id, location, max_concurrency)
+
+def _crawl_catalog(project_id: str, location: str, max_concurrency: int) -> tuple[list[dict], list[dict]]:
+    """Implementation of ``crawl_catalog``, run without the caller's deadline."""
+    client = clients.get_client(
+        bigquery_data_exchange_v1beta1.AnalyticsHubServiceClient, project_id
+    )
     
     # Construct the parent resource
     parent = f"projects/{project_id}/locations/{location}"
     
     # Note: The actual API doesn't have a direct "search" method like a search engine. 
-    # We typically list data exchanges and then list listings within them, 
-    # OR if using the specialized search API if enabled.
-    # For this implementation, we will assume we are listing from all exchanges in the location
-    # and filtering client-side or using the `filter` parameter if supported.
-    # However, `list_listings` requires a specific data exchange.
-    # To search *across* exchanges, we first list exchanges.
-    
-    results = []
-    
+    # `list_listings` requires a specific data exchange, so to cover *all*
+    # exchanges in the location we first list exchanges.
+
+    # 1. List Data Exchanges
+    request = bigquery_data_exchange_v1beta1.ListDataExchangesRequest(parent=parent)
+    with tracing.api_call("analyticshub.list_data_exchanges", parent=parent) as span:
+        exchanges = list(client.list_data_exchanges(
+            request=request, **concurrency.rpc_timeout(CRAWL_CALL_TIMEOUT)
+        ))
+        span.set(result_count=len(exchanges))
+
+    # 2. List Listings in each Exchange, fanned out over a bounded worker pool
+    def list_exchange(exchange) -> list[dict]:
+        return _list_exchange_listings(client, exchange, project_id, location)
+
+    per_exchange = concurrency.map_bounded(
+        list_exchange, exchanges, max_concurrency, thread_name_prefix="crawl_catalog"
+    )
+
+    exchange_records = [
+        {
+            "name": exchange.name,
+            "display_name": exchange.display_name,
+            "exchange_id": exchange.name.split("/")[-1],
+        }
+        for exchange in exchanges
+    ]
+    return exchange_records, [listing for listings in per_exchange for listing in listings]
+
+def _list_exchange_listings(client, exchange, project_id: str, location: str) -> list[dict]:
+    """
+    Returns every listing of one data exchange.
+
+    API errors are logged and yield no listings so that a single failing
+    exchange does not fail the whole crawl.
+    """
     try:
-        # 1. List Data Exchanges
-        request = bigquery_data_exchange_v1beta1.ListDataExchangesRequest(parent=parent)
-        page_result = client.list_data_exchanges(request=request)
-        
-        for exchange in page_result:
-            # 2. List Listings in each Exchange
-            listings_request = bigquery_data_exchange_v1beta1.ListListingsRequest(
-                parent=exchange.name
-            )
-            listings_page = client.list_listings(request=listings_request)
-            
-            for listing in listings_page:
-                # Basic case-insensitive search on title/description
-                if query.lower() in listing.display_name.lower() or \
-                   (listing.description and query.lower() in listing.description.lower()):
-                    
-                    results.append({
-                        "name": listing.name,
-                        "display_name": listing.display_name,
-                        "description": listing.description,
-                        "data_exchange": exchange.display_name,
-                        "listing_id": listing.name.split("/")[-1],
-                        "project_id": project_id,
-                        "location": location,
-                        "exchange_id": exchange.name.split("/")[-1]
-                    })
-                    
+        listings_request = bigquery_data_exchange_v1beta1.ListListingsRequest(
+            parent=exchange.name
+        )
+        with tracing.api_call("analyticshub.list_listings", parent=exchange.name) as span:
+            listings = [
+                _listing_record(listing, exchange, project_id, location)
+                for listing in client.list_listings(
+                    request=listings_request, **concurrency.rpc_timeout(CRAWL_CALL_TIMEOUT)
+                )
+            ]
+            span.set(result_count=len(listings))
+        return listings
+
     except exceptions.GoogleAPICallError as e:
-        logger.error(f"Error searching listings: {e}")
+        logger.error(f"Error listing listings in exchange {exchange.name}: {e}")
         return []
 
-    return results
+def _listing_record(listing, exchange, project_id: str, location: str) -> dict:
+    """Converts an Analytics Hub listing protobuf into the listing dict used by the agent."""
+    return {
+        "name": listing.name,
+        "display_name": listing.display_name,
+        "description": listing.description,
+        "data_exchange": exchange.display_name,
+        "listing_id": listing.name.split("/")[-1],
+        "project_id": project_id,
+        "location": location,
+        "exchange_id": exchange.name.split("/")[-1],
+        "source_dataset": listing.bigquery_dataset.dataset or None,
+        "url": get_listing_url(listing.name, project_id),
+    }
+
+# Process-wide catalog snapshots used by search_listings. Expose
+# `listing_catalog.stats()` for hit/miss/refresh-age monitoring. Setting
+# CATALOG_SNAPSHOT_PATH persists snapshots to disk for fast cold starts.
+_snapshot_path = os.environ.get("CATALOG_SNAPSHOT_PATH")
+listing_catalog = catalog.CatalogCache(
+    loader=crawl_catalog,
+    indexer=search_index.sync_listing_index,
+    ttl_seconds=float(os.environ.get("CATALOG_TTL_SECONDS", "900")),
+    store=catalog_store.CatalogStore(_snapshot_path) if _snapshot_path else None,
+    on_load=_on_catalog_load,
+)
 
 def subscribe_listing(listing_name: str, destination_dataset: str, project_id: str, location: str = "US") -> str:
     """
@@ -80,7 +419,9 @@ def subscribe_listing(listing_name: str, destination_dataset: str, project_id: s
     Returns:
         The resource name of the subscription, or error message.
     """
-    client = bigquery_data_exchange_v1beta1.AnalyticsHubServiceClient()
+    client = clients.get_client(
+        bigquery_data_exchange_v1beta1.AnalyticsHubServiceClient, project_id
+    )
     
     try:
         # The API requires specifying the destination dataset.
@@ -99,10 +440,19 @@ def subscribe_listing(listing_name: str, destination_dataset: str, project_id: s
             destination_dataset=destination_dataset_ref
         )
         
-        response = client.subscribe_listing(request=request)
+        with tracing.api_call("analyticshub.subscribe_listing", listing=listing_name):
+            response = client.subscribe_listing(request=request, **concurrency.rpc_timeout())
         logger.info(f"Subscribed to {listing_name}. Result: {response}")
         return f"Successfully subscribed! Data is available in dataset: {destination_dataset}"
 
+    except exceptions.DeadlineExceeded as e:
+        # The server may still complete the subscription
+        logger.warning(f"Subscription to {listing_name} did not answer in time: {e}")
+        return (
+            f"Subscription to {listing_name} is taking longer than expected; "
+            f"check dataset {destination_dataset} in project {project_id} shortly."
+        )
+
     except exceptions.GoogleAPICallError as e:
         logger.error(f"Error subscribing to listing: {e}")
         return f"Failed to subscribe: {e}"
@@ -129,3 +479,19 @@ def get_listing_url(listing_name: str, project_id: str) -> str:
         return f"https://console.cloud.google.com/bigquery/analytics-hub/locations/{location}/exchanges/{exchange_id}/listings/{listing_id}?project={project_id}"
     except IndexError:
         return "https://console.cloud.google.com/bigquery/analytics-hub"
+
+def listing_location(listing_name: str, default: str = "US") -> str:
+    """
+    Returns the location segment of a listing resource name.
+
+    Args:
+        listing_name: Full resource name (projects/.../locations/{location}/...).
+        default: Value returned when the name has no location segment.
+
+    Returns:
+        The listing's location, e.g. "US" or "europe-west1".
+    """
+    parts = listing_name.split("/")
+    if len(parts) > 3 and parts[2] == "locations" and parts[3]:
+        return parts[3]
+    return default
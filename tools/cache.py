@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with optional per-entry TTL.
+
+    Once ``maxsize`` entries are stored, adding another evicts the least
+    recently used one.  With ``ttl_seconds`` set, entries older than that are
+    treated as absent and dropped on access.  With ``max_weight`` set, every
+    value is weighed with ``weigher`` (e.g. its approximate size in bytes) and
+    least recently used entries are also evicted while the total exceeds it.
+    Hit, miss and eviction counts are kept for monitoring.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        max_weight: int | None = None,
+        weigher: Callable[[Any], int] | None = None,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if max_weight is not None and weigher is None:
+            raise ValueError("max_weight requires a weigher")
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.max_weight = max_weight
+        self._weigher = weigher
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[Any, float, int]] = OrderedDict()
+        self._weight = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key`` (marking it recently used), or ``default``."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and self._expired(entry):
+                self._remove(key)
+                entry = _MISSING
+
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store ``value`` under ``key``, evicting the least recently used entries
+        if full.  A value heavier than ``max_weight`` on its own is not stored.
+        """
+        weight = self._weigher(value) if self._weigher is not None else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_weight is not None and weight > self.max_weight:
+                return
+            self._entries[key] = (value, self._clock(), weight)
+            self._weight += weight
+            while len(self._entries) > self.maxsize or (
+                self.max_weight is not None and self._weight > self.max_weight
+            ):
+                _, (_, _, evicted_weight) = self._entries.popitem(last=False)
+                self._weight -= evicted_weight
+                self._evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove ``key`` and return its value, or ``default`` if absent."""
+        with self._lock:
+            entry = self._remove(key)
+        return default if entry is _MISSING else entry[0]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] | None = None) -> int:
+        """
+        Drop every entry whose key satisfies ``predicate`` (all entries if None).
+
+        Returns:
+            The number of entries removed.
+        """
+        with self._lock:
+            if predicate is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._weight = 0
+                return removed
+
+            doomed = [key for key in self._entries if predicate(key)]
+            for key in doomed:
+                self._remove(key)
+            return len(doomed)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters, current size and total weight."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "weight": self._weight,
+                "max_weight": self.max_weight,
+            }
+
+    def _remove(self, key: Hashable):
+        """Drop ``key`` (caller holds the lock) and return its entry, or ``_MISSING``."""
+        entry = self._entries.pop(key, _MISSING)
+        if entry is not _MISSING:
+            self._weight -= entry[2]
+        return entry
+
+    def _expired(self, entry: tuple[Any, float, int]) -> bool:
+        return self.ttl_seconds is not None and self._clock() - entry[1] >= self.ttl_seconds
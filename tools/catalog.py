@@ -0,0 +1,308 @@
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CatalogSnapshot:
+    """
+    Point-in-time copy of every exchange and listing in one (project, location).
+
+    ``fetched_at`` is a wall-clock timestamp (``time.time()``) so snapshots can
+    be compared across processes; ``generation`` increases on every load by the
+    owning cache so callers can cheaply detect that the catalog changed.
+    ``index`` is the search index built by the cache's indexer, if any.
+    """
+
+    project_id: str
+    location: str
+    exchanges: list[dict]
+    listings: list[dict]
+    fetched_at: float
+    generation: int = 0
+    index: Any = field(default=None, repr=False)
+    listings_by_name: dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.listings_by_name = {listing["name"]: listing for listing in self.listings}
+
+    def age(self, now: float | None = None) -> float:
+        """Seconds since this snapshot was fetched."""
+        return (time.time() if now is None else now) - self.fetched_at
+
+
+# Loader signature: (project_id, location) -> (exchanges, listings)
+CatalogLoader = Callable[[str, str], tuple[list[dict], list[dict]]]
+
+# Indexer signature: (previous index or None, listings) -> index
+CatalogIndexer = Callable[[Any, list[dict]], Any]
+
+# Load hook signature: called with every snapshot the cache stores
+CatalogLoadHook = Callable[[CatalogSnapshot], None]
+
+
+class CatalogCache:
+    """
+    In-memory catalog snapshots keyed by (project, location).
+
+    The first request for a key loads the catalog synchronously.  Once a
+    snapshot is older than ``ttl_seconds`` it is still served immediately
+    (stale-while-revalidate) while a single background thread reloads it, so
+    searches never wait on a full crawl after the first one.  A failed
+    background refresh keeps serving the previous snapshot.
+
+    When an ``indexer`` is given, every load passes it the previous snapshot's
+    index (or None) and the new listings, so the search index can be updated
+    incrementally instead of being rebuilt from scratch.
+
+    When a ``store`` (``catalog_store.CatalogStore``) is given, every loaded
+    snapshot is also written to disk, and a key with no in-memory snapshot is
+    first served from disk while a background refresh reconciles it with the
+    live API.  This makes a fresh process's first search a local lookup.
+
+    ``on_load`` is called with every newly stored snapshot on the thread that
+    loaded it (usually a background refresh), so derived structures such as
+    a vector index can be brought up to date off the request path.  Errors it
+    raises are logged and do not affect the snapshot.
+    """
+
+    def __init__(
+        self,
+        loader: CatalogLoader,
+        ttl_seconds: float = 900.0,
+        clock: Callable[[], float] = time.time,
+        indexer: CatalogIndexer | None = None,
+        store=None,
+        on_load: CatalogLoadHook | None = None,
+    ):
+        self._loader = loader
+        self._indexer = indexer
+        self._on_load = on_load
+        self._store = store
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._snapshots: dict[tuple[str, str], CatalogSnapshot] = {}
+        self._load_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._refreshing: set[tuple[str, str]] = set()
+        self._generations = itertools.count(1)
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "store_loads": 0,
+        }
+
+    def get(self, project_id: str, location: str, block: bool = True) -> CatalogSnapshot | None:
+        """
+        Return the snapshot for (project, location), loading it on first use.
+
+        Args:
+            project_id: The Google Cloud Project ID.
+            location: The catalog location.
+            block: When False and there is no snapshot yet, serve it from the
+                on-disk store if there is one, else start loading it in the
+                background and return None instead of waiting.
+
+        Returns:
+            The current snapshot (possibly stale while a refresh runs), or None
+            when there is no snapshot yet and it failed to load or was not
+            waited for.
+        """
+        key = (project_id, location)
+        snapshot = self._snapshots.get(key)
+
+        if snapshot is None:
+            self._count("misses")
+            if not block:
+                return self._load_from_store_nowait(key)
+            return self._load(key)
+
+        if snapshot.age(self._clock()) < self.ttl_seconds:
+            self._count("hits")
+        else:
+            self._count("stale_hits")
+            self._refresh_in_background(key)
+        return snapshot
+
+    def generation(self, project_id: str, location: str) -> int | None:
+        """
+        Return the generation of the current snapshot, or None if there is none.
+
+        Unlike ``get`` this never loads or refreshes and is not counted in the
+        stats, so callers can cheaply key derived caches on catalog changes.
+        """
+        snapshot = self._snapshots.get((project_id, location))
+        return snapshot.generation if snapshot is not None else None
+
+    def refresh(self, project_id: str, location: str) -> CatalogSnapshot | None:
+        """Synchronously reload the snapshot for (project, location)."""
+        return self._load((project_id, location), force=True)
+
+    def invalidate(self, project_id: str | None = None, location: str | None = None) -> None:
+        """Drop cached snapshots; with no arguments every snapshot is dropped."""
+        with self._lock:
+            for key in list(self._snapshots):
+                if project_id not in (None, key[0]) or location not in (None, key[1]):
+                    continue
+                del self._snapshots[key]
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss/refresh counters and per-key snapshot age for monitoring.
+        """
+        now = self._clock()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["snapshots"] = {
+                f"{project}/{location}": {
+                    "age_seconds": round(snapshot.age(now), 3),
+                    "generation": snapshot.generation,
+                    "exchanges": len(snapshot.exchanges),
+                    "listings": len(snapshot.listings),
+                    "refreshing": (project, location) in self._refreshing,
+                }
+                for (project, location), snapshot in self._snapshots.items()
+            }
+        return stats
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _load_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _load(self, key, force: bool = False) -> CatalogSnapshot | None:
+        # One load per key at a time; concurrent first requests wait for it
+        # and then share the freshly stored snapshot.
+        with self._load_lock(key):
+            current = self._snapshots.get(key)
+            if current is not None and not force:
+                return current
+
+            if current is None and not force:
+                stored = self._load_from_store(key)
+                if stored is not None:
+                    return stored
+
+            project_id, location = key
+            try:
+                exchanges, listings = self._loader(project_id, location)
+                index = None
+                if self._indexer is not None:
+                    index = self._indexer(current.index if current else None, listings)
+            except Exception as e:
+                logger.error(f"Error loading catalog for {project_id}/{location}: {e}")
+                self._count("refresh_failures")
+                return current
+
+            snapshot = CatalogSnapshot(
+                project_id=project_id,
+                location=location,
+                exchanges=exchanges,
+                listings=listings,
+                fetched_at=self._clock(),
+                generation=next(self._generations),
+                index=index,
+            )
+            with self._lock:
+                self._snapshots[key] = snapshot
+                self._stats["refreshes"] += 1
+
+            if self._store is not None:
+                self._store.save(
+                    project_id, location, exchanges, listings, snapshot.fetched_at, index
+                )
+            self._notify_load(snapshot)
+            return snapshot
+
+    def _load_from_store_nowait(self, key) -> CatalogSnapshot | None:
+        """
+        Serve a cold key from the on-disk store without waiting on a load.
+
+        Reading the store is a local lookup, so it is done on the caller's
+        thread; when another load of the key is already running, or there is
+        nothing on disk, the key is loaded in the background instead.
+        """
+        lock = self._load_lock(key)
+        if self._store is not None and lock.acquire(blocking=False):
+            try:
+                snapshot = self._snapshots.get(key) or self._load_from_store(key)
+            finally:
+                lock.release()
+            if snapshot is not None:
+                return snapshot
+        self._refresh_in_background(key)
+        return None
+
+    def _load_from_store(self, key) -> CatalogSnapshot | None:
+        """Serve a key from the on-disk store and reconcile it in the background."""
+        if self._store is None:
+            return None
+
+        project_id, location = key
+        stored = self._store.load(project_id, location)
+        if stored is None:
+            return None
+
+        index = stored.index
+        if index is None and self._indexer is not None:
+            index = self._indexer(None, stored.listings)
+
+        snapshot = CatalogSnapshot(
+            project_id=project_id,
+            location=location,
+            exchanges=stored.exchanges,
+            listings=stored.listings,
+            fetched_at=stored.fetched_at,
+            generation=next(self._generations),
+            index=index,
+        )
+        with self._lock:
+            self._snapshots[key] = snapshot
+            self._stats["store_loads"] += 1
+        self._notify_load(snapshot)
+
+        # The disk copy may be arbitrarily old: always check it against the API
+        self._refresh_in_background(key)
+        return snapshot
+
+    def _notify_load(self, snapshot: CatalogSnapshot) -> None:
+        if self._on_load is None:
+            return
+        try:
+            self._on_load(snapshot)
+        except Exception as e:
+            logger.error(
+                f"Error in catalog load hook for {snapshot.project_id}/{snapshot.location}: {e}"
+            )
+
+    def _refresh_in_background(self, key) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._load(key, force=True)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(
+            target=run, name=f"catalog-refresh-{key[0]}-{key[1]}", daemon=True
+        ).start()
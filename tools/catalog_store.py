@@ -0,0 +1,187 @@
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+import zipfile
+
+import numpy as np
+
+from tools.search_index import InvertedIndex
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the table layout or the serialized listing/index format
+# changes; files written with another version are discarded and rebuilt.
+SCHEMA_VERSION = 1
+
+_CREATE_TABLES = (
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    """
+    CREATE TABLE IF NOT EXISTS snapshots (
+        project_id TEXT NOT NULL,
+        location TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        exchanges TEXT NOT NULL,
+        listings TEXT NOT NULL,
+        index_metadata TEXT,
+        index_arrays BLOB,
+        PRIMARY KEY (project_id, location)
+    )
+    """,
+)
+
+
+class StoredSnapshot:
+    """A catalog snapshot as read back from disk."""
+
+    def __init__(self, exchanges: list[dict], listings: list[dict], fetched_at: float, index=None):
+        self.exchanges = exchanges
+        self.listings = listings
+        self.fetched_at = fetched_at
+        self.index = index
+
+
+class CatalogStore:
+    """
+    SQLite file holding the latest catalog snapshot per (project, location).
+
+    Each row stores the exchanges and listings as JSON together with the
+    listing search index (``InvertedIndex.export``) as a NumPy archive, so a
+    new process can serve searches from disk without re-crawling or
+    re-indexing.  A file that is corrupt or was written with a different
+    ``SCHEMA_VERSION`` is treated as empty on load and replaced on save.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, project_id: str, location: str) -> StoredSnapshot | None:
+        """
+        Read the stored snapshot for (project, location).
+
+        Returns:
+            The stored snapshot, or None if there is none or the file is
+            missing, corrupt or from an incompatible schema version.
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        started = time.perf_counter()
+        try:
+            conn = self._connect()
+            try:
+                if self._schema_version(conn) != SCHEMA_VERSION:
+                    logger.warning(f"Ignoring catalog snapshot {self.path}: incompatible schema version")
+                    return None
+
+                row = conn.execute(
+                    "SELECT fetched_at, exchanges, listings, index_metadata, index_arrays "
+                    "FROM snapshots WHERE project_id = ? AND location = ?",
+                    (project_id, location),
+                ).fetchone()
+            finally:
+                conn.close()
+            if row is None:
+                return None
+
+            fetched_at, exchanges, listings, index_metadata, index_arrays = row
+            index = None
+            if index_metadata is not None and index_arrays is not None:
+                index = _decode_index(index_metadata, index_arrays)
+            snapshot = StoredSnapshot(json.loads(exchanges), json.loads(listings), fetched_at, index)
+
+        except (sqlite3.Error, zipfile.BadZipFile, ValueError, KeyError, TypeError, OSError) as e:
+            logger.warning(f"Ignoring unreadable catalog snapshot {self.path}: {e}")
+            return None
+
+        logger.info(
+            f"Loaded catalog snapshot for {project_id}/{location} "
+            f"({len(snapshot.listings)} listings) in {time.perf_counter() - started:.3f}s"
+        )
+        return snapshot
+
+    def save(self, project_id: str, location: str, exchanges: list[dict], listings: list[dict],
+             fetched_at: float, index: InvertedIndex | None = None) -> None:
+        """
+        Write the snapshot for (project, location), replacing any previous one.
+
+        Failures are logged, never raised: the on-disk copy is only an
+        optimisation for cold starts.
+        """
+        index_metadata = index_arrays = None
+        if index is not None:
+            index_metadata, index_arrays = _encode_index(index)
+
+        row = (
+            project_id, location, fetched_at, json.dumps(exchanges), json.dumps(listings),
+            index_metadata, index_arrays,
+        )
+        try:
+            self._write(row)
+        except sqlite3.DatabaseError as e:
+            # Not a database we can use (corrupt or foreign file): start over
+            logger.warning(f"Recreating catalog snapshot file {self.path}: {e}")
+            try:
+                os.remove(self.path)
+                self._write(row)
+            except (sqlite3.Error, OSError) as retry_error:
+                logger.error(f"Error saving catalog snapshot to {self.path}: {retry_error}")
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Error saving catalog snapshot to {self.path}: {e}")
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        # A short-lived connection per operation keeps the store safe to use
+        # from request threads and background refresh threads alike.
+        return sqlite3.connect(self.path, timeout=10)
+
+    @staticmethod
+    def _schema_version(conn: sqlite3.Connection) -> int | None:
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        try:
+            return int(row[0]) if row else None
+        except ValueError:
+            return None
+
+    def _write(self, row: tuple) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                if self._schema_version(conn) != SCHEMA_VERSION:
+                    conn.execute("DROP TABLE IF EXISTS snapshots")
+                    conn.execute("DROP TABLE IF EXISTS meta")
+                for statement in _CREATE_TABLES:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                    (str(SCHEMA_VERSION),),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (project_id, location, fetched_at, "
+                    "exchanges, listings, index_metadata, index_arrays) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+        finally:
+            conn.close()
+
+
+def _encode_index(index: InvertedIndex) -> tuple[str, bytes]:
+    metadata, arrays = index.export()
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return json.dumps(metadata), buffer.getvalue()
+
+
+def _decode_index(index_metadata: str, index_arrays: bytes) -> InvertedIndex:
+    # allow_pickle=False: the archive only ever holds plain numeric arrays
+    with np.load(io.BytesIO(index_arrays), allow_pickle=False) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+    return InvertedIndex.from_export(json.loads(index_metadata), arrays)
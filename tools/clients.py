@@ -0,0 +1,134 @@
+import itertools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of long-lived Google Cloud API clients.
+
+    Building a GAPIC client sets up a gRPC channel, loads credentials and
+    performs a TLS handshake, so tool functions fetch their clients from here
+    instead of constructing one per call.  Clients are keyed by
+    ``(client class, project, endpoint)``; each key holds a small pool of
+    clients (one channel each) that are handed out round-robin.
+
+    Fakes can be installed per client class with ``override`` so tests and
+    offline benchmarks never reach the real APIs.
+    """
+
+    def __init__(self, pool_size: int = 1):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._pools: dict = {}
+        self._counters: dict = {}
+        self._overrides: dict = {}
+
+    def get(self, client_cls, project_id: str | None = None, endpoint: str | None = None):
+        """
+        Return a shared client of ``client_cls`` for the project and endpoint.
+
+        Args:
+            client_cls: The GAPIC client class, e.g. ``dataplex_v1.CatalogServiceClient``.
+            project_id: The project the client is used for; kept in the key so
+                per-project clients can be closed or swapped independently.
+            endpoint: Optional API endpoint override (``client_options.api_endpoint``).
+
+        Returns:
+            A client instance, or the registered fake for ``client_cls``.
+        """
+        fake = self._overrides.get(client_cls)
+        if fake is not None:
+            return fake
+
+        key = (client_cls, project_id, endpoint)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = [self._create(client_cls, endpoint) for _ in range(self.pool_size)]
+                    self._counters[key] = itertools.count()
+                    self._pools[key] = pool
+
+        if len(pool) == 1:
+            return pool[0]
+        return pool[next(self._counters[key]) % len(pool)]
+
+    def override(self, client_cls, fake) -> None:
+        """Make ``get`` return ``fake`` for every request for ``client_cls``."""
+        with self._lock:
+            self._overrides[client_cls] = fake
+
+    def clear_overrides(self) -> None:
+        """Remove every fake installed with ``override``."""
+        with self._lock:
+            self._overrides.clear()
+
+    def close(self) -> None:
+        """Close every pooled client's transport and empty the registry."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+            self._counters.clear()
+
+        for pool in pools:
+            for client in pool:
+                _close_client(client)
+
+    @staticmethod
+    def _create(client_cls, endpoint: str | None):
+        if endpoint:
+            return client_cls(client_options={"api_endpoint": endpoint})
+        return client_cls()
+
+
+def _close_client(client) -> None:
+    """Close a GAPIC client's transport, logging rather than raising on failure."""
+    transport = getattr(client, "transport", None)
+    close = getattr(transport, "close", None)
+    if not callable(close):
+        return
+    try:
+        close()
+    except Exception as e:
+        logger.warning(f"Error closing API client {type(client).__name__}: {e}")
+
+
+def project_from_resource(resource_name: str) -> str | None:
+    """Return the project ID from a ``projects/{p}/...`` resource name, if present."""
+    parts = (resource_name or "").split("/")
+    if len(parts) >= 2 and parts[0] == "projects" and parts[1]:
+        return parts[1]
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Process-wide default registry
+# ---------------------------------------------------------------------------
+
+_registry = ClientRegistry()
+
+
+def get_client(client_cls, project_id: str | None = None, endpoint: str | None = None):
+    """Return a shared client from the process-wide registry."""
+    return _registry.get(client_cls, project_id, endpoint)
+
+
+def override_client(client_cls, fake) -> None:
+    """Install a fake for ``client_cls`` in the process-wide registry."""
+    _registry.override(client_cls, fake)
+
+
+def clear_overrides() -> None:
+    """Remove every fake from the process-wide registry."""
+    _registry.clear_overrides()
+
+
+def close_all() -> None:
+    """Close every client in the process-wide registry (call at shutdown)."""
+    _registry.close()
@@ -0,0 +1,365 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Hashable, Iterable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Shared pool for calls awaited from event loops (``run_blocking`` and
+# ``amap_with_timeout``). Calls that overrun their timeout keep running here
+# in the background instead of blocking the caller. Nothing running on it
+# submits to it again: nested fan-outs (``map_with_timeout`` inside an
+# awaited call) get their own pool, so they can never wait behind callers
+# that hold every shared worker.
+_SHARED_MAX_WORKERS = 32
+_shared_executor: ThreadPoolExecutor | None = None
+_shared_executor_lock = threading.Lock()
+
+# Absolute deadline (``time.time()``) of the request the calling code runs
+# for.  Fan-outs and blocking calls never wait past it; like every context
+# variable it follows asyncio tasks and, through the context copies below,
+# worker threads.
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+@contextlib.contextmanager
+def deadline_scope(deadline: float | None):
+    """
+    Bound every fan-out and ``run_before_deadline`` call inside the block by
+    ``deadline`` (a ``time.time()`` value; None adds no bound).
+
+    Scopes only ever tighten: inside an earlier deadline, the earlier one wins.
+    """
+    current = _deadline.get()
+    if deadline is None or (current is not None and current <= deadline):
+        yield
+        return
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def no_deadline():
+    """
+    Run the block without the caller's deadline, e.g. for shared work such as
+    a catalog crawl that must not be cut short by whichever request started it.
+    """
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining() -> float | None:
+    """Seconds left before the current deadline (never negative), or None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def bounded_timeout(timeout: float | None) -> float | None:
+    """``timeout`` shortened to the time left before the current deadline."""
+    remaining = time_remaining()
+    if remaining is None:
+        return timeout
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def rpc_timeout(default: float | None = None) -> dict:
+    """
+    Keyword arguments that bound a Google API client call by the deadline.
+
+    Waiting callers already stop at the deadline; passing these to the call
+    itself (``client.method(request=..., **rpc_timeout())``) also ends the
+    call there, so it does not keep its worker thread busy after the request
+    has answered.  Without a deadline or ``default`` they are empty and the
+    client's own default timeout applies.
+    """
+    timeout = bounded_timeout(default)
+    return {} if timeout is None else {"timeout": timeout}
+
+
+def map_bounded(
+    fn: Callable[[T], R], items: Iterable[T], max_workers: int, thread_name_prefix: str = "tools"
+) -> list[R]:
+    """
+    Apply ``fn`` to every item using at most ``max_workers`` threads.
+
+    Results are returned in the same order as ``items`` regardless of which
+    call finishes first, so callers get deterministic output.  Exceptions are
+    not swallowed: ``fn`` is expected to handle its own per-item failures.
+    Each call runs in a copy of the caller's context, so context variables
+    such as the tracing request ID carry over to the worker threads.
+
+    Args:
+        fn: Function to call once per item.
+        items: Inputs to fan out over.
+        max_workers: Upper bound on concurrent calls (values below 1 mean 1).
+        thread_name_prefix: Prefix for worker thread names, useful in stack dumps.
+
+    Returns:
+        List of ``fn(item)`` results, in input order.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    workers = max(1, min(max_workers, len(items)))
+    if workers == 1:
+        return [fn(item) for item in items]
+
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix) as pool:
+        return list(pool.map(lambda item: context.copy().run(fn, item), items))
+
+
+def map_with_timeout(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    timeout: float | None,
+    max_workers: int = 8,
+    thread_name_prefix: str = "tools",
+) -> list[tuple[T, R]]:
+    """
+    Apply ``fn`` to every item concurrently and keep what finishes in time.
+
+    All calls share one overall ``timeout`` because they run side by side.
+    Calls that are still running when it expires are abandoned (they finish in
+    the background on the fan-out's own pool, which then shuts down) and calls
+    that raise are logged; both are
+    left out of the result rather than failing the whole fan-out.  Like
+    ``map_bounded``, calls run in a copy of the caller's context.
+
+    The wait never extends past the current deadline (see ``deadline_scope``),
+    and once it has passed no call is started at all.
+
+    Args:
+        fn: Function to call once per item.
+        items: Inputs to fan out over.
+        timeout: Seconds to wait for results, or None to wait for every call.
+        max_workers: Upper bound on concurrent calls (values below 1 mean 1).
+        thread_name_prefix: Prefix for worker thread names, useful in stack dumps.
+
+    Returns:
+        ``(item, fn(item))`` pairs for the calls that completed, in input order.
+    """
+    items = list(items)
+    timeout = bounded_timeout(timeout)
+    if not items or _deadline_expired(timeout, items):
+        return []
+
+    # A pool per fan-out rather than the shared one: this is typically called
+    # from a call already running on the shared pool, and queueing behind it
+    # could starve the lookups until they time out.
+    workers = max(1, min(max_workers, len(items)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+    try:
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        wait(futures, timeout=timeout)
+    finally:
+        # Abandoned calls finish in the background; nothing waits for them
+        pool.shutdown(wait=False)
+
+    completed = []
+    for item, future in zip(items, futures):
+        if not future.done():
+            logger.warning(f"Timed out after {timeout}s waiting for {item!r}; skipping it")
+            continue
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Error processing {item!r}: {error}")
+            continue
+        completed.append((item, future.result()))
+    return completed
+
+
+async def run_blocking(fn: Callable[..., R], *args, **kwargs) -> R:
+    """
+    Await a blocking call without holding up the event loop.
+
+    The call runs on the shared pool only while it is in flight, so async
+    callers can keep many requests open on one loop.  Unlike the loop's
+    default executor, nothing waits for that pool when ``asyncio.run``
+    returns, so a call abandoned after a timeout does not hold up the caller.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_get_shared_executor(), call)
+
+
+async def run_before_deadline(fn: Callable[..., R], *args, **kwargs) -> R:
+    """
+    ``run_blocking`` bounded by the current deadline.
+
+    Raises:
+        asyncio.TimeoutError: The deadline passed before the call finished
+            (the call keeps running in the background) or before it started
+            (the call is not made).
+    """
+    timeout = time_remaining()
+    if timeout == 0:
+        raise asyncio.TimeoutError(f"Deadline passed before calling {getattr(fn, '__name__', fn)}")
+    return await asyncio.wait_for(run_blocking(fn, *args, **kwargs), timeout)
+
+
+async def amap_with_timeout(
+    fn: Callable[[T], R], items: Iterable[T], timeout: float | None
+) -> list[tuple[T, R]]:
+    """
+    Async counterpart of ``map_with_timeout``.
+
+    Every blocking ``fn(item)`` call runs on the shared pool and is awaited
+    side by side under one overall ``timeout``.  Calls that are still running
+    when it expires are abandoned and calls that raise are logged; both are
+    left out of the result.  Like ``map_with_timeout``, the wait is bounded
+    by the current deadline.
+
+    Returns:
+        ``(item, fn(item))`` pairs for the calls that completed, in input order.
+    """
+    items = list(items)
+    timeout = bounded_timeout(timeout)
+    if not items or _deadline_expired(timeout, items):
+        return []
+
+    tasks = [asyncio.ensure_future(run_blocking(fn, item)) for item in items]
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        # The thread keeps running; cancelling only stops us waiting on it
+        task.cancel()
+
+    completed = []
+    for item, task in zip(items, tasks):
+        if task in pending:
+            logger.warning(f"Timed out after {timeout}s waiting for {item!r}; skipping it")
+            continue
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Error processing {item!r}: {error}")
+            continue
+        completed.append((item, task.result()))
+    return completed
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight wait for it and receive the same result (or exception) instead of
+    repeating it.  Nothing is remembered once the call finishes, so this
+    complements rather than replaces a result cache.  Results are shared, so
+    callers must not modify them.
+
+    ``do`` serves threads and ``ado`` coroutines; both share the in-flight
+    table, and ``ado`` followers may await a call owned by another thread or
+    event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+        # Running ``ado`` calls, referenced until done so they are not collected
+        self._tasks: set[asyncio.Task] = set()
+        self._executions = 0
+        self._shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., R], *args, **kwargs) -> R:
+        """Return ``fn(*args, **kwargs)``, sharing an identical call already in flight."""
+        future, owner = self._join(key)
+        if not owner:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[R]]) -> R:
+        """
+        Await ``fn()``, sharing an identical call already in flight.
+
+        The call runs as its own task, so cancelling any caller, the one that
+        started it included, only stops that caller's wait.
+        """
+        future, owner = self._join(key)
+        if owner:
+            task = asyncio.ensure_future(fn())
+            with self._lock:
+                self._tasks.add(task)
+            task.add_done_callback(functools.partial(self._finish_task, key, future))
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        """Return how many calls ran and how many callers shared another's call."""
+        with self._lock:
+            return {
+                "executions": self._executions,
+                "shared": self._shared,
+                "in_flight": len(self._calls),
+            }
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._shared += 1
+                return future, False
+            future = self._calls[key] = Future()
+            # A running future cannot be cancelled, so a waiter that is
+            # cancelled (e.g. by its own timeout) only stops its own wait
+            # instead of cancelling the shared call for every caller
+            future.set_running_or_notify_cancel()
+            self._executions += 1
+            return future, True
+
+    def _finish_task(self, key: Hashable, future: Future, task: asyncio.Task) -> None:
+        with self._lock:
+            self._tasks.discard(task)
+        if task.cancelled():
+            result, error = None, asyncio.CancelledError()
+        else:
+            error = task.exception()
+            result = task.result() if error is None else None
+        self._finish(key, future, result=result, error=error)
+
+    def _finish(self, key: Hashable, future: Future, result=None, error=None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+def _deadline_expired(timeout: float | None, items: list) -> bool:
+    if timeout != 0 or _deadline.get() is None:
+        return False
+    logger.warning(f"Deadline passed; skipping {len(items)} call(s)")
+    return True
+
+
+def _get_shared_executor() -> ThreadPoolExecutor:
+    global _shared_executor
+    if _shared_executor is None:
+        with _shared_executor_lock:
+            if _shared_executor is None:
+                _shared_executor = ThreadPoolExecutor(
+                    max_workers=_SHARED_MAX_WORKERS, thread_name_prefix="fan_out"
+                )
+    return _shared_executor
@@ -1,7 +1,11 @@
 import re
+from collections.abc import Mapping, Sequence
 from google.cloud import dataplex_v1
 from google.api_core import exceptions
 import logging
+import os
+
+from tools import cache, clients, concurrency, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -9,9 +13,65 @@ logger = logging.getLogger(__name__)
 # Conflicts in these fields are surfaced rather than silently overwritten.
 _SHARED_FIELDS = {"display_name", "description"}
 
+# Catalog search qualifier restricting results to data product entries, so
+# tables and views are filtered out server-side instead of fetched and
+# discarded. Set DATA_PRODUCT_TYPE_FILTER to an empty string to disable it.
+DATA_PRODUCT_TYPE_FILTER = os.environ.get("DATA_PRODUCT_TYPE_FILTER", "type:data-product")
+
+# Page size for catalog searches; small pages let a capped search stop early
+DEFAULT_SEARCH_PAGE_SIZE = 50
+
+# Upper bound on concurrent entry lookups in get_data_products
+DEFAULT_FETCH_CONCURRENCY = int(os.environ.get("DATA_PRODUCT_MAX_CONCURRENCY", "8"))
+
+# Full entries fetched by get_data_products, keyed by resource name
+_entry_cache = cache.LRUCache(
+    maxsize=4096, ttl_seconds=float(os.environ.get("DATA_PRODUCT_CACHE_TTL_SECONDS", "300"))
+)
+
+# Entry lookups and searches currently in flight, so concurrent identical
+# requests share one call
+_flights = concurrency.SingleFlight()
+
+# Aspect keys _normalize_entry reads, as (aspect type marker, ((struct key,
+# product field), ...)). An aspect is handled by the first marker contained in
+# its type; only these keys are read, the rest of the Struct is never decoded.
+_ASPECT_FIELDS = (
+    ("data-product-metadata", (
+        ("ownerTeam", "owner_team"),
+        ("domain", "domain"),
+        ("dataClassification", "data_classification"),
+        ("contactEmail", "contact_email"),
+    )),
+    ("data-product-status", (
+        ("stage", "status"),
+        ("slaTier", "sla_tier"),
+        ("updateFrequency", "update_frequency"),
+    )),
+    ("data-product-exchange", (
+        ("documentationUrl", "documentation_url"),
+        ("linkedResources", "linked_resources"),
+    )),
+    ("overview", (
+        ("details", "description"),
+    )),
+)
+
+# Fields merge_listing_with_data_product adds on top of the listing
+_MERGED_FIELDS = ("data_product_name", "data_product_unique_fields", "conflicting_fields")
+
+# Memoized merge results keyed by (listing name, product name, product
+# update_time), and the last update_time seen per product for invalidation.
+_merge_cache = cache.LRUCache(maxsize=4096)
+_product_versions = cache.LRUCache(maxsize=16384)
+
 
 def search_data_products(
-    query: str, project_id: str, location: str = "us-central1"
+    query: str,
+    project_id: str,
+    location: str = "us-central1",
+    max_results: int | None = None,
+    page_size: int = DEFAULT_SEARCH_PAGE_SIZE,
 ) -> list[dict]:
     """
     Search the Dataplex Universal Catalog for data product entries matching query.
@@ -20,31 +80,83 @@ def search_data_products(
         query: Free-text search query.
         project_id: Google Cloud project ID.
         location: Catalog location (use "global" if products are registered globally).
+        max_results: Maximum number of products to return (default: all matches).
+        page_size: Page size for the catalog search call.
+
+    Concurrent identical searches share one catalog search call.
 
     Returns:
-        List of normalised data product dicts.
+        List of normalised data product dicts, most relevant first, each
+        tagged with the ``location`` it was found in.
     """
-    client = dataplex_v1.CatalogServiceClient()
-    parent = f"projects/{project_id}/locations/{location}"
+    key = ("search", query, project_id, location, max_results, page_size)
+    return list(_flights.do(
+        key, lambda: list(iter_data_products(query, project_id, location, max_results, page_size))
+    ))
+
+
+def iter_data_products(
+    query: str,
+    project_id: str,
+    location: str = "us-central1",
+    max_results: int | None = None,
+    page_size: int = DEFAULT_SEARCH_PAGE_SIZE,
+):
+    """
+    Stream data product entries from the catalog search as pages arrive.
 
-    try:
-        request = dataplex_v1.SearchEntriesRequest(
-            name=parent,
-            query=query,
-            order_by="relevance",
-        )
-        page_result = client.search_entries(request=request)
+    The data product type filter (``DATA_PRODUCT_TYPE_FILTER``) is added to
+    the catalog query so non-product entries are not returned at all; the
+    client-side check is kept as a safety net.  Pages are fetched lazily and
+    paging stops once ``max_results`` products have been yielded (or when the
+    caller stops iterating).
 
-        results = []
-        for search_result in page_result:
-            entry = search_result.entry
-            if _is_data_product(entry):
-                results.append(_normalize_entry(entry))
-        return results
+    Args:
+        query: Free-text search query.
+        project_id: Google Cloud project ID.
+        location: Catalog location.
+        max_results: Stop after this many products (default: no limit).
+        page_size: Page size for the catalog search call.
 
-    except exceptions.GoogleAPICallError as e:
-        logger.error(f"Error searching data products: {e}")
-        return []
+    Yields:
+        Normalised data product dicts tagged with ``location``.  An API error
+        is logged and ends the stream.
+    """
+    if max_results is not None and max_results <= 0:
+        return
+
+    client = clients.get_client(dataplex_v1.CatalogServiceClient, project_id)
+    parent = f"projects/{project_id}/locations/{location}"
+    if max_results is not None:
+        page_size = min(page_size, max_results)
+    found = 0
+
+    # One span for the whole stream: the pager fetches pages lazily
+    with tracing.api_call("dataplex.search_entries", parent=parent) as span:
+        try:
+            request = dataplex_v1.SearchEntriesRequest(
+                name=parent,
+                query=_data_product_query(query),
+                order_by="relevance",
+                page_size=page_size,
+            )
+            for search_result in client.search_entries(request=request, **concurrency.rpc_timeout()):
+                entry = search_result.entry
+                if not _is_data_product(entry):
+                    continue
+
+                product = {**_normalize_entry(entry), "location": location}
+                _observe_product_versions([product])
+                yield product
+                found += 1
+                if max_results is not None and found >= max_results:
+                    return
+
+        except exceptions.GoogleAPICallError as e:
+            span.record_error(e)
+            logger.error(f"Error searching data products: {e}")
+        finally:
+            span.set(result_count=found)
 
 
 def get_data_product(product_name: str) -> dict:
@@ -58,29 +170,63 @@ def get_data_product(product_name: str) -> dict:
     Returns:
         Normalised data product dict, or empty dict on error.
     """
-    client = dataplex_v1.CatalogServiceClient()
+    client = clients.get_client(
+        dataplex_v1.CatalogServiceClient, clients.project_from_resource(product_name)
+    )
 
     try:
         request = dataplex_v1.GetEntryRequest(
             name=product_name,
             view=dataplex_v1.EntryView.FULL,
         )
-        entry = client.get_entry(request=request)
-        return _normalize_entry(entry)
+        with tracing.api_call("dataplex.get_entry", entry=product_name):
+            entry = client.get_entry(request=request, **concurrency.rpc_timeout())
+        product = _normalize_entry(entry)
+        _observe_product_versions([product])
+        return product
 
     except exceptions.GoogleAPICallError as e:
         logger.error(f"Error retrieving data product '{product_name}': {e}")
         return {}
 
 
+def get_data_products(
+    product_names: list[str], max_concurrency: int = DEFAULT_FETCH_CONCURRENCY
+) -> dict[str, dict]:
+    """
+    Retrieve many data product entries at once.
+
+    Names are fetched concurrently (at most ``max_concurrency`` at a time) with
+    ``get_data_product``.  Successful lookups are cached for
+    ``DATA_PRODUCT_CACHE_TTL_SECONDS``, and a name that is already being
+    fetched by another request is waited on rather than fetched again.
+
+    Args:
+        product_names: Full resource names; duplicates and empty names are ignored.
+        max_concurrency: Upper bound on concurrent ``get_entry`` calls.
+
+    Returns:
+        Mapping of resource name to normalised data product dict.  Names that
+        could not be retrieved are left out.
+    """
+    names = list(dict.fromkeys(name for name in product_names if name))
+    products = concurrency.map_bounded(
+        _get_data_product_cached, names, max_concurrency, thread_name_prefix="data_products"
+    )
+    return {name: product for name, product in zip(names, products) if product}
+
+
 def find_matching_product(
     bq_listing: dict, data_products: list[dict]
 ) -> dict | None:
     """
     Find the data product that matches a BQ Analytics Hub listing.
 
-    Matching is a strict equality check on the *normalized* display name
-    (lower-cased, with surrounding and repeated internal whitespace collapsed).
+    A product whose ``linked_resources`` include the listing's resource name
+    is the strongest match and wins outright; this survives title drift
+    between the two catalogs.  Otherwise matching falls back to a strict
+    equality check on the *normalized* display name (lower-cased, with
+    surrounding and repeated internal whitespace collapsed).
 
     Strict equality is deliberate: products are co-published to Analytics Hub
     and the Data Product API with identical or near-identical names, so an exact
@@ -89,9 +235,15 @@ def find_matching_product(
     listing's name hijack that listing's surfaced metadata (owner, contact
     email, documentation URL).
 
-    Returns the first product whose normalized name equals the listing's, or
-    None if there is no exact match.
+    Returns the first product linked to the listing, else the first product
+    whose normalized name equals the listing's, or None if neither exists.
     """
+    listing_resource = _normalize_resource_name(bq_listing.get("name", ""))
+    if listing_resource:
+        for product in data_products:
+            if listing_resource in _linked_resource_names(product):
+                return product
+
     listing_name = _normalize_name(bq_listing.get("display_name", ""))
     if not listing_name:
         return None
@@ -103,6 +255,80 @@ def find_matching_product(
     return None
 
 
+def build_product_name_index(data_products: list[dict]) -> dict[str, dict]:
+    """
+    Index data products by normalized display name for O(1) matching.
+
+    When several products share a normalized name the first one wins, matching
+    the first-match behaviour of ``find_matching_product``.  Products without
+    a display name are not indexed.
+    """
+    index: dict[str, dict] = {}
+    for product in data_products:
+        name = _normalize_name(product.get("display_name", ""))
+        if name:
+            index.setdefault(name, product)
+    return index
+
+
+def build_linked_resource_index(data_products: list[dict]) -> dict[str, dict]:
+    """
+    Index data products by the resource names listed in ``linked_resources``.
+
+    Resource names are normalized (service prefix such as
+    ``//analyticshub.googleapis.com/`` removed, lower-cased) so a product
+    linking the full resource name of a listing matches that listing's
+    ``name``.  When several products link the same resource the first wins.
+    """
+    index: dict[str, dict] = {}
+    for product in data_products:
+        for resource in _linked_resource_names(product):
+            index.setdefault(resource, product)
+    return index
+
+
+class ProductIndex:
+    """
+    Lookup tables for joining listings to one list of data products.
+
+    Build it once per fetched product list and reuse it for every listing:
+    listings are matched by linked resource identity first and by normalized
+    display name as the fallback, each an O(1) dict lookup.
+    """
+
+    def __init__(self, data_products: list[dict]):
+        self.data_products = data_products
+        self.by_resource = build_linked_resource_index(data_products)
+        self.by_name = build_product_name_index(data_products)
+
+    def match(self, bq_listing: dict) -> dict | None:
+        """Return the product matching ``bq_listing``, with the same rules as ``find_matching_product``."""
+        if self.by_resource:
+            product = self.by_resource.get(_normalize_resource_name(bq_listing.get("name", "")))
+            if product is not None:
+                return product
+        return self.by_name.get(_normalize_name(bq_listing.get("display_name", "")))
+
+
+def match_listings_to_products(
+    bq_listings: list[dict], data_products: "list[dict] | ProductIndex"
+) -> list[tuple[dict, dict | None]]:
+    """
+    Match every listing to its data product in a single pass.
+
+    Equivalent to calling ``find_matching_product`` for each listing (linked
+    resource first, then strict normalized-name equality, first match wins),
+    but the products are indexed once, so the join is linear in
+    ``len(bq_listings) + len(data_products)`` instead of their product.
+    Pass a prebuilt ``ProductIndex`` to reuse the index across joins.
+
+    Returns:
+        ``(listing, matched_product_or_None)`` pairs in listing order.
+    """
+    index = data_products if isinstance(data_products, ProductIndex) else ProductIndex(data_products)
+    return [(listing, index.match(listing)) for listing in bq_listings]
+
+
 def merge_listing_with_data_product(bq_listing: dict, data_product: dict) -> dict:
     """
     Merge a BQ Analytics Hub listing with its matched Data Product catalog entry.
@@ -117,9 +343,58 @@ def merge_listing_with_data_product(bq_listing: dict, data_product: dict) -> dic
       present; the BQ value is kept as the primary value.
     - The data product's resource name is stored as ``data_product_name``.
 
+    Results are memoized per (listing name, product name, product
+    ``update_time``) in an LRU cache, so unchanged pairs are not re-merged on
+    every request.  Products without an ``update_time`` are never memoized.
+    The nested ``data_product_unique_fields`` / ``conflicting_fields`` dicts
+    may be shared between calls and must not be mutated.
+
     Returns:
         Merged dict summarising information from both sources.
     """
+    version = data_product.get("update_time")
+    if version is None:
+        return _merge_listing_with_data_product(bq_listing, data_product)
+
+    key = (bq_listing.get("name"), data_product.get("name"), version)
+    # The merge also depends on the listing's shared fields and key set, which
+    # can change without the listing being renamed.
+    inputs = (
+        tuple(bq_listing.get(field) for field in sorted(_SHARED_FIELDS)),
+        tuple(field in bq_listing for field in data_product),
+    )
+
+    cached = _merge_cache.get(key)
+    if cached is not None and cached[0] == inputs:
+        return {**bq_listing, **cached[1]}
+
+    merged = _merge_listing_with_data_product(bq_listing, data_product)
+    _merge_cache.put(key, (inputs, {f: merged[f] for f in _MERGED_FIELDS if f in merged}))
+    return merged
+
+
+def invalidate_merged_records(product_name: str | None = None) -> int:
+    """
+    Drop memoized merge results for one data product, or for all of them.
+
+    Call this when a catalog refresh shows a product changed.  Search and get
+    calls do so automatically when they see a newer ``update_time``.
+
+    Returns:
+        The number of cached merge results removed.
+    """
+    if product_name is None:
+        return _merge_cache.invalidate()
+    return _merge_cache.invalidate(lambda key: key[1] == product_name)
+
+
+def merge_cache_stats() -> dict:
+    """Return hit/miss/eviction counters for the merge memoization cache."""
+    return _merge_cache.stats()
+
+
+def _merge_listing_with_data_product(bq_listing: dict, data_product: dict) -> dict:
+    """Uncached implementation of ``merge_listing_with_data_product``."""
     merged = dict(bq_listing)
     merged["data_product_name"] = data_product.get("name")
 
@@ -144,6 +419,35 @@ def merge_listing_with_data_product(bq_listing: dict, data_product: dict) -> dic
     return merged
 
 
+def _get_data_product_cached(product_name: str) -> dict:
+    """``get_data_product`` through the entry cache, sharing in-flight lookups."""
+    product = _entry_cache.get(product_name)
+    if product is not None:
+        return product
+
+    return _flights.do(("entry", product_name), _fetch_data_product, product_name)
+
+
+def _fetch_data_product(product_name: str) -> dict:
+    product = get_data_product(product_name)
+    if product:
+        _entry_cache.put(product_name, product)
+    return product
+
+
+def _observe_product_versions(products: list[dict]) -> None:
+    """Invalidate memoized merges and cached entries for products whose update_time changed."""
+    for product in products:
+        name, version = product.get("name"), product.get("update_time")
+        if not name or version is None:
+            continue
+        previous = _product_versions.get(name)
+        if previous is not None and previous != version:
+            invalidate_merged_records(name)
+            _entry_cache.pop(name)
+        _product_versions.put(name, version)
+
+
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
@@ -159,6 +463,38 @@ def _normalize_name(name: str) -> str:
     return re.sub(r"\s+", " ", (name or "").strip().lower())
 
 
+def _normalize_resource_name(name) -> str:
+    """
+    Normalize a resource name for identity comparison.
+
+    Strips a leading service prefix ("//analyticshub.googleapis.com/") so full
+    and relative resource names compare equal, and lower-cases the result
+    because locations are reported as both "US" and "us".
+    """
+    if not isinstance(name, str):
+        return ""
+    name = name.strip()
+    if name.startswith("//"):
+        name = name[2:].partition("/")[2]
+    return name.lower()
+
+
+def _linked_resource_names(product: dict) -> list[str]:
+    """Return the normalized, non-empty resource names a product links to."""
+    names = (_normalize_resource_name(r) for r in product.get("linked_resources") or [])
+    return [name for name in names if name]
+
+
+def _data_product_query(query: str) -> str:
+    """Restrict a free-text catalog query to data product entries."""
+    query = (query or "").strip()
+    if not DATA_PRODUCT_TYPE_FILTER:
+        return query
+    if not query:
+        return DATA_PRODUCT_TYPE_FILTER
+    return f"({query}) {DATA_PRODUCT_TYPE_FILTER}"
+
+
 def _is_data_product(entry) -> bool:
     """Return True when the Dataplex entry represents a data product."""
     entry_type: str = getattr(entry, "entry_type", "") or ""
@@ -166,13 +502,16 @@ def _is_data_product(entry) -> bool:
 
 
 def _normalize_entry(entry) -> dict:
-    """Convert a Dataplex Entry protobuf object to a plain dict."""
-    aspects = _extract_aspects(getattr(entry, "aspects", {}) or {})
+    """
+    Convert a Dataplex Entry protobuf object to a plain dict.
 
+    Only the well-known aspect keys listed in ``_ASPECT_FIELDS`` are read;
+    use ``decode_aspects`` for the full content of an entry's aspects.
+    """
     create_time = getattr(entry, "create_time", None)
     update_time = getattr(entry, "update_time", None)
 
-    base = {
+    normalized = {
         "name": entry.name,
         "display_name": entry.display_name,
         "description": entry.description,
@@ -180,39 +519,79 @@ def _normalize_entry(entry) -> dict:
         "create_time": create_time.isoformat() if create_time else None,
         "update_time": update_time.isoformat() if update_time else None,
     }
-    base.update(aspects)
-    return {k: v for k, v in base.items() if v is not None}
+    description = normalized["description"]
+    normalized.update(_extract_aspects(getattr(entry, "aspects", None) or {}))
+    if description:
+        # The overview aspect is only a fallback for entries without a description
+        normalized["description"] = description
+    return {k: v for k, v in normalized.items() if v is not None}
 
 
-def _extract_aspects(aspects: dict) -> dict:
+def _extract_aspects(aspects) -> dict:
     """
     Extract well-known metadata from a Dataplex entry's aspects map.
 
     Each value in ``aspects`` is a ``dataplex_v1.Aspect`` whose ``.data``
-    attribute is a ``google.protobuf.Struct`` (behaves like a dict).
+    attribute is a ``google.protobuf.Struct`` (behaves like a dict).  Only the
+    keys in ``_ASPECT_FIELDS`` are looked up, and only those values are
+    converted to plain Python types.
     """
     extracted: dict = {}
 
     for aspect_type, aspect in aspects.items():
-        data: dict = dict(getattr(aspect, "data", {}) or {})
-
-        if "data-product-metadata" in aspect_type:
-            extracted.update({
-                "owner_team": data.get("ownerTeam"),
-                "domain": data.get("domain"),
-                "data_classification": data.get("dataClassification"),
-                "contact_email": data.get("contactEmail"),
-            })
-        elif "data-product-status" in aspect_type:
-            extracted["status"] = data.get("stage")
-            extracted["sla_tier"] = data.get("slaTier")
-            extracted["update_frequency"] = data.get("updateFrequency")
-        elif "data-product-exchange" in aspect_type:
-            extracted["documentation_url"] = data.get("documentationUrl")
-            extracted["linked_resources"] = data.get("linkedResources", [])
-        elif "overview" in aspect_type:
-            # Only use as fallback if no description was set on the entry itself
-            if not extracted.get("description"):
-                extracted["description"] = data.get("details")
-
-    return {k: v for k, v in extracted.items() if v is not None}
+        marker, fields = _aspect_fields(aspect_type)
+        if fields is None:
+            continue
+
+        data = getattr(aspect, "data", None) or {}
+        for key, field in fields:
+            value = data.get(key)
+            if value is not None:
+                extracted[field] = _to_python(value)
+
+        if marker == "data-product-exchange":
+            extracted.setdefault("linked_resources", [])
+
+    return extracted
+
+
+def decode_aspects(entry, aspect_types: list[str] | None = None) -> dict[str, dict]:
+    """
+    Fully decode an entry's aspects into plain dicts, on demand.
+
+    ``_normalize_entry`` only reads the handful of keys it needs; callers that
+    want everything else an aspect carries can ask for it here.
+
+    Args:
+        entry: A Dataplex Entry.
+        aspect_types: Only decode aspects whose type contains one of these
+            strings (default: every aspect).
+
+    Returns:
+        Mapping of aspect type to the aspect's data as plain Python values.
+    """
+    decoded: dict[str, dict] = {}
+    for aspect_type, aspect in (getattr(entry, "aspects", None) or {}).items():
+        if aspect_types is not None and not any(t in aspect_type for t in aspect_types):
+            continue
+        decoded[aspect_type] = _to_python(getattr(aspect, "data", None) or {})
+    return decoded
+
+
+def _aspect_fields(aspect_type: str) -> tuple[str | None, tuple | None]:
+    """Return the first ``_ASPECT_FIELDS`` entry whose marker is in the aspect type."""
+    for marker, fields in _ASPECT_FIELDS:
+        if marker in aspect_type:
+            return marker, fields
+    return None, None
+
+
+def _to_python(value):
+    """Convert protobuf Struct/ListValue wrappers into plain dicts and lists."""
+    if value is None or isinstance(value, (str, bytes, int, float, bool)):
+        return value
+    if isinstance(value, Mapping):
+        return {key: _to_python(item) for key, item in value.items()}
+    if isinstance(value, Sequence):
+        return [_to_python(item) for item in value]
+    return value
@@ -1,11 +1,64 @@
 from google.cloud import dataplex_v1
 from google.api_core import exceptions
 import logging
+import os
+from typing import NamedTuple
+
+from tools import cache, clients, concurrency, tracing
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent DataScan API calls during a quality lookup
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("DATA_QUALITY_MAX_CONCURRENCY", "8"))
+
+# How long the list of quality scans per (project, location) is reused. A
+# scan job that finishes is picked up at most this long afterwards.
+SCAN_LIST_TTL_SECONDS = float(os.environ.get("DATA_QUALITY_SCAN_LIST_TTL_SECONDS", "60"))
+
+
+class _QualityScan(NamedTuple):
+    name: str
+    resource: str  # relative resource name, e.g. projects/p/datasets/d/tables/t
+    latest_job_end_time: str
+
+
+# Marker identifying the data contract aspect on catalog entries; any aspect
+# whose type contains it is read as the entry's contract.
+DATA_CONTRACT_ASPECT = os.environ.get("DATA_CONTRACT_ASPECT_TYPE", "data-contract")
+
+# Seconds a contract batch waits for lookups before returning what it has
+DEFAULT_CONTRACT_TIMEOUT = float(os.environ.get("DATA_CONTRACT_TIMEOUT_SECONDS", "5"))
+
+# Upper bound on concurrent catalog lookups during a contract batch
+DEFAULT_CONTRACT_MAX_CONCURRENCY = int(os.environ.get("DATA_CONTRACT_MAX_CONCURRENCY", "8"))
+
+# Contract aspect keys read into the contract dict, as (struct key, field)
+_CONTRACT_FIELDS = (
+    ("status", "status"),
+    ("owner", "owner"),
+    ("sla", "sla"),
+    ("version", "version"),
+    ("effectiveTime", "effective_time"),
+)
+
+# Scan and contract lookups currently in flight, so concurrent identical
+# requests share one API call
+_flights = concurrency.SingleFlight()
+
+# (project, location) -> list[_QualityScan]
+_scan_lists = cache.LRUCache(maxsize=256, ttl_seconds=SCAN_LIST_TTL_SECONDS)
+
+# scan name -> (latest_job_end_time, score); valid until a newer job finishes
+_scan_scores = cache.LRUCache(maxsize=4096)
+
+# (entry id, location) -> contract dict ({} when the entry has none). Shared
+# across requests: contracts rarely change.
+_contracts = cache.LRUCache(
+    maxsize=4096, ttl_seconds=float(os.environ.get("DATA_CONTRACT_CACHE_TTL_SECONDS", "3600"))
+)
+
 def get_metadata(entry_id: str, project_id: str, location: str = "us-central1") -> dict:
     """
     Retrieves metadata for a Dataplex entry including aspects.
@@ -18,7 +71,7 @@ def get_metadata(entry_id: str, project_id: str, location: str = "us-central1")
     Returns:
         A dictionary containing the entry metadata.
     """
-    client = dataplex_v1.MetadataServiceClient()
+    client = clients.get_client(dataplex_v1.MetadataServiceClient, project_id)
     
     # Construct the entry name
     # Typically: projects/{project}/locations/{location}/lakes/{lake}/zones/{zone}/entities/{entity}
@@ -30,7 +83,8 @@ def get_metadata(entry_id: str, project_id: str, location: str = "us-central1")
     
     try:
         request = dataplex_v1.GetEntityRequest(name=name)
-        response = client.get_entity(request=request)
+        with tracing.api_call("dataplex.get_entity", entity=name):
+            response = client.get_entity(request=request, **concurrency.rpc_timeout())
         
         metadata = {
             "name": response.name,
@@ -53,22 +107,271 @@ def get_metadata(entry_id: str, project_id: str, location: str = "us-central1")
         logger.error(f"Error retrieving metadata: {e}")
         return {}
 
-def get_data_quality_score(entry_id: str) -> float:
+def get_data_quality_score(entry_id: str, location: str = "us") -> float | None:
+    """
+    Retrieve the data quality score of a single resource.
+
+    See ``get_data_quality_scores``; prefer it when scoring several resources.
+    """
+    return get_data_quality_scores([entry_id], location).get(entry_id)
+
+
+def get_data_quality_scores(
+    resource_names: list[str],
+    location: str = "us",
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> dict[str, float | None]:
+    """
+    Retrieve the latest Dataplex data quality scores for many resources at once.
+
+    The data quality scans of every project involved are listed (concurrently,
+    and reused for ``SCAN_LIST_TTL_SECONDS``), and the latest result of each
+    scan covering a requested resource is read concurrently.  A scan covers a
+    resource when it scans the resource itself or something inside it, e.g. a
+    table of a requested dataset.  Scan results are cached until a newer scan
+    job finishes, so repeated lookups cost one list call per project at most.
+
+    Tests and offline benchmarks can substitute a fake
+    ``DataScanServiceClient`` with ``clients.override_client``.
+
+    Args:
+        resource_names: BigQuery resource names such as
+            ``projects/{p}/datasets/{d}`` or ``projects/{p}/datasets/{d}/tables/{t}``
+            (``//bigquery.googleapis.com/`` prefixes are accepted).
+        location: Location of the data scans, e.g. "us" or "europe-west1".
+        max_concurrency: Upper bound on concurrent DataScan API calls.
+
+    Returns:
+        Mapping of each requested resource name to its score between 0 and 1
+        (the mean over all covering scans), or None when no scan result is
+        available.
+    """
+    resources = list(dict.fromkeys(name for name in resource_names if name))
+    location = location.lower()
+
+    projects = list(dict.fromkeys(
+        project for project in (
+            clients.project_from_resource(_relative_resource_name(r)) for r in resources
+        ) if project
+    ))
+    scan_lists = dict(zip(projects, concurrency.map_bounded(
+        lambda project: _list_quality_scans(project, location),
+        projects, max_concurrency, thread_name_prefix="data_scans",
+    )))
+
+    covering: dict[str, list[_QualityScan]] = {}
+    for resource in resources:
+        relative = _relative_resource_name(resource)
+        scans = scan_lists.get(clients.project_from_resource(relative), [])
+        covering[resource] = [
+            scan for scan in scans
+            if scan.resource == relative or scan.resource.startswith(relative + "/")
+        ]
+
+    needed = list({scan.name: scan for scans in covering.values() for scan in scans}.values())
+    scan_scores = dict(zip(
+        (scan.name for scan in needed),
+        concurrency.map_bounded(_scan_score, needed, max_concurrency, thread_name_prefix="data_scans"),
+    ))
+
+    scores: dict[str, float | None] = {}
+    for resource, scans in covering.items():
+        values = [scan_scores[scan.name] for scan in scans if scan_scores[scan.name] is not None]
+        scores[resource] = round(sum(values) / len(values), 4) if values else None
+    return scores
+
+
+def get_data_contract_info(entry_id: str, location: str = "us") -> dict:
     """
-    Mock function to retrieve data quality score.
-    In a real implementation, this would query the Data Quality task results 
-    associated with the entity.
+    Retrieve the data contract of a single entry.
+
+    See ``get_data_contracts``; prefer it when resolving several entries.
+
+    Returns:
+        The contract dict, or an empty dict if there is none or it could not
+        be retrieved.
     """
-    # TODO: Implement actual lookup
-    return 0.95
+    return get_data_contracts([entry_id], location).get(entry_id, {})
 
-def get_data_contract_info(entry_id: str) -> dict:
+
+def get_data_contracts(
+    entry_ids: list[str],
+    location: str = "us",
+    timeout: float | None = DEFAULT_CONTRACT_TIMEOUT,
+    max_concurrency: int = DEFAULT_CONTRACT_MAX_CONCURRENCY,
+) -> dict[str, dict]:
     """
-    Mock function to retrieve data contract info.
+    Resolve the data contracts of many catalog entries at once.
+
+    A contract is the ``DATA_CONTRACT_ASPECT`` aspect of the entry's Dataplex
+    catalog entry.  Entry IDs that are not already catalog entry names
+    (``.../entryGroups/...``) are treated as BigQuery resources such as
+    ``projects/{p}/datasets/{d}`` and looked up in the ``@bigquery`` entry
+    group.  Lookups run concurrently and share an LRU/TTL cache across
+    requests, so only entries not seen recently hit the API.
+
+    Args:
+        entry_ids: Catalog entry names or BigQuery resource names.
+        location: Location of the catalog entries, e.g. "us".
+        timeout: Seconds to wait for uncached lookups, or None to wait for all.
+        max_concurrency: Upper bound on concurrent ``lookup_entry`` calls.
+
+    Returns:
+        Mapping of entry ID to contract dict (``{}`` when the entry has no
+        contract).  Entries whose lookup failed or did not finish within
+        ``timeout`` are left out; a late lookup still fills the cache for
+        the next request.
     """
-    # TODO: Implement actual lookup from Dataplex Governance features
-    return {
-        "status": "active",
-        "owner": "data-team-alpha",
-        "sla": "99.9%"
-    }
+    ids = list(dict.fromkeys(entry_id for entry_id in entry_ids if entry_id))
+    location = location.lower()
+
+    contracts: dict[str, dict] = {}
+    missing = []
+    for entry_id in ids:
+        contract = _contracts.get((entry_id, location))
+        if contract is None:
+            missing.append(entry_id)
+        else:
+            contracts[entry_id] = contract
+
+    completed = concurrency.map_with_timeout(
+        lambda entry_id: _lookup_contract(entry_id, location), missing, timeout,
+        max_concurrency, thread_name_prefix="data_contracts",
+    )
+    for entry_id, contract in completed:
+        if contract is not None:
+            contracts[entry_id] = contract
+    return contracts
+
+
+# ---------------------------------------------------------------------------
+# Internal helpers
+# ---------------------------------------------------------------------------
+
+def _relative_resource_name(name: str) -> str:
+    """Strip a leading "//service.googleapis.com/" prefix from a resource name."""
+    name = (name or "").strip()
+    if name.startswith("//"):
+        name = name[2:].partition("/")[2]
+    return name
+
+
+def _list_quality_scans(project_id: str, location: str) -> list[_QualityScan]:
+    """List the data quality scans in (project, location) that have run at least once."""
+    scans = _scan_lists.get((project_id, location))
+    if scans is not None:
+        return scans
+    return _flights.do(("scans", project_id, location), _fetch_quality_scans, project_id, location)
+
+
+def _fetch_quality_scans(project_id: str, location: str) -> list[_QualityScan]:
+    client = clients.get_client(dataplex_v1.DataScanServiceClient, project_id)
+    try:
+        request = dataplex_v1.ListDataScansRequest(
+            parent=f"projects/{project_id}/locations/{location}"
+        )
+        scans = []
+        with tracing.api_call("dataplex.list_data_scans", parent=request.parent) as span:
+            for scan in client.list_data_scans(request=request, **concurrency.rpc_timeout()):
+                end_time = scan.execution_status.latest_job_end_time
+                if scan.type_ != dataplex_v1.DataScanType.DATA_QUALITY or not end_time:
+                    continue
+                scans.append(_QualityScan(
+                    name=scan.name,
+                    resource=_relative_resource_name(scan.data.resource),
+                    latest_job_end_time=end_time.isoformat(),
+                ))
+            span.set(result_count=len(scans))
+    except exceptions.GoogleAPICallError as e:
+        logger.error(f"Error listing data scans in {project_id}/{location}: {e}")
+        return []
+
+    _scan_lists.put((project_id, location), scans)
+    return scans
+
+
+def _scan_score(scan: _QualityScan) -> float | None:
+    """Return the 0-1 score of a scan's latest job, fetching it only after a new job."""
+    cached = _scan_scores.get(scan.name)
+    if cached is not None and cached[0] == scan.latest_job_end_time:
+        return cached[1]
+    return _flights.do(("score", scan.name, scan.latest_job_end_time), _fetch_scan_score, scan)
+
+
+def _fetch_scan_score(scan: _QualityScan) -> float | None:
+    client = clients.get_client(
+        dataplex_v1.DataScanServiceClient, clients.project_from_resource(scan.name)
+    )
+    try:
+        request = dataplex_v1.GetDataScanRequest(
+            name=scan.name, view=dataplex_v1.GetDataScanRequest.DataScanView.FULL
+        )
+        with tracing.api_call("dataplex.get_data_scan", scan=scan.name):
+            result = client.get_data_scan(request=request, **concurrency.rpc_timeout()).data_quality_result
+    except exceptions.GoogleAPICallError as e:
+        logger.error(f"Error retrieving data scan '{scan.name}': {e}")
+        return None
+
+    # Dataplex reports the score as a percentage; it is unset for scans
+    # without scored rules.
+    score = result.score / 100 if "score" in result else None
+    _scan_scores.put(scan.name, (scan.latest_job_end_time, score))
+    return score
+
+
+def _catalog_entry_name(entry_id: str, location: str) -> str:
+    """Map an entry ID to a catalog entry name, assuming BigQuery for bare resources."""
+    if "/entryGroups/" in entry_id:
+        return entry_id
+    relative = _relative_resource_name(entry_id)
+    project = clients.project_from_resource(relative)
+    return (
+        f"projects/{project}/locations/{location}/entryGroups/@bigquery/"
+        f"entries/bigquery.googleapis.com/{relative}"
+    )
+
+
+def _lookup_contract(entry_id: str, location: str) -> dict | None:
+    """Fetch and cache one entry's contract; None if the lookup failed."""
+    return _flights.do(("contract", entry_id, location), _fetch_contract, entry_id, location)
+
+
+def _fetch_contract(entry_id: str, location: str) -> dict | None:
+    entry_name = _catalog_entry_name(entry_id, location)
+    project = clients.project_from_resource(entry_name)
+    if project is None:
+        return {}  # not a resource name; nothing to look up
+    client = clients.get_client(dataplex_v1.CatalogServiceClient, project)
+    try:
+        request = dataplex_v1.LookupEntryRequest(
+            name=f"projects/{project}/locations/{location}",
+            entry=entry_name,
+            view=dataplex_v1.EntryView.ALL,
+        )
+        with tracing.api_call("dataplex.lookup_entry", entry=entry_name):
+            entry = client.lookup_entry(request=request, **concurrency.rpc_timeout())
+    except exceptions.NotFound:
+        contract = {}  # no catalog entry means no contract
+    except exceptions.GoogleAPICallError as e:
+        logger.error(f"Error retrieving data contract for '{entry_id}': {e}")
+        return None
+    else:
+        contract = _contract_from_aspects(entry.aspects)
+
+    _contracts.put((entry_id, location), contract)
+    return contract
+
+
+def _contract_from_aspects(aspects) -> dict:
+    """Read the known contract keys from the first contract aspect, if any."""
+    for aspect_type, aspect in aspects.items():
+        if DATA_CONTRACT_ASPECT not in aspect_type:
+            continue
+        data = aspect.data
+        contract = {}
+        for key, field in _CONTRACT_FIELDS:
+            value = data.get(key)
+            if isinstance(value, (str, int, float, bool)):
+                contract[field] = value
+        return contract
+    return {}
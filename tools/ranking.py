@@ -0,0 +1,187 @@
+import math
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable, Iterable
+
+import numpy as np
+
+from tools.search_index import top_k
+
+# Default weight of each signal in a listing's score
+DEFAULT_WEIGHTS = {
+    "relevance": 0.35,
+    "quality": 0.35,
+    "contract": 0.1,
+    "sla": 0.1,
+    "freshness": 0.1,
+}
+
+# Contract statuses and SLA tiers mapped to a 0-1 score; anything else scores 0
+CONTRACT_STATUS_SCORES = {
+    "active": 1.0, "verified": 1.0, "approved": 1.0,
+    "pending": 0.5, "draft": 0.5,
+}
+SLA_TIER_SCORES = {
+    "platinum": 1.0, "gold": 1.0, "silver": 2 / 3, "bronze": 1 / 3,
+}
+
+# Days after which a data product's freshness score has halved
+FRESHNESS_HALF_LIFE_DAYS = 30.0
+
+# Signals divided by their largest value among the candidates, because their
+# raw scale (e.g. BM25) is not bounded
+_RELATIVE_SIGNALS = frozenset({"relevance"})
+
+
+def _field(record: dict, key: str):
+    """Read ``key`` from a listing, falling back to its merged data product fields."""
+    value = record.get(key)
+    if value is None:
+        value = (record.get("data_product_unique_fields") or {}).get(key)
+    return value
+
+
+def relevance_signal(record: dict, now: float) -> float:
+    return float(record.get("relevance_score") or 0)
+
+
+def quality_signal(record: dict, now: float) -> float:
+    return float(record.get("data_quality_score") or 0)
+
+
+def contract_signal(record: dict, now: float) -> float:
+    status = (record.get("data_contract") or {}).get("status")
+    return CONTRACT_STATUS_SCORES.get(str(status).lower(), 0.0) if status else 0.0
+
+
+def sla_signal(record: dict, now: float) -> float:
+    tier = _field(record, "sla_tier")
+    return SLA_TIER_SCORES.get(str(tier).lower(), 0.0) if tier else 0.0
+
+
+def freshness_signal(record: dict, now: float) -> float:
+    """Halves every ``FRESHNESS_HALF_LIFE_DAYS`` since the data product's ``update_time``."""
+    updated = _field(record, "update_time")
+    if not updated:
+        return 0.0
+    try:
+        updated_at = datetime.fromisoformat(str(updated).replace("Z", "+00:00"))
+    except ValueError:
+        return 0.0
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    age_days = max(0.0, now - updated_at.timestamp()) / 86400
+    return math.pow(0.5, age_days / FRESHNESS_HALF_LIFE_DAYS)
+
+
+DEFAULT_SIGNALS: dict[str, Callable[[dict, float], float]] = {
+    "relevance": relevance_signal,
+    "quality": quality_signal,
+    "contract": contract_signal,
+    "sla": sla_signal,
+    "freshness": freshness_signal,
+}
+
+
+def parse_weights(spec: str | None) -> dict[str, float]:
+    """
+    Parse a ``"relevance=0.5,quality=0.3"`` weight spec.
+
+    Signals left out keep their default weight; an empty spec means the defaults.
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid ranking weight {part!r}; expected name=value")
+        weights[name.strip()] = float(value)
+    return weights
+
+
+class RankingEngine:
+    """
+    Weighted multi-signal ranking of enriched listings.
+
+    Every signal maps a listing to a 0-1 value (relevance is scaled to the
+    best candidate instead), the values of all candidates are laid out as one
+    NumPy matrix and the score is its product with the weight vector.  The
+    top ``k`` are then picked with a partial sort, so ranking thousands of
+    candidates does not sort them all.
+
+    Signals are pluggable: pass ``signals`` mapping a name to a
+    ``fn(listing, now) -> float`` and give it a weight in ``weights``.
+    """
+
+    def __init__(
+        self,
+        weights: dict[str, float] | None = None,
+        signals: dict[str, Callable[[dict, float], float]] | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.signals = dict(DEFAULT_SIGNALS if signals is None else signals)
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        unknown = set(self.weights) - set(self.signals)
+        if unknown:
+            raise ValueError(f"Weights given for unknown signals: {sorted(unknown)}")
+        self._clock = clock
+        self._names = [name for name in self.signals if self.weights.get(name)]
+        self._weight_vector = np.array([self.weights[name] for name in self._names], dtype=np.float64)
+
+    def score(self, listings: Iterable[dict]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Score every listing.
+
+        Returns:
+            ``(scores, contributions)``: the total score per listing and the
+            weighted contribution of each signal, one column per signal.
+        """
+        listings = list(listings)
+        now = self._clock()
+        values = np.array(
+            [[self.signals[name](listing, now) for name in self._names] for listing in listings],
+            dtype=np.float64,
+        ).reshape(len(listings), len(self._names))
+
+        for column, name in enumerate(self._names):
+            if name in _RELATIVE_SIGNALS and len(listings):
+                peak = values[:, column].max()
+                if peak > 0:
+                    values[:, column] /= peak
+
+        contributions = values * self._weight_vector
+        return contributions.sum(axis=1), contributions
+
+    def rank(self, listings: Iterable[dict], k: int | None = None) -> list[dict]:
+        """
+        Return the ``k`` best listings (all when ``k`` is None), best first.
+
+        Each result is a copy of the listing with a ``score`` and a
+        ``score_breakdown`` of per-signal contributions.  Ties keep the input
+        order.
+        """
+        listings = list(listings)
+        if not listings:
+            return []
+
+        scores, contributions = self.score(listings)
+        order = top_k(scores, np.arange(len(listings)), k)
+
+        return [
+            {
+                **listings[i],
+                "score": round(float(scores[i]), 4),
+                "score_breakdown": {
+                    name: round(float(contributions[i, column]), 4)
+                    for column, name in enumerate(self._names)
+                },
+            }
+            for i in order
+        ]
+
+
+def default_engine() -> RankingEngine:
+    """A ``RankingEngine`` weighted by ``RANKING_WEIGHTS`` (e.g. ``"relevance=0.5,quality=0.3"``)."""
+    return RankingEngine(weights=parse_weights(os.environ.get("RANKING_WEIGHTS")))
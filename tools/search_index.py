@@ -0,0 +1,335 @@
+import math
+import re
+import threading
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Filler words that carry no signal in catalog searches ("find sales data for 2024")
+_STOPWORDS = frozenset({
+    "a", "an", "and", "any", "are", "as", "at", "by", "find", "for", "from",
+    "get", "i", "in", "is", "me", "my", "of", "on", "or", "show", "the", "to",
+    "with",
+})
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lower-cased word tokens, dropping stopwords.
+
+    Tokens are runs of word characters, so "sales-2024" yields
+    ``["sales", "2024"]``.
+    """
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def top_k(scores: np.ndarray, candidates: np.ndarray, k: int | None) -> np.ndarray:
+    """
+    The ``k`` best of ``candidates`` (indices into ``scores``), best first.
+
+    Ties are broken by index, so the result is always the first ``k`` of the
+    full ordering.  Only candidates scoring at least the k-th best score are
+    sorted, which keeps selection near-linear for small ``k``.
+    """
+    if k is not None and len(candidates) > k:
+        if k <= 0:
+            return candidates[:0]
+        # Every candidate tied with the k-th score must be considered:
+        # a partial selection alone would pick among them arbitrarily
+        kth_best = np.partition(-scores[candidates], k - 1)[k - 1]
+        candidates = candidates[-scores[candidates] <= kth_best]
+    order = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return order if k is None else order[:k]
+
+
+class InvertedIndex:
+    """
+    Tokenized inverted index with BM25 relevance scoring.
+
+    Each document has a title and a body; title terms count ``title_weight``
+    times towards term frequency so name matches outrank description-only
+    matches.  Postings live in Python dicts so documents can be added, changed
+    and removed incrementally; each term's postings are compiled lazily into
+    NumPy arrays so scoring a query is a handful of vectorized operations
+    rather than a Python loop over every matching document.
+
+    Queries use OR semantics: a document matches when it contains any query
+    term, and documents containing more (and rarer) terms score higher.
+
+    ``export`` / ``from_export`` convert the index to and from compact arrays
+    for on-disk snapshots.  An imported index is *frozen*: it searches straight
+    from the imported arrays and only builds its mutable postings (``thaw``)
+    when it is first modified.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, title_weight: float = 2.0):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self._lock = threading.RLock()
+        self._slots: dict[str, int] = {}            # doc_id -> slot
+        self._doc_ids: list[str | None] = []        # slot -> doc_id
+        self._doc_text: list[tuple | None] = []     # slot -> (title, body)
+        self._doc_terms: list[dict | None] = []     # slot -> {term: tf}
+        self._free_slots: list[int] = []
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._total_length = 0.0
+        self._postings: dict[str, dict[int, float]] = {}
+        self._compiled: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._frozen = False
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slots
+
+    @property
+    def frozen(self) -> bool:
+        """True for an imported index whose mutable postings are not built yet."""
+        return self._frozen
+
+    def doc_ids(self) -> list[str]:
+        """Return the IDs of every indexed document."""
+        with self._lock:
+            return list(self._slots)
+
+    def add(self, doc_id: str, title: str, body: str = "") -> None:
+        """
+        Index a document, replacing any previous version with the same ID.
+
+        Re-adding a document with unchanged text is a no-op.
+        """
+        with self._lock:
+            slot = self._slots.get(doc_id)
+            if slot is not None and self._doc_text[slot] == (title, body):
+                return
+
+            self.thaw()
+            if slot is not None:
+                self._remove_slot(slot)
+
+            terms: dict[str, float] = {}
+            for term in tokenize(title):
+                terms[term] = terms.get(term, 0.0) + self.title_weight
+            for term in tokenize(body):
+                terms[term] = terms.get(term, 0.0) + 1.0
+
+            slot = self._allocate_slot()
+            self._slots[doc_id] = slot
+            self._doc_ids[slot] = doc_id
+            self._doc_text[slot] = (title, body)
+            self._doc_terms[slot] = terms
+
+            length = sum(terms.values())
+            self._lengths[slot] = length
+            self._total_length += length
+
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[slot] = tf
+                self._compiled.pop(term, None)
+
+    def remove(self, doc_id: str) -> None:
+        """Remove a document from the index; unknown IDs are ignored."""
+        with self._lock:
+            slot = self._slots.get(doc_id)
+            if slot is not None:
+                self.thaw()
+                self._remove_slot(slot)
+
+    def search(self, query: str, k: int | None = 10) -> list[tuple[str, float]]:
+        """
+        Return the top ``k`` documents for ``query`` by BM25 score.
+
+        Args:
+            query: Free-text query; tokenized the same way as documents.
+            k: Maximum number of results, or None for every matching document.
+
+        Returns:
+            ``(doc_id, score)`` pairs, best first, with ties in a stable order.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            n_docs = len(self._slots)
+            if not terms or not n_docs:
+                return []
+
+            avg_length = self._total_length / n_docs
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            for term in terms:
+                compiled = self._compiled_postings(term)
+                if compiled is None:
+                    continue
+                slots, tfs = compiled
+                df = len(slots)
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * self._lengths[slots] / avg_length)
+                scores[slots] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+            order = top_k(scores, np.flatnonzero(scores), k)
+            return [(self._doc_ids[slot], float(scores[slot])) for slot in order]
+
+    def thaw(self) -> None:
+        """Build the mutable postings of a frozen (imported) index; no-op otherwise."""
+        with self._lock:
+            if not self._frozen:
+                return
+
+            postings: dict[str, dict[int, float]] = {}
+            doc_terms = [None if doc_id is None else {} for doc_id in self._doc_ids]
+            for term, (slots, tfs) in self._compiled.items():
+                term_postings = dict(zip(slots.tolist(), tfs.tolist()))
+                postings[term] = term_postings
+                for slot, tf in term_postings.items():
+                    doc_terms[slot][term] = tf
+
+            self._postings = postings
+            self._doc_terms = doc_terms
+            self._frozen = False
+
+    def export(self) -> tuple[dict, dict[str, np.ndarray]]:
+        """
+        Return the index as ``(metadata, arrays)`` for serialization.
+
+        ``metadata`` is JSON-serializable (parameters, vocabulary, document IDs
+        and texts); ``arrays`` holds the postings in CSR form (``offsets``,
+        ``slots``, ``tfs``) plus per-slot document ``lengths``.
+        """
+        with self._lock:
+            terms = list(self._compiled) if self._frozen else list(self._postings)
+            compiled = [self._compiled_postings(term) for term in terms]
+
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            if compiled:
+                np.cumsum([len(term_slots) for term_slots, _ in compiled], out=offsets[1:])
+                slots = np.concatenate([term_slots for term_slots, _ in compiled])
+                tfs = np.concatenate([term_tfs for _, term_tfs in compiled])
+            else:
+                slots = np.zeros(0, dtype=np.int64)
+                tfs = np.zeros(0, dtype=np.float32)
+
+            metadata = {
+                "k1": self.k1,
+                "b": self.b,
+                "title_weight": self.title_weight,
+                "terms": terms,
+                "doc_ids": list(self._doc_ids),
+                "doc_text": [list(text) if text is not None else None for text in self._doc_text],
+                "free_slots": list(self._free_slots),
+            }
+            arrays = {
+                "offsets": offsets,
+                "slots": slots,
+                "tfs": tfs,
+                "lengths": self._lengths[: len(self._doc_ids)].copy(),
+            }
+            return metadata, arrays
+
+    @classmethod
+    def from_export(cls, metadata: dict, arrays: dict) -> "InvertedIndex":
+        """
+        Rebuild a frozen index from the output of ``export``.
+
+        Raises:
+            ValueError: If the metadata and arrays are inconsistent.
+        """
+        terms = metadata["terms"]
+        doc_ids = metadata["doc_ids"]
+        offsets, slots, tfs = arrays["offsets"], arrays["slots"], arrays["tfs"]
+        lengths = arrays["lengths"]
+        if (
+            len(offsets) != len(terms) + 1
+            or len(lengths) != len(doc_ids)
+            or len(metadata["doc_text"]) != len(doc_ids)
+            or int(offsets[-1]) != len(slots)
+            or len(slots) != len(tfs)
+            or (len(slots) and int(slots.max()) >= len(doc_ids))
+        ):
+            raise ValueError("Inconsistent search index export")
+
+        index = cls(k1=metadata["k1"], b=metadata["b"], title_weight=metadata["title_weight"])
+        index._doc_ids = list(doc_ids)
+        index._doc_text = [tuple(text) if text is not None else None for text in metadata["doc_text"]]
+        index._doc_terms = [None] * len(doc_ids)
+        index._free_slots = list(metadata["free_slots"])
+        index._slots = {doc_id: slot for slot, doc_id in enumerate(doc_ids) if doc_id is not None}
+        index._lengths = np.array(lengths, dtype=np.float32)
+        index._total_length = float(index._lengths.sum())
+        index._compiled = {
+            term: (slots[offsets[i]:offsets[i + 1]], tfs[offsets[i]:offsets[i + 1]])
+            for i, term in enumerate(terms)
+        }
+        index._frozen = True
+        return index
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+
+        slot = len(self._doc_ids)
+        self._doc_ids.append(None)
+        self._doc_text.append(None)
+        self._doc_terms.append(None)
+        if slot >= len(self._lengths):
+            grown = np.zeros(max(64, 2 * len(self._lengths)), dtype=np.float32)
+            grown[: len(self._lengths)] = self._lengths
+            self._lengths = grown
+        return slot
+
+    def _remove_slot(self, slot: int) -> None:
+        for term in self._doc_terms[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+            self._compiled.pop(term, None)
+
+        self._total_length -= float(self._lengths[slot])
+        self._lengths[slot] = 0.0
+        del self._slots[self._doc_ids[slot]]
+        self._doc_ids[slot] = None
+        self._doc_text[slot] = None
+        self._doc_terms[slot] = None
+        self._free_slots.append(slot)
+
+    def _compiled_postings(self, term: str):
+        compiled = self._compiled.get(term)
+        if compiled is None:
+            postings = self._postings.get(term)
+            if not postings:
+                return None
+            compiled = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float32, count=len(postings)),
+            )
+            self._compiled[term] = compiled
+        return compiled
+
+
+def sync_listing_index(index: InvertedIndex | None, listings: list[dict]) -> InvertedIndex:
+    """
+    Bring a listing index in line with a freshly loaded list of listings.
+
+    With no existing index a new one is built.  Otherwise the index is updated
+    in place: listings that disappeared are removed and new or changed
+    listings are (re-)indexed, so a catalog refresh only pays for what changed.
+    A frozen index (loaded from disk) is thawed into a private copy first so
+    the snapshot still being served keeps searching without waiting.
+    """
+    if index is None:
+        index = InvertedIndex()
+    elif index.frozen:
+        index = InvertedIndex.from_export(*index.export())
+        index.thaw()
+
+    current = {listing["name"] for listing in listings}
+    for doc_id in [d for d in index.doc_ids() if d not in current]:
+        index.remove(doc_id)
+    for listing in listings:
+        index.add(listing["name"], listing.get("display_name") or "", listing.get("description") or "")
+    return index
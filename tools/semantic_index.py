@@ -0,0 +1,198 @@
+import threading
+import zlib
+from typing import Protocol
+
+import numpy as np
+
+from tools.search_index import tokenize, top_k
+
+
+class Embedder(Protocol):
+    """Turns texts into fixed-size vectors; any model with this shape can be plugged in."""
+
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Return one ``dim``-sized row per text as a float32 matrix."""
+        ...
+
+
+class HashingEmbedder:
+    """
+    Offline embedder that hashes word tokens and their character n-grams.
+
+    Each token contributes itself plus every character n-gram of
+    ``<token>`` (so "sales" and "sale" share most features) to a
+    ``dim``-sized vector, with a hash-derived sign to keep collisions
+    unbiased.  Rows are L2-normalized, so a dot product is the cosine
+    similarity.  It needs no model download and is deterministic across
+    processes, which makes it the default; swap in a real sentence-embedding
+    model for true synonym matching.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: tuple[int, int] = (3, 5)):
+        if dim < 1:
+            raise ValueError("dim must be at least 1")
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize_rows(vectors)
+
+    def _features(self, text: str):
+        low, high = self.ngram_range
+        for token in tokenize(text):
+            yield token
+            marked = f"<{token}>"
+            for n in range(low, high + 1):
+                for start in range(len(marked) - n + 1):
+                    yield marked[start:start + n]
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over document embeddings.
+
+    Vectors live in one contiguous float32 matrix, one row per slot, so a
+    query is a single matrix-vector product followed by a partial top-k
+    selection.  Documents can be added, changed and removed incrementally;
+    re-adding a document with unchanged text does not re-embed it, and
+    ``add_many`` embeds every new or changed document in one batch.
+
+    Title and body are embedded separately and the title counts
+    ``title_weight`` times, mirroring ``search_index.InvertedIndex``.
+    """
+
+    def __init__(self, embedder: Embedder | None = None, title_weight: float = 2.0):
+        self.embedder = embedder or HashingEmbedder()
+        self.title_weight = title_weight
+        self._lock = threading.RLock()
+        self._slots: dict[str, int] = {}            # doc_id -> slot
+        self._doc_ids: list[str | None] = []        # slot -> doc_id
+        self._doc_text: list[tuple | None] = []     # slot -> (title, body)
+        self._free_slots: list[int] = []
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slots
+
+    def doc_ids(self) -> list[str]:
+        """Return the IDs of every indexed document."""
+        with self._lock:
+            return list(self._slots)
+
+    def add(self, doc_id: str, title: str, body: str = "") -> None:
+        """Index a document, replacing any previous version with the same ID."""
+        self.add_many([(doc_id, title, body)])
+
+    def add_many(self, documents: list[tuple[str, str, str]]) -> None:
+        """
+        Index ``(doc_id, title, body)`` documents, embedding the new and
+        changed ones in one batch.
+        """
+        with self._lock:
+            changed = []
+            for doc_id, title, body in documents:
+                text = (title or "", body or "")
+                slot = self._slots.get(doc_id)
+                if slot is None or self._doc_text[slot] != text:
+                    changed.append((doc_id, *text))
+            if not changed:
+                return
+
+            titles = self.embedder.embed([title for _, title, _ in changed])
+            bodies = self.embedder.embed([body for _, _, body in changed])
+            vectors = _normalize_rows(self.title_weight * titles + bodies)
+
+            for (doc_id, title, body), vector in zip(changed, vectors):
+                slot = self._slots.get(doc_id)
+                if slot is None:
+                    slot = self._allocate_slot()
+                    self._slots[doc_id] = slot
+                    self._doc_ids[slot] = doc_id
+                self._doc_text[slot] = (title, body)
+                self._vectors[slot] = vector
+
+    def remove(self, doc_id: str) -> None:
+        """Remove a document from the index; unknown IDs are ignored."""
+        with self._lock:
+            slot = self._slots.pop(doc_id, None)
+            if slot is None:
+                return
+            self._doc_ids[slot] = None
+            self._doc_text[slot] = None
+            self._vectors[slot] = 0.0
+            self._free_slots.append(slot)
+
+    def search(
+        self, query: str, k: int | None = 10, min_score: float = 0.0
+    ) -> list[tuple[str, float]]:
+        """
+        Return the top ``k`` documents by cosine similarity to ``query``.
+
+        Args:
+            query: Free-text query, embedded with the index's embedder.
+            k: Maximum number of results, or None for every match.
+            min_score: Documents scoring at or below this are not matches.
+
+        Returns:
+            ``(doc_id, score)`` pairs, best first, with ties in a stable order.
+        """
+        query_vector = self.embedder.embed([query])[0]
+        with self._lock:
+            if not self._slots or not query_vector.any():
+                return []
+
+            scores = self._vectors[: len(self._doc_ids)] @ query_vector
+            order = top_k(scores, np.flatnonzero(scores > min_score), k)
+            return [(self._doc_ids[slot], float(scores[slot])) for slot in order]
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+
+        slot = len(self._doc_ids)
+        self._doc_ids.append(None)
+        self._doc_text.append(None)
+        if slot >= len(self._vectors):
+            grown = np.zeros((max(64, 2 * len(self._vectors)), self.embedder.dim), dtype=np.float32)
+            grown[: len(self._vectors)] = self._vectors
+            self._vectors = grown
+        return slot
+
+
+def sync_vector_index(index: VectorIndex | None, listings: list[dict]) -> VectorIndex:
+    """
+    Bring a listing vector index in line with a freshly loaded list of listings.
+
+    With no existing index a new one is built; otherwise listings that
+    disappeared are removed and only new or changed listings are embedded.
+    """
+    if index is None:
+        index = VectorIndex()
+
+    current = {listing["name"] for listing in listings}
+    for doc_id in [d for d in index.doc_ids() if d not in current]:
+        index.remove(doc_id)
+    index.add_many([
+        (listing["name"], listing.get("display_name") or "", listing.get("description") or "")
+        for listing in listings
+    ])
+    return index
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
@@ -0,0 +1,295 @@
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# Request the current code runs for, and the span new spans are children of.
+# Both follow asyncio tasks and, through concurrency's context copying,
+# worker threads.
+_request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+# Exporter signature: called once with every finished span
+SpanExporter = Callable[["Span"], None]
+
+
+class Span:
+    """
+    One timed operation: a request, a graph node or an outbound API call.
+
+    Spans of one request share its ``request_id`` and link to their parent,
+    so a request can be reassembled into a tree.  ``to_dict`` gives a flat
+    JSON record and ``to_otlp`` the OpenTelemetry (OTLP/JSON) span layout.
+    """
+
+    __slots__ = (
+        "name", "request_id", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "error", "_token", "_activate",
+    )
+
+    def __init__(self, name: str, attributes: dict, activate: bool):
+        parent = _current_span.get()
+        self.name = name
+        self.request_id = _request_id.get()
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: str | None = None
+        self._token = None
+        self._activate = activate
+
+    def __enter__(self) -> "Span":
+        if self._activate:
+            self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end_ns = time.time_ns()
+        if exc is not None and isinstance(exc, Exception):
+            self.record_error(exc)
+        if self._token is not None:
+            _current_span.reset(self._token)
+        _tracer.export(self)
+        return False
+
+    def set(self, **attributes) -> None:
+        """Attach attributes, e.g. ``result_count``, to the span."""
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException) -> None:
+        """Mark the span failed with ``error`` (for errors that are handled, not raised)."""
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        """Flat JSON-serializable record of the span."""
+        return {
+            "name": self.name,
+            "request_id": self.request_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": dict(self.attributes),
+            "error": self.error,
+        }
+
+    def to_otlp(self) -> dict:
+        """The span in OTLP/JSON form, with the request ID as its trace ID."""
+        otlp = {
+            "traceId": _trace_id(self.request_id),
+            "spanId": self.span_id,
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in {"request.id": self.request_id, **self.attributes}.items()
+                if value is not None
+            ],
+            # STATUS_CODE_OK = 1, STATUS_CODE_ERROR = 2
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled; every operation does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _RequestScope:
+    """Context manager binding a request ID around the request's root span."""
+
+    __slots__ = ("_request_id", "_span", "_token")
+
+    def __init__(self, request_id: str | None, span: Span | _NoopSpan):
+        self._request_id = request_id
+        self._span = span
+        self._token = None
+
+    def __enter__(self):
+        if self._request_id is not None:
+            self._token = _request_id.set(self._request_id)
+            if isinstance(self._span, Span):
+                self._span.request_id = self._request_id
+        return self._span.__enter__()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._span.__exit__(exc_type, exc, tb)
+        if self._token is not None:
+            _request_id.reset(self._token)
+        return False
+
+
+class Tracer:
+    """
+    Records spans and hands finished ones to the configured exporters.
+
+    While no exporter is configured the tracer is disabled and ``span`` /
+    ``api_call`` return a shared no-op object, so instrumented code pays a
+    single attribute check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exporters: list[SpanExporter] = []
+        self.enabled = False
+
+    def configure(self, exporters: list[SpanExporter]) -> None:
+        """Replace the exporters; an empty list disables tracing."""
+        with self._lock:
+            self._exporters = list(exporters)
+            self.enabled = bool(self._exporters)
+
+    def export(self, span: Span) -> None:
+        for exporter in self._exporters:
+            try:
+                exporter(span)
+            except Exception as e:
+                logger.warning(f"Error exporting span {span.name}: {e}")
+
+
+class JsonLogExporter:
+    """Logs every finished span as one JSON line."""
+
+    def __init__(self, log: logging.Logger | None = None, level: int = logging.INFO):
+        self._log = log or logging.getLogger("tracing.spans")
+        self._level = level
+
+    def __call__(self, span: Span) -> None:
+        self._log.log(self._level, json.dumps(span.to_dict(), default=str))
+
+
+class InMemoryExporter:
+    """Keeps finished spans in memory, e.g. for tests and benchmarks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans: list[Span] = []
+
+    def __call__(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def for_request(self, request_id: str) -> list[Span]:
+        """Finished spans of one request, in finishing order."""
+        with self._lock:
+            return [span for span in self.spans if span.request_id == request_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+# ---------------------------------------------------------------------------
+# Process-wide tracer
+# ---------------------------------------------------------------------------
+
+_tracer = Tracer()
+
+
+def configure(exporters: list[SpanExporter]) -> None:
+    """Export spans to ``exporters`` from now on; an empty list disables tracing."""
+    _tracer.configure(exporters)
+
+
+def enabled() -> bool:
+    return _tracer.enabled
+
+
+def span(name: str, **attributes) -> Span | _NoopSpan:
+    """
+    Open a span that becomes the parent of spans started inside it.
+
+    Use as a context manager; an exception raised through it marks the span
+    failed.
+    """
+    if not _tracer.enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes, activate=True)
+
+
+def api_call(name: str, **attributes) -> Span | _NoopSpan:
+    """
+    Open a leaf span for an outbound API call.
+
+    It never becomes the current span, so it is safe to hold across the
+    ``yield`` of a streaming generator.
+    """
+    if not _tracer.enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes, activate=False)
+
+
+def request(name: str, request_id: str | None = None, **attributes):
+    """
+    Open the root span of a request and bind its request ID.
+
+    Inside an already active request, ``request_id`` None keeps that
+    request's ID, so nested entry points (the Slack handler, then the agent)
+    share one request.  Otherwise a new ID is generated.
+    """
+    if request_id is None and _request_id.get() is None:
+        request_id = uuid.uuid4().hex
+    if not _tracer.enabled:
+        return _RequestScope(request_id, _NOOP_SPAN)
+    return _RequestScope(request_id, Span(name, attributes, activate=True))
+
+
+def current_request_id() -> str | None:
+    """ID of the request the calling code runs for, if any."""
+    return _request_id.get()
+
+
+def _trace_id(request_id: str | None) -> str:
+    """A 32-hex-digit OTLP trace ID: the request ID itself when it has that form."""
+    request_id = request_id or ""
+    if len(request_id) == 32 and all(c in "0123456789abcdef" for c in request_id):
+        return request_id
+    return hashlib.md5(request_id.encode("utf-8")).hexdigest()
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+if os.environ.get("TRACE_EXPORT", "").lower() == "json":
+    configure([JsonLogExporter()])